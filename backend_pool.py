@@ -0,0 +1,188 @@
+# codex: 2026-10-17 多翻译后端池：按延迟与健康度路由，慢请求在观测延迟分位数处对冲到第二个后端
+"""
+翻译后端池。
+
+BackendPool 把多个具有 translate(text, src, dest) 接口的翻译器组合成一个翻译器：
+
+- 路由：每个后端记录最近的请求耗时与错误率（BackendStats），优先选择健康且中位延迟最低的后端；
+  样本不足 min_samples 的后端视为最快，使新后端先得到探测流量。
+- 对冲：主请求在该后端观测延迟的 hedge_quantile 分位数（样本不足时取 hedge_delay）内没有返回，
+  就向排名第二的后端发出同样的请求，先成功的结果胜出，另一个请求被取消。
+  主请求直接失败时立即改发下一个后端；全部失败时抛出最后一个异常，由调用方的重试逻辑处理。
+- 健康度：连续失败 failure_threshold 次的后端在 cooldown 秒内不参与路由（全部不健康时仍会尝试）。
+- 限速：调用方只为每次 translate 取一个令牌。设置 limiter（有 async acquire() 的令牌桶，
+  translate.py 会把 --rps 的令牌桶挂上来）后，对冲与失败改发的每个额外请求也先取一个令牌，
+  总请求速率仍不超过 --rps。
+
+列表输入（batch_mode = "list"）只有在所有后端都支持时才启用。
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Deque, List, Optional, Sequence
+
+
+def _batch_mode(translator) -> Optional[str]:
+    return getattr(translator, "batch_mode", None)
+
+
+class BackendStats:
+    """单个后端的滑动窗口延迟、错误率（EWMA）与连续失败计数。"""
+
+    def __init__(self, name: str, window: int = 200) -> None:
+        self.name = name
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.failures = 0
+        self.wins = 0  # 作为对冲或失败改发的后端先成功返回的次数
+        self.cancelled = 0
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def observe(self, seconds: float, ok: bool, alpha: float = 0.2) -> None:
+        self.latencies.append(seconds)
+        self.error_rate += alpha * ((0.0 if ok else 1.0) - self.error_rate)
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.unhealthy_until
+
+    def summary(self) -> str:
+        p50, p95 = self.quantile(0.5), self.quantile(0.95)
+        latency = (
+            f"p50/p95 {p50 * 1000:.0f}/{p95 * 1000:.0f}ms" if p50 is not None else "无样本"
+        )
+        return (
+            f"{self.name}: 请求 {self.requests}，失败 {self.failures}，"
+            f"对冲胜出 {self.wins}，被取消 {self.cancelled}，{latency}"
+        )
+
+
+class BackendPool:
+    """多个翻译后端组成的单一翻译器，见模块说明。"""
+
+    def __init__(
+        self,
+        backends: Sequence,
+        *,
+        names: Optional[Sequence[str]] = None,
+        hedge_quantile: float = 0.9,
+        hedge_delay: float = 1.0,
+        min_hedge_delay: float = 0.05,
+        min_samples: int = 5,
+        failure_threshold: int = 3,
+        cooldown: float = 10.0,
+    ) -> None:
+        if not backends:
+            raise ValueError("后端池至少需要一个后端")
+        self.backends = list(backends)
+        names = list(names) if names else [f"backend{i}" for i in range(len(backends))]
+        self.stats = [BackendStats(name) for name in names]
+        self.hedge_quantile = hedge_quantile
+        self.hedge_delay = hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.hedges = 0
+        self.limiter = None  # 额外请求（对冲、改发）共享的令牌桶，见模块说明
+        modes = {_batch_mode(backend) for backend in self.backends}
+        self.batch_mode = modes.pop() if len(modes) == 1 else None
+
+    def ranked(self) -> List[int]:
+        """按路由优先级排序的后端下标：健康的在前，再按 中位延迟 * (1 + 4 * 错误率) 升序。"""
+        now = time.monotonic()
+
+        def score(i: int):
+            stats = self.stats[i]
+            p50 = stats.quantile(0.5)
+            if p50 is None or len(stats.latencies) < self.min_samples:
+                p50 = 0.0
+            return (not stats.healthy(now), p50 * (1 + 4 * stats.error_rate), i)
+
+        return sorted(range(len(self.backends)), key=score)
+
+    def hedge_after(self, index: int) -> float:
+        """对后端 index 的请求等待多久后发出对冲请求。"""
+        stats = self.stats[index]
+        if len(stats.latencies) < self.min_samples:
+            return self.hedge_delay
+        return max(self.min_hedge_delay, stats.quantile(self.hedge_quantile) or 0.0)
+
+    async def _call(self, index: int, text, src: str, dest: str, extra: bool = False):
+        if extra and self.limiter is not None:
+            await self.limiter.acquire()  # 对冲/改发是额外请求，同样占用限速令牌
+        stats = self.stats[index]
+        stats.requests += 1
+        start = time.monotonic()
+        try:
+            result = self.backends[index].translate(text, src=src, dest=dest)
+            if asyncio.iscoroutine(result):
+                result = await result
+        except asyncio.CancelledError:
+            # 被对冲淘汰：耗时至少为 elapsed，计入样本以免低估慢后端
+            stats.cancelled += 1
+            stats.latencies.append(time.monotonic() - start)
+            raise
+        except Exception:
+            stats.failures += 1
+            stats.observe(time.monotonic() - start, ok=False)
+            stats.consecutive_failures += 1
+            if stats.consecutive_failures >= self.failure_threshold:
+                stats.unhealthy_until = time.monotonic() + self.cooldown
+            raise
+        stats.observe(time.monotonic() - start, ok=True)
+        stats.consecutive_failures = 0
+        stats.unhealthy_until = 0.0
+        return result
+
+    async def translate(self, text, src: str = "en", dest: str = "zh-cn"):
+        order = self.ranked()
+        queue = list(order)
+        running = {}
+        last_error: Optional[BaseException] = None
+
+        def launch() -> None:
+            index = queue.pop(0)
+            extra = index != order[0]
+            task = asyncio.ensure_future(self._call(index, text, src, dest, extra))
+            running[task] = index
+
+        launch()
+        try:
+            while running:
+                timeout = None
+                if queue and len(running) == 1:
+                    timeout = self.hedge_after(next(iter(running.values())))
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    self.hedges += 1  # 主请求超过分位数仍未返回，发出对冲
+                    launch()
+                    continue
+                for task in done:
+                    index = running.pop(task)
+                    if task.exception() is None:
+                        if index != order[0]:
+                            self.stats[index].wins += 1
+                        return task.result()
+                    last_error = task.exception()
+                if not running and queue:
+                    launch()  # 失败即改发下一个后端
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        raise last_error  # type: ignore[misc]
+
+    def summary(self) -> List[str]:
+        return [f"对冲请求: {self.hedges}"] + [stats.summary() for stats in self.stats]
@@ -0,0 +1,412 @@
+# codex: 2026-10-17 translate.py 吞吐基准：模拟延迟/错误/限流的假翻译器 + 本地 HTTP 替身 + 基线对比
+"""
+translate.py 吞吐基准。
+
+每个场景在独立子进程中运行（峰值 RSS 互不干扰），报告 words/sec、耗时、峰值 RSS 与请求数：
+
+    python bench_translate.py                      # 运行全部场景
+    python bench_translate.py -s razfull-serial    # 只跑指定场景
+    python bench_translate.py --save-baseline      # 把结果写入 bench_baseline.json
+    python bench_translate.py --compare            # 与基线对比，退化超出容差时退出码为 1
+    python bench_translate.py --http               # 经本地 HTTP 替身服务器请求（含协议开销）
+
+SimulatedTranslator 的延迟、错误率、None 结果与 429 限流均可配置，随机数固定种子，结果可复现。
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, quote, urlsplit
+
+import translate
+
+DEFAULT_BASELINE = "bench_baseline.json"
+
+
+class ThrottledError(RuntimeError):
+    """模拟 HTTP 429 Too Many Requests。"""
+
+
+class SimulatedTranslator:
+    """
+    假翻译器：每次请求按对数正态分布等待（均值 latency_ms，离散度 latency_sigma），
+    以 error_rate 抛异常、以 none_rate 返回 None；throttle_rps 设置后，
+    最近 1 秒内请求数超限即抛 ThrottledError。batch_mode 透传给批量协议。
+    """
+
+    class _Result:
+        def __init__(self, text):
+            self.text = text
+
+    def __init__(
+        self,
+        *,
+        latency_ms: float = 2.0,
+        latency_sigma: float = 0.5,
+        error_rate: float = 0.0,
+        none_rate: float = 0.0,
+        throttle_rps: Optional[float] = None,
+        batch_mode: Optional[str] = None,
+        seed: int = 42,
+    ) -> None:
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.none_rate = none_rate
+        self.throttle_rps = throttle_rps
+        self.batch_mode = batch_mode
+        self.requests = 0
+        self.throttled = 0
+        self._rng = random.Random(seed)
+        self._recent: deque = deque()
+
+    def _latency(self) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        mu = 0.0 - self.latency_sigma**2 / 2  # 使分布均值恰为 latency_ms
+        return self.latency_ms / 1000 * self._rng.lognormvariate(mu, self.latency_sigma)
+
+    def _throttle(self) -> None:
+        if self.throttle_rps is None:
+            return
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > 1.0:
+            self._recent.popleft()
+        if len(self._recent) >= self.throttle_rps:
+            self.throttled += 1
+            raise ThrottledError("429 Too Many Requests")
+        self._recent.append(now)
+
+    async def translate(self, text, src="en", dest="zh-cn"):
+        self.requests += 1
+        self._throttle()
+        await asyncio.sleep(self._latency())
+        roll = self._rng.random()
+        if roll < self.error_rate:
+            raise RuntimeError("simulated backend error")
+        if roll < self.error_rate + self.none_rate:
+            return None
+        if isinstance(text, list):
+            return [self._Result(f"{t}-{dest}") for t in text]
+        return self._Result(f"{text}-{dest}")
+
+
+async def _serve_http(reader, writer, backend: SimulatedTranslator) -> None:
+    """极简 HTTP/1.0 处理：GET /translate?q=..&src=..&dest=.. 返回 {"text": ...}。"""
+    try:
+        request_line = (await reader.readline()).decode("latin-1")
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        query = parse_qs(urlsplit(request_line.split(" ")[1]).query)
+        try:
+            result = await backend.translate(
+                query["q"][0], src=query["src"][0], dest=query["dest"][0]
+            )
+            status = "200 OK" if result is not None else "204 No Content"
+            body = json.dumps({"text": result.text if result else None})
+        except ThrottledError:
+            status, body = "429 Too Many Requests", "{}"
+        except RuntimeError as exc:
+            status, body = "500 Internal Server Error", json.dumps({"error": str(exc)})
+        payload = body.encode("utf-8")
+        writer.write(
+            f"HTTP/1.0 {status}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1") + payload
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def start_stub_server(backend: SimulatedTranslator, port: int = 0):
+    """在本机启动 HTTP 替身服务器，返回 (server, 实际端口)。"""
+    server = await asyncio.start_server(
+        lambda r, w: _serve_http(r, w, backend), "127.0.0.1", port
+    )
+    return server, server.sockets[0].getsockname()[1]
+
+
+class HttpStubTranslator:
+    """通过 HTTP 请求替身服务器的翻译器，每次请求一个短连接。"""
+
+    class _Result:
+        def __init__(self, text):
+            self.text = text
+
+    def __init__(self, port: int, host: str = "127.0.0.1") -> None:
+        self.host = host
+        self.port = port
+        self.requests = 0
+
+    async def translate(self, text, src="en", dest="zh-cn"):
+        self.requests += 1
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        path = f"/translate?q={quote(text)}&src={src}&dest={dest}"
+        writer.write(f"GET {path} HTTP/1.0\r\nHost: {self.host}\r\n\r\n".encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        if status == 204:
+            return None
+        if status != 200:
+            raise RuntimeError(f"HTTP {status}")
+        return self._Result(json.loads(body)["text"])
+
+
+@dataclass
+class Scenario:
+    name: str
+    corpus: str  # "razfull" 或 "x10"
+    mode: str = "process"  # "process" 或 "repair"
+    options: Dict = field(default_factory=dict)
+    backend: Dict = field(default_factory=dict)  # repair 场景中 failure_rate 为注入的失败比例
+    exact_requests: bool = True  # 请求数随时序/随机重试波动的场景为 False，对比时按容差放宽
+
+
+SCENARIOS = [
+    Scenario("razfull-serial", "razfull", options=dict(batch=None)),
+    Scenario("razfull-concurrent", "razfull", options=dict(concurrency=8, window=4)),
+    Scenario(
+        "razfull-batched",
+        "razfull",
+        options=dict(window=4),
+        backend=dict(batch_mode="list", latency_ms=4.0),
+    ),
+    Scenario(
+        "razfull-flaky",
+        "razfull",
+        options=dict(concurrency=8, window=4),
+        backend=dict(error_rate=0.01, none_rate=0.01),
+        exact_requests=False,
+    ),
+    Scenario(
+        "razfull-throttled",
+        "razfull",
+        options=dict(concurrency=8, window=4, rps=400),
+        backend=dict(throttle_rps=500),
+        exact_requests=False,
+    ),
+    Scenario(
+        "razfull-repair",
+        "razfull",
+        mode="repair",
+        options=dict(concurrency=8),
+        backend=dict(failure_rate=0.1),
+    ),
+    Scenario(
+        "x10-stream",
+        "x10",
+        options=dict(concurrency=16, window=8, stream=True, flush_every=20),
+    ),
+]
+NOISY_SCENARIOS = frozenset(s.name for s in SCENARIOS if not s.exact_requests)
+
+
+@dataclass
+class BenchResult:
+    scenario: str
+    words: int
+    requests: int
+    wall_seconds: float
+    words_per_sec: float
+    peak_rss_mb: float
+
+
+def write_synthetic_corpus(path: str, source: str = "razfull.csv", factor: int = 10):
+    """把真实词表放大 factor 倍：每一轮给书名和一半单词加后缀，词汇量随之增长。"""
+    records, _ = translate.compute_records(source)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["RAZ Level", "Book Title", "Word List"])
+        for round_no in range(factor):
+            for level, title, words in records:
+                suffix = f"{round_no}" if round_no else ""
+                varied = [
+                    f"{w}{suffix}" if i % 2 else w for i, w in enumerate(words)
+                ]
+                writer.writerow([level, f"{title}{suffix}"] + varied)
+
+
+def inject_failures(path: str, rate: float, seed: int = 7) -> int:
+    """把双语输出中约 rate 比例的中文单元格替换为失败占位，返回替换数。"""
+    rng = random.Random(seed)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    injected = 0
+    for row_cn in rows[1::2]:
+        for col in range(2, len(row_cn)):
+            if row_cn[col] and rng.random() < rate:
+                row_cn[col] = "[翻译失败:simulated]"
+                injected += 1
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(rows)
+    return injected
+
+
+async def _run_scenario(scenario: Scenario, workdir: str, use_http: bool) -> BenchResult:
+    corpus = "razfull.csv"
+    if scenario.corpus == "x10":
+        corpus = os.path.join(workdir, "x10.csv")
+        write_synthetic_corpus(corpus)
+    backend_options = {} if scenario.mode == "repair" else scenario.backend
+    backend = SimulatedTranslator(**backend_options)
+    translator = backend
+    server = None
+    if use_http:
+        server, port = await start_stub_server(backend)
+        translator = HttpStubTranslator(port)
+    output = os.path.join(workdir, "out.csv")
+    options = dict(pause_seconds=0, show_progress=False)
+    try:
+        if scenario.mode == "repair":
+            # 先生成完整输出并注入失败占位，再计时修复
+            await translate.process_file(
+                corpus,
+                output,
+                translator=SimulatedTranslator(latency_ms=0),
+                checkpoint=False,
+                **options,
+            )
+            inject_failures(output, scenario.backend["failure_rate"])
+            backend = SimulatedTranslator()
+            start = time.perf_counter()
+            stats = await translate.re_translate_failures(
+                output,
+                os.path.join(workdir, "fixed.csv"),
+                translator=backend,
+                **options,
+                **scenario.options,
+            )
+        else:
+            start = time.perf_counter()
+            stats = await translate.process_file(
+                corpus,
+                output,
+                translator=translator,
+                checkpoint=False,
+                **options,
+                **scenario.options,
+            )
+        wall = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return BenchResult(
+        scenario=scenario.name,
+        words=stats.total_words,
+        requests=backend.requests,
+        wall_seconds=round(wall, 3),
+        words_per_sec=round(stats.total_words / wall, 1) if wall else 0.0,
+        peak_rss_mb=round(peak_kb / 1024, 1),
+    )
+
+
+def _scenario_worker(scenario: Scenario, use_http: bool, queue) -> None:
+    sys.stdout = open(os.devnull, "w")  # 屏蔽 translate.py 的进度输出
+    with tempfile.TemporaryDirectory() as workdir:
+        queue.put(asdict(asyncio.run(_run_scenario(scenario, workdir, use_http))))
+
+
+def run_scenario(scenario: Scenario, use_http: bool = False) -> BenchResult:
+    """在独立子进程中运行一个场景，保证峰值 RSS 只属于该场景。"""
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_scenario_worker, args=(scenario, use_http, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return BenchResult(**result)
+
+
+def compare_to_baseline(
+    results: List[BenchResult],
+    baseline: Dict[str, Dict],
+    tolerance: float,
+    noisy: Iterable[str] = NOISY_SCENARIOS,
+) -> List[str]:
+    """
+    返回退化说明：吞吐低于基线 (1 - tolerance) 倍，或请求数多于基线。
+    noisy 中的场景（重试次数取决于时序或随机数）请求数允许多出基线的 tolerance 倍。
+    """
+    noisy = set(noisy)
+    problems = []
+    for result in results:
+        base = baseline.get(result.scenario)
+        if base is None:
+            continue
+        floor = base["words_per_sec"] * (1 - tolerance)
+        if result.words_per_sec < floor:
+            problems.append(
+                f"{result.scenario}: {result.words_per_sec} words/s < "
+                f"{floor:.1f}（基线 {base['words_per_sec']}）"
+            )
+        ceiling = base["requests"] * (1 + tolerance if result.scenario in noisy else 1)
+        if result.requests > ceiling:
+            problems.append(
+                f"{result.scenario}: 请求数 {result.requests} > {ceiling:.0f}"
+                f"（基线 {base['requests']}）"
+            )
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="translate.py 吞吐基准。")
+    parser.add_argument(
+        "-s", "--scenario", action="append", help="只运行指定场景，可重复。"
+    )
+    parser.add_argument("--http", action="store_true", help="经本地 HTTP 替身服务器请求。")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件路径。")
+    parser.add_argument("--save-baseline", action="store_true", help="把结果写为新基线。")
+    parser.add_argument("--compare", action="store_true", help="与基线对比。")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="允许的吞吐下降比例（默认 0.25）。"
+    )
+    args = parser.parse_args()
+
+    selected = [s for s in SCENARIOS if not args.scenario or s.name in args.scenario]
+    results = []
+    print(f"{'scenario':<20}{'words':>8}{'requests':>10}{'wall(s)':>10}"
+          f"{'words/s':>10}{'peakRSS(MB)':>13}")
+    for scenario in selected:
+        result = run_scenario(scenario, use_http=args.http)
+        results.append(result)
+        print(f"{result.scenario:<20}{result.words:>8}{result.requests:>10}"
+              f"{result.wall_seconds:>10}{result.words_per_sec:>10}"
+              f"{result.peak_rss_mb:>13}")
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update({r.scenario: asdict(r) for r in results})
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"基线已写入 {args.baseline}")
+
+    if args.compare:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            problems = compare_to_baseline(results, json.load(f), args.tolerance)
+        if problems:
+            print("性能退化：\n" + "\n".join(problems))
+            sys.exit(1)
+        print("与基线相比无退化。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# codex: 2026-10-17 紧凑语料存储：驻留词表 + int32 单词序列，可 mmap 加载的二进制格式
+"""
+紧凑语料（Corpus）。
+
+compute_records 的结果是 (等级, 书名, [单词...]) 元组列表，重复的单词各占一个 Python 字符串，
+且每次命令都要用 csv.reader 重新解析整个 CSV。Corpus 把所有字符串（等级、书名、单词）
+驻留到一张去重字符串表中，每本书只存 int32 编号序列；保存为二进制文件后 mmap 加载，
+打开大语料只需毫秒级，按需解码的字符串同样只保留一份。
+
+文件格式（小端，各区 4 字节对齐）：
+
+    头部:     MAGIC(8 字节) + 字符串数 S + 书目数 B + 单词总数 W（均为 uint32）
+    字符串表: S+1 个 uint32 偏移，第 i 个字符串位于数据区 [off[i], off[i+1])
+    书目表:   B 对 int32 (等级编号, 书名编号)
+    书目偏移: B+1 个 uint32，第 i 本书的单词编号位于 [off[i], off[i+1])
+    单词序列: W 个 int32 字符串编号
+    数据区:   所有字符串的 UTF-8 拼接
+
+Corpus 本身是 Record 序列（len / 下标 / 迭代均产出 (等级, 书名, 单词列表)），
+可直接交给 process_file 等按记录工作的函数。
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+MAGIC = b"RZCORP\x00\x01"
+CORPUS_SUFFIX = ".corpus"
+_HEADER = struct.Struct("<8sIII")
+
+Record = Tuple[str, str, List[str]]
+
+
+def is_corpus_file(path: str) -> bool:
+    """按文件头判断是否为语料二进制文件。"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class Corpus:
+    """驻留词表 + int32 编号序列的只读语料；from_records 在内存中构建，load 经 mmap 打开文件。"""
+
+    def __init__(
+        self,
+        str_offsets: Sequence[int],
+        meta: Sequence[int],
+        book_offsets: Sequence[int],
+        word_ids: Sequence[int],
+        blob,
+        *,
+        closer=None,
+    ) -> None:
+        self._str_offsets = str_offsets
+        self._meta = meta
+        self._book_offsets = book_offsets
+        self._word_ids = word_ids
+        self._blob = blob
+        self._closer = closer
+        self._strings: List[Optional[str]] = [None] * (len(str_offsets) - 1)
+        self._index: Optional[Dict[Tuple[int, int], int]] = None
+        self._ids: Dict[str, int] = {}
+        self._max_words: Optional[int] = None
+
+    # 构建与读写 -------------------------------------------------------------
+
+    @classmethod
+    def from_records(cls, records: Iterable[Record]) -> "Corpus":
+        ids: Dict[str, int] = {}
+        meta, book_offsets, word_ids = array("i"), array("I", [0]), array("i")
+        for level, title, words in records:
+            meta.append(ids.setdefault(level, len(ids)))
+            meta.append(ids.setdefault(title, len(ids)))
+            word_ids.extend(ids.setdefault(word, len(ids)) for word in words)
+            book_offsets.append(len(word_ids))
+        encoded = [text.encode("utf-8") for text in ids]
+        str_offsets = array("I", [0])
+        for data in encoded:
+            str_offsets.append(str_offsets[-1] + len(data))
+        corpus = cls(str_offsets, meta, book_offsets, word_ids, b"".join(encoded))
+        corpus._strings = list(ids)
+        return corpus
+
+    def save(self, path: str) -> None:
+        """写出二进制文件（先写临时文件再原子替换）。"""
+        sections = [
+            array("I", self._str_offsets),
+            array("i", self._meta),
+            array("I", self._book_offsets),
+            array("i", self._word_ids),
+        ]
+        if sys.byteorder != "little":
+            for section in sections:
+                section.byteswap()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, self.vocabulary_size, len(self), len(self._word_ids)))
+            for section in sections:
+                section.tofile(f)
+            f.write(bytes(self._blob))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Corpus":
+        """mmap 打开语料文件；小端机器上各区直接是文件上的零拷贝视图。"""
+        f = open(path, "rb")
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # 空文件
+            f.close()
+            raise ValueError(f"不是语料文件: {path}") from None
+        if len(mm) < _HEADER.size or mm[: len(MAGIC)] != MAGIC:
+            mm.close()
+            f.close()
+            raise ValueError(f"不是语料文件: {path}")
+        magic, n_strings, n_books, n_words = _HEADER.unpack_from(mm, 0)
+        pos = _HEADER.size
+        blob_start = pos + 4 * ((n_strings + 1) + 2 * n_books + (n_books + 1) + n_words)
+        data_size = (
+            struct.unpack_from("<I", mm, pos + 4 * n_strings)[0]
+            if blob_start <= len(mm)
+            else None
+        )
+        if data_size is None or blob_start + data_size > len(mm):
+            mm.close()
+            f.close()
+            raise ValueError(f"语料文件不完整（可能已截断）: {path}")
+        view = memoryview(mm)
+        sections = []
+        for code, count in (("I", n_strings + 1), ("i", 2 * n_books), ("I", n_books + 1), ("i", n_words)):
+            end = pos + 4 * count
+            if sys.byteorder == "little":
+                sections.append(view[pos:end].cast(code))
+            else:
+                section = array(code, view[pos:end].tobytes())
+                section.byteswap()
+                sections.append(section)
+            pos = end
+        blob = view[pos:]
+
+        def closer() -> None:
+            for section in sections:
+                if isinstance(section, memoryview):
+                    section.release()
+            blob.release()
+            try:
+                view.release()
+                mm.close()
+            except BufferError:
+                pass  # 调用方仍持有 word_ids 视图，由垃圾回收关闭映射
+            f.close()
+
+        return cls(*sections, blob, closer=closer)
+
+    def in_memory(self) -> "Corpus":
+        """复制到内存的语料（不再依赖 mmap，可在 close 之后继续使用；共享已解码的字符串）。"""
+        n_words = self._book_offsets[-1] if len(self._book_offsets) else 0
+        corpus = Corpus(
+            array("I", bytes(self._str_offsets)),
+            array("i", bytes(self._meta)),
+            array("I", bytes(self._book_offsets)),
+            array("i", bytes(self._word_ids[:n_words])),
+            bytes(self._blob),
+        )
+        corpus._strings = self._strings
+        return corpus
+
+    def close(self) -> None:
+        if self._closer is not None:
+            self._closer()
+            self._closer = None
+
+    def __enter__(self) -> "Corpus":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # 查询 -------------------------------------------------------------------
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._str_offsets) - 1
+
+    def string(self, string_id: int) -> str:
+        """按编号取字符串；首次访问时解码并缓存，之后返回同一个对象。"""
+        text = self._strings[string_id]
+        if text is None:
+            start, end = self._str_offsets[string_id], self._str_offsets[string_id + 1]
+            text = self._strings[string_id] = bytes(self._blob[start:end]).decode("utf-8")
+        return text
+
+    def word_ids(self, index: int) -> Sequence[int]:
+        return self._word_ids[self._book_offsets[index] : self._book_offsets[index + 1]]
+
+    def __len__(self) -> int:
+        return len(self._book_offsets) - 1
+
+    def __getitem__(self, index: int) -> Record:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        level_id, title_id = self._meta[2 * index], self._meta[2 * index + 1]
+        return (
+            self.string(level_id),
+            self.string(title_id),
+            [self.string(i) for i in self.word_ids(index)],
+        )
+
+    def __iter__(self) -> Iterator[Record]:
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def max_words(self) -> int:
+        if self._max_words is None:
+            offsets = self._book_offsets
+            self._max_words = max(
+                (offsets[i + 1] - offsets[i] for i in range(len(self))), default=0
+            )
+        return self._max_words
+
+    @property
+    def total_words(self) -> int:
+        return self._book_offsets[-1]
+
+    def find(self, level: str, title: str) -> Optional[int]:
+        """按 (等级, 书名) 查找书目序号（同名取第一本）；首次调用时建立索引。"""
+        if self._index is None:
+            self._index = {}
+            for i in range(len(self)):
+                self._index.setdefault((self._meta[2 * i], self._meta[2 * i + 1]), i)
+            self._ids = {self.string(i): i for i in set(self._meta)}
+        level_id, title_id = self._ids.get(level), self._ids.get(title)
+        if level_id is None or title_id is None:
+            return None
+        return self._index.get((level_id, title_id))
+
+    def keys(self) -> Set[Tuple[str, str]]:
+        """全部 (等级, 书名)，与 get_processed_books 的返回值可直接比较。"""
+        return {
+            (self.string(self._meta[2 * i]), self.string(self._meta[2 * i + 1]))
+            for i in range(len(self))
+        }
+
+    def head(self, limit: int) -> "Corpus":
+        """前 limit 本书组成的语料（共享同一份字符串表）。"""
+        count = max(0, min(limit, len(self)))
+        corpus = Corpus(
+            self._str_offsets,
+            self._meta[: 2 * count],
+            self._book_offsets[: count + 1],
+            self._word_ids,
+            self._blob,
+        )
+        corpus._strings = self._strings
+        return corpus
@@ -0,0 +1,196 @@
+# codex: 2026-10-17 单词规范化：大小写折叠、去首尾标点与基于规则的轻量词形还原，翻译请求按规范形式去重
+"""
+单词规范化。
+
+RAZ 词表里同一个词常以多种表面形式出现：cat/cats、jump/jumps、Go/go，以及带多余空格或
+标点的词（如 razfull.csv 中 "Go,Go,Go" 一行）。parse_word_list 只去首尾空白，每种写法
+各发一次翻译请求。WordNormalizer 把单词映射为规范形式，翻译请求按规范形式去重，
+英文行仍保留原写法。可组合的步骤（STEPS）：
+
+- punct：去掉首尾标点并合并内部空白（don't、ice-cream 内部的标点保留）；
+- lemma：轻量词形还原，先查例外表（不规则复数、只有复数形式的词等），再按 -ies/-es/-s
+  词尾规则还原为单数/原形；只处理单个全字母单词，首字母大写的词视为专有名词不处理；
+- case：大小写折叠（casefold）。
+
+规则有意保守，只处理名词复数与第三人称单数，不处理 -ing/-ed（bed、king 等极易误伤）。
+"""
+
+import csv
+import re
+from typing import Dict, Iterable, Optional, Sequence
+
+STEPS = ("punct", "lemma", "case")
+PRESETS = {"none": (), "basic": ("punct", "case"), "all": STEPS}
+
+_EDGE_PUNCT = re.compile(r"^[\W_]+|[\W_]+$")
+_KEEP_SUFFIXES = ("ss", "us", "is")
+
+# 例外表：表面形式 -> 规范形式；映射为自身表示保持不变
+LEMMA_EXCEPTIONS: Dict[str, str] = {
+    # 不规则复数
+    "children": "child",
+    "men": "man",
+    "women": "woman",
+    "feet": "foot",
+    "teeth": "tooth",
+    "mice": "mouse",
+    "geese": "goose",
+    "people": "person",
+    "oxen": "ox",
+    "wolves": "wolf",
+    "knives": "knife",
+    "wives": "wife",
+    "halves": "half",
+    "shelves": "shelf",
+    "loaves": "loaf",
+    "calves": "calf",
+    "thieves": "thief",
+    "scarves": "scarf",
+    "potatoes": "potato",
+    "tomatoes": "tomato",
+    "heroes": "hero",
+    "mosquitoes": "mosquito",
+    "echoes": "echo",
+    "volcanoes": "volcano",
+    "mangoes": "mango",
+    "zeroes": "zero",
+    "dominoes": "domino",
+    "tornadoes": "tornado",
+    "torpedoes": "torpedo",
+    "buffaloes": "buffalo",
+    "quizzes": "quiz",
+    "buses": "bus",
+    "movies": "movie",
+    "cookies": "cookie",
+    "headaches": "headache",
+    # 第三人称单数的不规则形式
+    "goes": "go",
+    "does": "do",
+    "has": "have",
+    # 以 s 结尾但不是复数、或复数另有含义的词；leaves/lives 更常见的是第三人称动词
+    # （he leaves / she lives），不能并入名词 leaf/life
+    "leaves": "leaves",
+    "lives": "lives",
+    "always": "always",
+    "perhaps": "perhaps",
+    "sometimes": "sometimes",
+    "besides": "besides",
+    "nowadays": "nowadays",
+    "afterwards": "afterwards",
+    "towards": "towards",
+    "backwards": "backwards",
+    "upstairs": "upstairs",
+    "downstairs": "downstairs",
+    "indoors": "indoors",
+    "outdoors": "outdoors",
+    "yours": "yours",
+    "ours": "ours",
+    "hers": "hers",
+    "theirs": "theirs",
+    "others": "others",
+    "goods": "goods",
+    "manners": "manners",
+    "checkers": "checkers",
+    "goggles": "goggles",
+    "physics": "physics",
+    "mathematics": "mathematics",
+    "christmas": "christmas",
+    "news": "news",
+    "series": "series",
+    "species": "species",
+    "thanks": "thanks",
+    "glasses": "glasses",
+    "sunglasses": "sunglasses",
+    "clothes": "clothes",
+    "pants": "pants",
+    "jeans": "jeans",
+    "shorts": "shorts",
+    "trousers": "trousers",
+    "pajamas": "pajamas",
+    "scissors": "scissors",
+}
+
+
+def lemmatize(word: str, exceptions: Dict[str, str] = LEMMA_EXCEPTIONS) -> str:
+    """按例外表与词尾规则还原单个单词；不适用时原样返回。"""
+    lower = word.lower()
+    if lower in exceptions:
+        return exceptions[lower] if word == lower else word
+    if (
+        word != lower
+        or len(lower) <= 3
+        or not lower.isalpha()
+        or not lower.endswith("s")
+        or lower.endswith(_KEEP_SUFFIXES)
+    ):
+        return word
+    if lower.endswith("ies") and len(lower) > 4:
+        return lower[:-3] + "y"  # babies -> baby
+    if lower.endswith(("ches", "shes", "sses", "xes", "zzes")):
+        return lower[:-2]  # boxes -> box
+    return lower[:-1]  # cats -> cat, jumps -> jump
+
+
+def load_exceptions(path: str) -> Dict[str, str]:
+    """
+    读取例外表 CSV：每行 "表面形式,规范形式"，规范形式留空表示保持不变；# 开头的行为注释。
+    """
+    table: Dict[str, str] = {}
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.reader(f):
+            if not row or not row[0].strip() or row[0].lstrip().startswith("#"):
+                continue
+            surface = row[0].strip().lower()
+            lemma = row[1].strip().lower() if len(row) > 1 else ""
+            table[surface] = lemma or surface
+    return table
+
+
+class WordNormalizer:
+    """按 steps（STEPS 的子集，顺序固定为 punct、lemma、case）把单词映射为规范形式。"""
+
+    def __init__(
+        self,
+        steps: Iterable[str] = PRESETS["basic"],
+        exceptions: Optional[Dict[str, str]] = None,
+    ) -> None:
+        steps = set(steps)
+        unknown = steps - set(STEPS)
+        if unknown:
+            raise ValueError(
+                f"未知的规范化步骤 {', '.join(sorted(unknown))}，可选: {', '.join(STEPS)}"
+            )
+        self.steps = tuple(step for step in STEPS if step in steps)
+        self.exceptions = dict(LEMMA_EXCEPTIONS)
+        self.exceptions.update(exceptions or {})
+
+    @classmethod
+    def parse(
+        cls, spec: str, exceptions_path: Optional[str] = None
+    ) -> Optional["WordNormalizer"]:
+        """
+        解析命令行写法：预设名（none/basic/all）或逗号分隔的步骤，如 "punct,case"。
+        none 返回 None（不规范化）。
+        """
+        spec = spec.strip().lower()
+        if spec in PRESETS:
+            steps: Sequence[str] = PRESETS[spec]
+        else:
+            steps = [step.strip() for step in spec.split(",") if step.strip()]
+        if not steps:
+            return None
+        exceptions = load_exceptions(exceptions_path) if exceptions_path else None
+        return cls(steps, exceptions)
+
+    def __call__(self, word: str) -> str:
+        text = word
+        if "punct" in self.steps:
+            text = " ".join(_EDGE_PUNCT.sub("", text).split())
+        if "lemma" in self.steps:
+            text = lemmatize(text, self.exceptions)
+        if "case" in self.steps:
+            text = text.casefold()
+        return text or word.strip()  # 全是标点时保留原词，不合并成空请求
+
+    def __repr__(self) -> str:
+        return f"WordNormalizer({','.join(self.steps)})"
@@ -0,0 +1,228 @@
+# codex: 2026-10-17 离线英汉词典后端：排序二进制索引 + mmap 二分查找，未命中才请求远程翻译器
+"""
+离线词典后端。
+
+把 ECDICT 风格的英汉词典 CSV（表头含 word / translation 列；否则取前两列）
+编译成紧凑的排序索引文件，运行时 mmap 后二分查找，启动几乎不花时间：
+
+    头部:   MAGIC(8 字节) + 词条数 N(uint32)
+    偏移表: N+1 个 uint64，第 i 条记录位于 [off[i], off[i+1])
+    数据区: 每条记录为 "小写单词\\0译文"（UTF-8），按单词字节序排序
+
+OfflineTranslator 提供与 googletrans 相同的 translate(text, src, dest) 接口与 .text 结果，
+词典中没有的词才交给 fallback 翻译器。
+"""
+
+import argparse
+import csv
+import mmap
+import os
+import re
+import struct
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+MAGIC = b"RZDICT\x00\x01"
+_HEADER = struct.Struct("<8sI")
+_OFFSET = struct.Struct("<Q")
+_POS_PREFIX = re.compile(r"^\s*(?:[a-z]+\.\s*)+", re.IGNORECASE)
+DICT_DESTS = ("zh-cn", "zh")
+
+
+def short_translation(raw: str) -> str:
+    """从 ECDICT 的多行释义中取第一行第一个义项，并去掉 "n." "vt." 之类的词性前缀。"""
+    first_line = raw.replace("\\n", "\n").strip().split("\n", 1)[0]
+    first_line = _POS_PREFIX.sub("", first_line)
+    return re.split(r"[；;]", first_line, maxsplit=1)[0].strip()
+
+
+def iter_dictionary_csv(csv_path: str) -> Iterator[Tuple[str, str]]:
+    """逐行读取词典 CSV，产出 (小写单词, 简短译文)，跳过没有译文的词条。"""
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        lowered = [h.strip().lower() for h in header]
+        if "word" in lowered and "translation" in lowered:
+            word_idx, text_idx = lowered.index("word"), lowered.index("translation")
+        else:
+            word_idx, text_idx = 0, 1
+            reader = _prepend(header, reader)
+        for row in reader:
+            if len(row) <= max(word_idx, text_idx):
+                continue
+            word = row[word_idx].strip().lower()
+            text = short_translation(row[text_idx])
+            if word and text:
+                yield word, text
+
+
+def _prepend(first: List[str], rows: Iterable[List[str]]) -> Iterator[List[str]]:
+    yield first
+    yield from rows
+
+
+def build_index(csv_path: str, index_path: str) -> int:
+    """把词典 CSV 编译为排序索引文件（先写临时文件再原子替换），返回词条数。"""
+    entries: Dict[bytes, bytes] = {}
+    for word, text in iter_dictionary_csv(csv_path):
+        entries.setdefault(word.encode("utf-8"), text.encode("utf-8"))
+    keys = sorted(entries)
+
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(keys)))
+        offset = _HEADER.size + _OFFSET.size * (len(keys) + 1)
+        for key in keys:
+            f.write(_OFFSET.pack(offset))
+            offset += len(key) + 1 + len(entries[key])
+        f.write(_OFFSET.pack(offset))
+        for key in keys:
+            f.write(key + b"\0" + entries[key])
+    os.replace(tmp_path, index_path)
+    return len(keys)
+
+
+def ensure_index(dict_path: str) -> str:
+    """dict_path 为 CSV 时在旁边生成/刷新 <dict_path>.idx 并返回其路径；已是索引则原样返回。"""
+    with open(dict_path, "rb") as f:
+        if f.read(len(MAGIC)) == MAGIC:
+            return dict_path
+    index_path = dict_path + ".idx"
+    if not os.path.exists(index_path) or os.path.getmtime(
+        index_path
+    ) < os.path.getmtime(dict_path):
+        build_index(dict_path, index_path)
+    return index_path
+
+
+class OfflineDictionary:
+    """只读的 mmap 词典索引，lookup 为 O(log N) 二分查找，不把词条载入 Python 对象。"""
+
+    def __init__(self, index_path: str) -> None:
+        self.index_path = index_path
+        self._file = open(index_path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"不是离线词典索引文件: {index_path}")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entry(self, i: int) -> Tuple[bytes, bytes]:
+        base = _HEADER.size + _OFFSET.size * i
+        start = _OFFSET.unpack_from(self._mm, base)[0]
+        end = _OFFSET.unpack_from(self._mm, base + _OFFSET.size)[0]
+        key, _, value = self._mm[start:end].partition(b"\0")
+        return key, value
+
+    def lookup(self, word: str) -> Optional[str]:
+        target = word.strip().lower().encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key, value = self._entry(mid)
+            if key < target:
+                lo = mid + 1
+            elif key > target:
+                hi = mid
+            else:
+                return value.decode("utf-8")
+        return None
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+
+@dataclass
+class OfflineResult:
+    """与 googletrans.Translated 对齐的最小结果对象。"""
+
+    text: str
+    src: str
+    dest: str
+    origin: str
+
+
+class WordNotFoundError(LookupError):
+    """
+    离线词典中没有该词且没有 fallback。对同一个词必然重现，retryable = False：
+    translate.py 的调度器直接写失败占位，不重试、不计入熔断。
+    """
+
+    retryable = False
+
+
+class OfflineTranslator:
+    """
+    先查离线词典，未命中（或目标语言不是中文）再委托 fallback 翻译器。
+    支持列表输入（batch_mode = "list"）：命中的词就地返回，其余整体交给 fallback；
+    没有 fallback 时未命中的位置为 None，只有这些词失败，同块其余的词不受影响。
+    hits/misses 记录词典命中情况。
+    """
+
+    batch_mode = "list"
+
+    def __init__(self, dictionary: OfflineDictionary, fallback=None) -> None:
+        self.dictionary = dictionary
+        self.fallback = fallback
+        self.hits = 0
+        self.misses = 0
+        self._fallback_takes_lists = getattr(fallback, "batch_mode", None) == "list"
+
+    def _local(self, text: str, src: str, dest: str) -> Optional[OfflineResult]:
+        if src != "en" or dest.lower() not in DICT_DESTS:
+            return None
+        found = self.dictionary.lookup(text)
+        if found is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return OfflineResult(found, src, dest, text)
+
+    async def translate(self, text, src: str = "en", dest: str = "zh-cn"):
+        if isinstance(text, (list, tuple)):
+            return await self._translate_many(list(text), src, dest)
+        local = self._local(text, src, dest)
+        if local is not None:
+            return local
+        if self.fallback is None:
+            raise WordNotFoundError(f"离线词典中没有 '{text}'")
+        return await self.fallback.translate(text, src=src, dest=dest)
+
+    async def _translate_many(self, texts: List[str], src: str, dest: str) -> list:
+        results: List[object] = [self._local(text, src, dest) for text in texts]
+        missing = [i for i, r in enumerate(results) if r is None]
+        if not missing or self.fallback is None:
+            return results
+        if self._fallback_takes_lists:
+            remote = await self.fallback.translate(
+                [texts[i] for i in missing], src=src, dest=dest
+            )
+            for i, result in zip(missing, remote):
+                results[i] = result
+        else:
+            for i in missing:
+                results[i] = await self.fallback.translate(texts[i], src=src, dest=dest)
+        return results
+
+    def close(self) -> None:
+        self.dictionary.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="把英汉词典 CSV 编译为离线索引。")
+    parser.add_argument("csv_path", help="ECDICT 风格的词典 CSV。")
+    parser.add_argument("index_path", nargs="?", help="索引输出路径，默认 <csv>.idx。")
+    args = parser.parse_args()
+    index_path = args.index_path or args.csv_path + ".idx"
+    count = build_index(args.csv_path, index_path)
+    print(f"已写入 {index_path}，共 {count} 个词条。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# codex: 2026-10-17 批量预取单词音标与发音音频，写入按内容寻址的本地存储与 JSON 索引，供 kid_quiz 离线使用
+"""
+发音预取。
+
+kid_quiz.html 首次点击“发音”时才请求 dictionaryapi.dev，网络慢时要等好几秒。
+prefetch 从双语 CSV 取出全部英文单词，并发请求词典 API（共享限速器、失败退避重试），
+把音标写入索引，把音频按内容寻址保存：
+
+    <out_dir>/index.json                      {"version", "api", "words": {单词: {"phonetic", "audio"}}}
+    <out_dir>/audio/<sha256 前 2 位>/<sha256>.<扩展名>
+
+同一段音频只存一份；索引中 audio 为相对 out_dir 的路径，API 明确查不到的词记为空条目，
+不会重复请求。网络错误等暂时失败的词不写入索引，下次运行自动补齐（断点续传）；
+索引每完成 save_every 个词原子写出一次，中断时也会写出。
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import posixpath
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Dict, Iterable, List, Tuple
+
+DICTIONARY_API_BASE = "https://api.dictionaryapi.dev/api/v2/entries/en/"
+INDEX_NAME = "index.json"
+INDEX_VERSION = 1
+AUDIO_DIR = "audio"
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class NotFound(Exception):
+    """词典 API 返回 404：该词没有词条。"""
+
+
+def vocabulary(csv_path: str) -> List[str]:
+    """双语 CSV 中的全部英文单词（小写、去重、按首次出现顺序），与 kid_quiz 的查询键一致。"""
+    from quiz_export import iter_bilingual_books
+
+    words: Dict[str, None] = {}
+    for _, _, _, pairs in iter_bilingual_books(csv_path):
+        for en, _ in pairs:
+            key = en.strip().lower()
+            if key:
+                words.setdefault(key, None)
+    return list(words)
+
+
+def parse_entry(data) -> Tuple[str, str]:
+    """从 API 响应中取第一个音标与第一个音频地址，规则与 kid_quiz 的 fetchPronunciation 相同。"""
+    phonetic = audio = ""
+    for entry in data if isinstance(data, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        for item in entry.get("phonetics") or []:
+            if not phonetic and item.get("text"):
+                phonetic = item["text"]
+            if not audio and item.get("audio"):
+                audio = item["audio"]
+        if not phonetic and entry.get("phonetic"):
+            phonetic = entry["phonetic"]
+    return phonetic, audio
+
+
+def load_index(out_dir: str) -> Dict[str, dict]:
+    path = os.path.join(out_dir, INDEX_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("words", {})
+
+
+def save_index(out_dir: str, words: Dict[str, dict], api_base: str) -> None:
+    path = os.path.join(out_dir, INDEX_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"version": INDEX_VERSION, "api": api_base, "words": dict(sorted(words.items()))},
+            f,
+            ensure_ascii=False,
+            indent=0,
+        )
+    os.replace(tmp_path, path)
+
+
+def store_audio(out_dir: str, data: bytes, url: str) -> str:
+    """按 sha256 保存音频（已存在则跳过），返回相对 out_dir 的路径。"""
+    digest = hashlib.sha256(data).hexdigest()
+    ext = posixpath.splitext(urllib.parse.urlparse(url).path)[1].lower() or ".mp3"
+    rel_path = f"{AUDIO_DIR}/{digest[:2]}/{digest}{ext}"
+    path = os.path.join(out_dir, *rel_path.split("/"))
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return rel_path
+
+
+def _http_get(url: str, timeout: float) -> bytes:
+    request = urllib.request.Request(url, headers={"User-Agent": "raz-kid-quiz-prefetch"})
+    with urllib.request.urlopen(request, timeout=timeout) as resp:
+        return resp.read()
+
+
+class Prefetcher:
+    """
+    并发预取器：最多 concurrency 个请求同时进行，limiter（带 async acquire() 的限速器，
+    如 translate.TokenBucket）在词典请求与音频下载之间共享。
+    """
+
+    def __init__(
+        self,
+        out_dir: str,
+        *,
+        api_base: str = DICTIONARY_API_BASE,
+        concurrency: int = 4,
+        limiter=None,
+        max_retries: int = 2,
+        retry_pause: float = 0.5,
+        timeout: float = 10.0,
+        save_every: int = 50,
+    ) -> None:
+        self.out_dir = out_dir
+        self.api_base = api_base
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.retry_pause = retry_pause
+        self.timeout = timeout
+        self.save_every = max(1, save_every)
+        self._gate = asyncio.Semaphore(max(1, concurrency))
+        self.fetched = 0
+        self.missing = 0
+        self.failed: List[str] = []
+
+    async def _get(self, url: str) -> bytes:
+        """带限速与退避重试的 GET；404 抛 NotFound，其余错误重试用尽后原样抛出。"""
+        attempt = 0
+        while True:
+            try:
+                async with self._gate:
+                    if self.limiter is not None:
+                        await self.limiter.acquire()
+                    return await asyncio.to_thread(_http_get, url, self.timeout)
+            except urllib.error.HTTPError as exc:
+                if exc.code == 404:
+                    raise NotFound(url) from None
+                if exc.code not in _RETRY_STATUS or attempt >= self.max_retries:
+                    raise
+            except (urllib.error.URLError, OSError):
+                if attempt >= self.max_retries:
+                    raise
+            attempt += 1
+            await asyncio.sleep(self.retry_pause * 2 ** (attempt - 1))
+
+    async def fetch_word(self, word: str) -> dict:
+        """查询一个词并保存音频，返回索引条目；查无此词时为空条目。"""
+        url = self.api_base + urllib.parse.quote(word)
+        try:
+            data = json.loads(await self._get(url))
+        except NotFound:
+            return {"phonetic": "", "audio": ""}
+        phonetic, audio_url = parse_entry(data)
+        audio = ""
+        if audio_url:
+            audio_url = urllib.parse.urljoin(url, audio_url)  # 兼容相对地址与 //host 形式
+            try:
+                audio = store_audio(self.out_dir, await self._get(audio_url), audio_url)
+            except NotFound:
+                pass
+        return {"phonetic": phonetic, "audio": audio}
+
+    async def run(self, words: Iterable[str]) -> Dict[str, dict]:
+        """预取索引中还没有的词，返回完整索引；中途异常或取消时也会先写出已完成部分。"""
+        os.makedirs(self.out_dir, exist_ok=True)
+        index = load_index(self.out_dir)
+        todo = [word for word in dict.fromkeys(words) if word not in index]
+        done_since_save = 0
+
+        async def one(word: str) -> None:
+            nonlocal done_since_save
+            try:
+                index[word] = await self.fetch_word(word)
+            except Exception:
+                self.failed.append(word)  # 暂时失败：不写入索引，下次运行重试
+                return
+            if index[word]["phonetic"] or index[word]["audio"]:
+                self.fetched += 1
+            else:
+                self.missing += 1
+            done_since_save += 1
+            if done_since_save >= self.save_every:
+                save_index(self.out_dir, index, self.api_base)
+                done_since_save = 0
+
+        try:
+            await asyncio.gather(*(one(word) for word in todo))
+        finally:
+            save_index(self.out_dir, index, self.api_base)
+        return index
+
+
+async def prefetch(
+    csv_path: str,
+    out_dir: str,
+    *,
+    api_base: str = DICTIONARY_API_BASE,
+    concurrency: int = 4,
+    limiter=None,
+    max_retries: int = 2,
+    retry_pause: float = 0.5,
+) -> Prefetcher:
+    """读取 csv_path 的词表并预取到 out_dir，返回带统计的 Prefetcher。"""
+    prefetcher = Prefetcher(
+        out_dir,
+        api_base=api_base,
+        concurrency=concurrency,
+        limiter=limiter,
+        max_retries=max_retries,
+        retry_pause=retry_pause,
+    )
+    await prefetcher.run(vocabulary(csv_path))
+    return prefetcher
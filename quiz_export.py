@@ -0,0 +1,122 @@
+# codex: 2026-10-17 把双语 CSV 导出为 kid_quiz 用的按等级分片 JSON（gzip 预压缩）+ 带哈希的清单
+"""
+kid_quiz 数据导出。
+
+把 translate.py 输出的两行双语 CSV（中文行 + 英文行）按 RAZ 等级拆成紧凑 JSON 分片：
+
+    {"level": "aa", "books": [{"en": 英文书名, "zh": 中文书名, "words": [[英文, 中文], ...]}]}
+
+每个分片写出 <等级>.<哈希前 12 位>.json 及同名 .json.gz（gzip 预压缩，mtime 固定为 0，
+内容不变则字节不变）。文件名带内容哈希，浏览器可长期缓存；manifest.json 记录等级名、
+书目数、单词数、sha256 与文件名，页面每次只需取清单和所选等级的分片。
+"""
+
+import csv
+import gzip
+import hashlib
+import json
+import os
+import re
+from typing import Dict, Iterator, List, Tuple
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+_SHARD_NAME = re.compile(r"^[A-Za-z0-9_-]+\.[0-9a-f]{12}\.json(\.gz)?$")
+
+Book = Tuple[str, str, str, List[Tuple[str, str]]]  # (等级, 英文书名, 中文书名, [(英文, 中文)])
+
+
+def iter_bilingual_books(path: str) -> Iterator[Book]:
+    """
+    逐本读取两行格式双语 CSV，与 kid_quiz.html 的 parseRazFull 规则一致：
+    中英文都为空的列跳过，缺中文时以英文代替。表头首列不是 "RAZ Level" 时抛出 ValueError。
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header or header[0].strip() != "RAZ Level":
+            raise ValueError(f"{path} 不是双语输出文件（表头首列应为 RAZ Level）")
+        for row_zh in reader:
+            row_en = next(reader, [])
+            level = (row_en[0] if row_en else "") or (row_zh[0] if row_zh else "")
+            level = level.strip() or "unknown"
+            words = []
+            for j in range(2, max(len(row_en), len(row_zh))):
+                en = row_en[j].strip() if j < len(row_en) else ""
+                zh = row_zh[j].strip() if j < len(row_zh) else ""
+                if en or zh:
+                    words.append((en, zh or en))
+            title_en = row_en[1].strip() if len(row_en) > 1 else ""
+            title_zh = row_zh[1].strip() if len(row_zh) > 1 else ""
+            yield level, title_en, title_zh, words
+
+
+def group_by_level(path: str) -> Dict[str, List[dict]]:
+    """按等级归并书目（保持首次出现顺序），值为分片中的 books 列表。"""
+    levels: Dict[str, List[dict]] = {}
+    for level, title_en, title_zh, words in iter_bilingual_books(path):
+        levels.setdefault(level, []).append(
+            {"en": title_en, "zh": title_zh, "words": [list(w) for w in words]}
+        )
+    return levels
+
+
+def _safe_name(level: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_-]", "_", level) or "_"
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def export_shards(input_path: str, out_dir: str) -> dict:
+    """
+    导出全部等级分片与清单，返回清单内容。先写分片，最后原子替换 manifest.json，
+    再删除清单不再引用的旧分片，页面在任何时刻读到的清单都指向完整文件。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    entries = []
+    used_names: Dict[str, int] = {}
+    for level, books in group_by_level(input_path).items():
+        data = json.dumps(
+            {"level": level, "books": books}, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        base = _safe_name(level)
+        used_names[base] = used_names.get(base, 0) + 1
+        if used_names[base] > 1:  # 不同等级清洗后同名时加序号区分
+            base = f"{base}_{used_names[base]}"
+        file_name = f"{base}.{digest[:12]}.json"
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        _write_atomic(os.path.join(out_dir, file_name), data)
+        _write_atomic(os.path.join(out_dir, file_name + ".gz"), compressed)
+        entries.append(
+            {
+                "level": level,
+                "books": len(books),
+                "words": sum(len(book["words"]) for book in books),
+                "sha256": digest,
+                "file": file_name,
+                "bytes": len(data),
+                "gzip_bytes": len(compressed),
+            }
+        )
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "source": os.path.basename(input_path),
+        "levels": entries,
+    }
+    _write_atomic(
+        os.path.join(out_dir, MANIFEST_NAME),
+        json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8"),
+    )
+
+    keep = {e["file"] for e in entries} | {e["file"] + ".gz" for e in entries}
+    for name in os.listdir(out_dir):
+        if _SHARD_NAME.match(name) and name not in keep:
+            os.remove(os.path.join(out_dir, name))
+    return manifest
@@ -0,0 +1,330 @@
+# codex: 2026-10-17 服务端间隔复习调度：每个学习者一个 SQLite，按到期时间建索引，附带 asyncio 小型 HTTP API
+"""
+间隔复习（艾宾浩斯）调度服务。
+
+规则与 kid_quiz.html 的本地实现一致：
+
+- 答错：加入错题本，wrong_count + 1，记录 last_wrong_at；
+  距上次答错满 ERROR_SCHEDULE_DAYS[wrong_count - 1] 天（超出取最后一档）时到期。
+- 答对：移出错题本，加入/更新掌握本，review_count + 1，记录 last_review_at（首次另记 first_right_at）；
+  距上次复习满 MASTERED_SCHEDULE_DAYS[review_count - 1] 天时到期。
+
+每个学习者一个 SQLite 文件（<db_dir>/<学习者>.sqlite3），错题表与掌握表以 (等级, 英文) 为主键，
+写入时算好 due_at 并建 (due_at, level) 索引，“现在有哪些到期”只读到期的行；
+“排除已掌握抽 N 题”对共享词表（<db_dir>/vocab.sqlite3，ATTACH 进来）做 NOT EXISTS 主键查找，
+不再像页面那样在整个等级上逐个 some() 扫描。时间均为毫秒时间戳，与页面的 Date.now() 一致。
+
+SrsServer 用 asyncio.start_server 提供 JSON API（带 CORS，页面可从其他端口访问）：
+
+    GET  /api/learners/<id>/due                          各等级到期的错题数与掌握数
+    GET  /api/learners/<id>/pick?level=&source=&limit=   抽题，source 为 all/errors/excludeMastered/onlyMastered
+    GET  /api/learners/<id>/errors?level=                错题本
+    POST /api/learners/<id>/answer   {"level", "en", "zh", "correct"}
+    POST /api/learners/<id>/clear    {"level"}
+    POST /api/learners/<id>/import   {"level", "errors": [...], "mastered": [...]}（迁移页面 localStorage）
+"""
+
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import time
+import urllib.parse
+from typing import Dict, Iterable, List, Optional, Tuple
+
+ERROR_SCHEDULE_DAYS = (1, 2, 4, 7, 15, 30)
+MASTERED_SCHEDULE_DAYS = (3, 7, 14, 30)
+DAY_MS = 86400000
+VOCAB_NAME = "vocab.sqlite3"
+SOURCES = ("all", "errors", "excludeMastered", "onlyMastered")
+_LEARNER = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS errors (
+    level TEXT NOT NULL, en TEXT NOT NULL, zh TEXT NOT NULL DEFAULT '',
+    wrong_count INTEGER NOT NULL, last_wrong_at INTEGER NOT NULL, due_at INTEGER NOT NULL,
+    PRIMARY KEY (level, en)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS errors_due ON errors (due_at, level);
+CREATE TABLE IF NOT EXISTS mastered (
+    level TEXT NOT NULL, en TEXT NOT NULL, zh TEXT NOT NULL DEFAULT '',
+    review_count INTEGER NOT NULL, first_right_at INTEGER NOT NULL,
+    last_review_at INTEGER NOT NULL, due_at INTEGER NOT NULL,
+    PRIMARY KEY (level, en)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS mastered_due ON mastered (due_at, level);
+"""
+
+
+def due_at(schedule: Tuple[int, ...], count: int, last_at: int) -> int:
+    """第 count 次（从 1 起）之后的到期时间戳。"""
+    return last_at + schedule[min(max(count, 1) - 1, len(schedule) - 1)] * DAY_MS
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def build_vocabulary(db_dir: str, books: Dict[str, List[dict]]) -> int:
+    """
+    把 quiz_export.group_by_level 的结果写入共享词表（整表替换），返回词条数。
+    同一等级内重复的英文只保留第一次出现的中文。
+    """
+    os.makedirs(db_dir, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(db_dir, VOCAB_NAME))
+    with conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS words (level TEXT NOT NULL, en TEXT NOT NULL, "
+            "zh TEXT NOT NULL, PRIMARY KEY (level, en)) WITHOUT ROWID"
+        )
+        conn.execute("DELETE FROM words")
+        conn.executemany(
+            "INSERT OR IGNORE INTO words VALUES (?, ?, ?)",
+            (
+                (level, en, zh or en)
+                for level, level_books in books.items()
+                for book in level_books
+                for en, zh in book["words"]
+                if en
+            ),
+        )
+    count = conn.execute("SELECT COUNT(*) FROM words").fetchone()[0]
+    conn.close()
+    return count
+
+
+class LearnerStore:
+    """单个学习者的复习记录。"""
+
+    def __init__(self, path: str, vocab_path: Optional[str] = None) -> None:
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        self.has_vocab = bool(vocab_path and os.path.exists(vocab_path))
+        if self.has_vocab:
+            self._conn.execute("ATTACH DATABASE ? AS vocab", (vocab_path,))
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def record_wrong(self, level: str, en: str, zh: str = "", now: Optional[int] = None) -> dict:
+        now = _now_ms() if now is None else now
+        row = self._conn.execute(
+            "SELECT wrong_count FROM errors WHERE level=? AND en=?", (level, en)
+        ).fetchone()
+        count = row["wrong_count"] + 1 if row else 1
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO errors VALUES (?, ?, ?, ?, ?, ?)",
+                (level, en, zh, count, now, due_at(ERROR_SCHEDULE_DAYS, count, now)),
+            )
+        return {"wrong_count": count, "due_at": due_at(ERROR_SCHEDULE_DAYS, count, now)}
+
+    def record_right(self, level: str, en: str, zh: str = "", now: Optional[int] = None) -> dict:
+        now = _now_ms() if now is None else now
+        row = self._conn.execute(
+            "SELECT review_count, first_right_at FROM mastered WHERE level=? AND en=?",
+            (level, en),
+        ).fetchone()
+        count = row["review_count"] + 1 if row else 1
+        first = row["first_right_at"] if row else now
+        with self._conn:
+            self._conn.execute("DELETE FROM errors WHERE level=? AND en=?", (level, en))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO mastered VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (level, en, zh, count, first, now, due_at(MASTERED_SCHEDULE_DAYS, count, now)),
+            )
+        return {"review_count": count, "due_at": due_at(MASTERED_SCHEDULE_DAYS, count, now)}
+
+    def due_counts(self, now: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """{等级: {"errors": 到期错题数, "mastered": 到期掌握数}}，只含有到期项的等级。"""
+        now = _now_ms() if now is None else now
+        counts: Dict[str, Dict[str, int]] = {}
+        # 无统计信息时查询规划器倾向按主键扫描以省去 GROUP BY 排序，这里固定走到期索引，只读已到期的行
+        for table in ("errors", "mastered"):
+            for level, n in self._conn.execute(
+                f"SELECT level, COUNT(*) FROM {table} INDEXED BY {table}_due "
+                "WHERE due_at <= ? GROUP BY level",
+                (now,),
+            ):
+                counts.setdefault(level, {"errors": 0, "mastered": 0})[table] = n
+        return counts
+
+    def errors(self, level: str) -> List[dict]:
+        return [
+            dict(row)
+            for row in self._conn.execute(
+                "SELECT en, zh, wrong_count, last_wrong_at, due_at FROM errors WHERE level=?",
+                (level,),
+            )
+        ]
+
+    def clear_errors(self, level: str) -> int:
+        with self._conn:
+            return self._conn.execute("DELETE FROM errors WHERE level=?", (level,)).rowcount
+
+    def pick(self, level: str, source: str = "all", limit: int = 20) -> List[dict]:
+        """随机抽取最多 limit 个 {"en", "zh"}；all/excludeMastered 需要共享词表。"""
+        if source not in SOURCES:
+            raise ValueError(f"未知的题源 '{source}'，可选: {', '.join(SOURCES)}")
+        if source == "errors":
+            sql = "SELECT en, zh FROM errors WHERE level=?"
+        elif source == "onlyMastered":
+            sql = "SELECT en, zh FROM mastered WHERE level=?"
+        elif not self.has_vocab:
+            raise ValueError("服务端没有词表，请用 --vocab 指定双语 CSV")
+        elif source == "excludeMastered":
+            sql = (
+                "SELECT en, zh FROM vocab.words AS w WHERE level=? AND NOT EXISTS "
+                "(SELECT 1 FROM mastered AS m WHERE m.level = w.level AND m.en = w.en)"
+            )
+        else:
+            sql = "SELECT en, zh FROM vocab.words WHERE level=?"
+        rows = self._conn.execute(sql + " ORDER BY random() LIMIT ?", (level, max(0, limit)))
+        return [dict(row) for row in rows]
+
+    def import_local(
+        self, level: str, errors: Iterable[dict], mastered: Iterable[dict]
+    ) -> int:
+        """导入页面 localStorage 中的错题本与掌握本；服务端已有的记录保持不变。返回新增条数。"""
+        now = _now_ms()
+        added = 0
+        with self._conn:
+            for w in errors:
+                count, last = int(w.get("wrong_count") or 1), int(w.get("last_wrong_at") or now)
+                added += self._conn.execute(
+                    "INSERT OR IGNORE INTO errors VALUES (?, ?, ?, ?, ?, ?)",
+                    (level, w["en"], w.get("zh", ""), count, last,
+                     due_at(ERROR_SCHEDULE_DAYS, count, last)),
+                ).rowcount
+            for w in mastered:
+                count = int(w.get("review_count") or 1)
+                last = int(w.get("last_review_at") or w.get("first_right_at") or now)
+                added += self._conn.execute(
+                    "INSERT OR IGNORE INTO mastered VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (level, w["en"], w.get("zh", ""), count,
+                     int(w.get("first_right_at") or last), last,
+                     due_at(MASTERED_SCHEDULE_DAYS, count, last)),
+                ).rowcount
+        return added
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+_REASONS = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+
+class SrsServer:
+    """多学习者复习服务：按需打开各学习者的数据库并缓存连接。"""
+
+    def __init__(self, db_dir: str) -> None:
+        self.db_dir = db_dir
+        os.makedirs(db_dir, exist_ok=True)
+        self._stores: Dict[str, LearnerStore] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def store(self, learner: str) -> LearnerStore:
+        if not _LEARNER.match(learner):
+            raise HttpError(400, "学习者 ID 只能包含字母、数字、- 与 _")
+        if learner not in self._stores:
+            self._stores[learner] = LearnerStore(
+                os.path.join(self.db_dir, f"{learner}.sqlite3"),
+                os.path.join(self.db_dir, VOCAB_NAME),
+            )
+        return self._stores[learner]
+
+    def handle(self, method: str, target: str, body: bytes) -> dict:
+        """处理一个 API 请求并返回 JSON 对象；出错时抛出 HttpError（数据库错误为 500）。"""
+        try:
+            return self._handle(method, target, body)
+        except sqlite3.Error as exc:  # 数据库被锁、损坏等
+            raise HttpError(500, f"数据库错误: {exc}") from None
+
+    def _handle(self, method: str, target: str, body: bytes) -> dict:
+        url = urllib.parse.urlsplit(target)
+        query = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+        parts = [urllib.parse.unquote(p) for p in url.path.strip("/").split("/")]
+        if len(parts) != 4 or parts[:2] != ["api", "learners"]:
+            raise HttpError(404, f"未知路径 {url.path}")
+        store, action = self.store(parts[2]), parts[3]
+        try:
+            data = json.loads(body or b"{}") if method == "POST" else {}
+            if method == "GET" and action == "due":
+                return {"levels": store.due_counts()}
+            if method == "GET" and action == "pick":
+                limit = int(query.get("limit", 20))
+                words = store.pick(query["level"], query.get("source", "all"), limit)
+                return {"words": words}
+            if method == "GET" and action == "errors":
+                return {"words": store.errors(query["level"])}
+            if method == "POST" and action == "answer":
+                record = store.record_right if data["correct"] else store.record_wrong
+                return record(data["level"], data["en"], data.get("zh", ""))
+            if method == "POST" and action == "clear":
+                return {"cleared": store.clear_errors(data["level"])}
+            if method == "POST" and action == "import":
+                added = store.import_local(
+                    data["level"], data.get("errors", []), data.get("mastered", [])
+                )
+                return {"added": added}
+        except (KeyError, ValueError, TypeError) as exc:
+            raise HttpError(400, f"请求参数错误: {exc}") from None
+        raise HttpError(404, f"未知操作 {method} {action}")
+
+    async def _serve_client(self, reader, writer) -> None:
+        """极简 HTTP/1.1：每个连接处理一个请求，响应后关闭。"""
+        try:
+            request_line = await reader.readline()
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length") or 0))
+            if method == "OPTIONS":
+                status, payload = 204, None
+            else:
+                try:
+                    status, payload = 200, self.handle(method, target, body)
+                except HttpError as exc:
+                    status, payload = exc.status, {"error": str(exc)}
+            data = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            writer.write(
+                (
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    "Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    "Access-Control-Allow-Origin: *\r\n"
+                    "Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
+                    "Access-Control-Allow-Headers: Content-Type\r\n"
+                    "Connection: close\r\n\r\n"
+                ).encode("latin-1")
+                + data
+            )
+            await writer.drain()
+        except (ValueError, ConnectionError, asyncio.IncompleteReadError):
+            pass  # 格式错误或客户端提前断开
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765) -> int:
+        """开始监听，返回实际端口（port=0 时由系统分配）。"""
+        self._server = await asyncio.start_server(self._serve_client, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for store in self._stores.values():
+            store.close()
+        self._stores.clear()
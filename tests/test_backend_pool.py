@@ -0,0 +1,113 @@
+# codex: 2026-10-17 用本地假后端（不同延迟/故障特征）校验后端池的对冲、路由、健康度与失败改发
+import asyncio
+import time
+
+import pytest
+
+import translate
+from backend_pool import BackendPool
+from translate import build_translator, translate_in_chunks
+
+
+class FakeBackend:
+    """按固定延迟返回 "<原文>@<名字>"；fail=True 时总是抛出异常。"""
+
+    def __init__(self, name, delay=0.0, fail=False, batch_mode=None):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.batch_mode = batch_mode
+        self.calls = 0
+
+    async def translate(self, text, src="en", dest="zh-cn"):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} down")
+        if isinstance(text, list):
+            return [f"{t}@{self.name}" for t in text]
+        return f"{text}@{self.name}"
+
+
+def test_slow_primary_is_hedged_and_first_answer_wins():
+    slow, fast = FakeBackend("slow", delay=1.0), FakeBackend("fast", delay=0.01)
+    pool = BackendPool([slow, fast], names=["slow", "fast"], hedge_delay=0.05)
+
+    start = time.monotonic()
+    result = asyncio.run(pool.translate("cat"))
+    assert result == "cat@fast" and time.monotonic() - start < 0.5
+    assert pool.hedges == 1
+    assert pool.stats[0].cancelled == 1 and pool.stats[1].wins == 1
+
+
+def test_hedges_take_tokens_from_the_shared_limiter():
+    slow, fast = FakeBackend("slow", delay=1.0), FakeBackend("fast", delay=0.0)
+    pool = BackendPool([slow, fast], names=["slow", "fast"], hedge_delay=0.01, min_hedge_delay=0.01)
+    words = [f"w{i}" for i in range(6)]
+
+    async def run():
+        start = time.monotonic()
+        result = await translate_in_chunks(
+            words, pool, pause_seconds=0, concurrency=6, rps=20, batch=None
+        )
+        return result, time.monotonic() - start
+
+    result, elapsed = asyncio.run(run())
+    assert result == [f"{w}@fast" for w in words] and pool.hedges == 6
+    assert pool.limiter is not None
+    # 6 个主请求 + 6 个对冲共 12 个令牌，rps=20 下至少约 0.55 秒；不取令牌时约 0.3 秒
+    assert elapsed >= 0.5
+
+
+def test_routing_prefers_backend_with_lower_observed_latency():
+    a, b = FakeBackend("a", delay=0.03), FakeBackend("b", delay=0.002)
+    pool = BackendPool([a, b], hedge_delay=5, min_samples=3)
+
+    async def run():
+        for i in range(12):
+            await pool.translate(f"w{i}")
+
+    asyncio.run(run())
+    # a、b 各先拿到 3 次探测流量，之后全部路由到更快的 b
+    assert a.calls == 3 and b.calls == 9
+    assert pool.ranked() == [1, 0] and pool.hedges == 0
+
+
+def test_failing_backend_fails_over_and_is_marked_unhealthy():
+    bad, good = FakeBackend("bad", fail=True), FakeBackend("good", delay=0.001)
+    pool = BackendPool([bad, good], hedge_delay=5, failure_threshold=2, cooldown=60)
+
+    async def run():
+        return [await pool.translate(f"w{i}") for i in range(5)]
+
+    assert asyncio.run(run()) == [f"w{i}@good" for i in range(5)]
+    assert bad.calls == 2 and pool.stats[0].failures == 2
+    assert pool.ranked()[0] == 1
+
+
+def test_all_backends_failing_raises_last_error_for_caller_retry():
+    pool = BackendPool([FakeBackend("x", fail=True), FakeBackend("y", fail=True)])
+    with pytest.raises(RuntimeError, match="y down"):
+        asyncio.run(pool.translate("cat"))
+
+
+def test_pool_plugs_into_translate_in_chunks_with_list_batches():
+    backends = [FakeBackend(n, delay=0.001, batch_mode="list") for n in ("a", "b")]
+    pool = BackendPool(backends, hedge_delay=5)
+    assert pool.batch_mode == "list"
+    result = asyncio.run(
+        translate_in_chunks(["cat", "dog", "cow"], pool, chunk_size=2, pause_seconds=0)
+    )
+    assert result == ["cat@a", "dog@a", "cow@a"]
+    assert BackendPool([backends[0], FakeBackend("c")]).batch_mode is None
+
+
+def test_build_translator_builds_pool_from_pipe_syntax(monkeypatch):
+    monkeypatch.setattr(
+        translate, "build_default_translator", lambda url=None: FakeBackend(url or "default")
+    )
+    pool = build_translator("google|google@translate.google.com.hk", hedge_quantile=0.5)
+    assert isinstance(pool, BackendPool) and pool.hedge_quantile == 0.5
+    assert [b.name for b in pool.backends] == ["default", "translate.google.com.hk"]
+    with pytest.raises(ValueError):
+        build_translator("offline|google", "dict.csv")
@@ -0,0 +1,85 @@
+# codex: 2026-10-17 校验基准用假翻译器、HTTP 替身与基线对比逻辑
+import asyncio
+
+import pytest
+
+from bench_translate import (
+    BenchResult,
+    HttpStubTranslator,
+    SimulatedTranslator,
+    ThrottledError,
+    compare_to_baseline,
+    start_stub_server,
+)
+
+
+def test_simulated_translator_is_deterministic_and_counts_requests():
+    async def run(seed):
+        backend = SimulatedTranslator(latency_ms=0, error_rate=0.3, seed=seed)
+        outcomes = []
+        for word in ["a", "b", "c", "d", "e", "f"]:
+            try:
+                outcomes.append((await backend.translate(word)).text)
+            except RuntimeError:
+                outcomes.append("error")
+        return outcomes, backend.requests
+
+    first, requests = asyncio.run(run(1))
+    assert asyncio.run(run(1)) == (first, 6)
+    assert "error" in first and any(o.endswith("-zh-cn") for o in first)
+
+
+def test_simulated_translator_throttles_like_429():
+    async def run():
+        backend = SimulatedTranslator(latency_ms=0, throttle_rps=2)
+        await backend.translate("a")
+        await backend.translate("b")
+        with pytest.raises(ThrottledError):
+            await backend.translate("c")
+        return backend.throttled
+
+    assert asyncio.run(run()) == 1
+
+
+def test_http_stub_round_trip():
+    async def run():
+        server, port = await start_stub_server(SimulatedTranslator(latency_ms=0))
+        try:
+            client = HttpStubTranslator(port)
+            return (await client.translate("big cat", dest="ja")).text
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    assert asyncio.run(run()) == "big cat-ja"
+
+
+def test_compare_to_baseline_flags_slowdowns_and_extra_requests():
+    baseline = {
+        "fast": {"words_per_sec": 1000.0, "requests": 100},
+        "same": {"words_per_sec": 1000.0, "requests": 100},
+    }
+    results = [
+        BenchResult("fast", 500, 120, 1.0, 700.0, 30.0),
+        BenchResult("same", 500, 100, 1.0, 900.0, 30.0),
+        BenchResult("new", 500, 100, 1.0, 1.0, 30.0),
+    ]
+    problems = compare_to_baseline(results, baseline, tolerance=0.25)
+    assert len(problems) == 2 and all(p.startswith("fast") for p in problems)
+
+
+def test_compare_to_baseline_tolerates_request_noise_in_timing_dependent_scenarios():
+    baseline = {
+        "razfull-throttled": {"words_per_sec": 1000.0, "requests": 4039},
+        "razfull-flaky": {"words_per_sec": 1000.0, "requests": 3876},
+    }
+    # 429 与随机错误触发的重试次数每次运行都不同，小幅波动不算退化
+    results = [
+        BenchResult("razfull-throttled", 500, 4060, 1.0, 1000.0, 30.0),
+        BenchResult("razfull-flaky", 500, 3900, 1.0, 1000.0, 30.0),
+    ]
+    assert compare_to_baseline(results, baseline, tolerance=0.25) == []
+    # 超出容差的请求数仍报告；不在 noisy 中的场景保持严格
+    results[1] = BenchResult("razfull-flaky", 500, 5000, 1.0, 1000.0, 30.0)
+    assert [p.split(":")[0] for p in compare_to_baseline(results, baseline, 0.25)] == ["razfull-flaky"]
+    assert len(compare_to_baseline(results[:1], baseline, 0.25, noisy=())) == 1
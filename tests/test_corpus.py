@@ -0,0 +1,164 @@
+# codex: 2026-10-17 校验紧凑语料的保存/加载往返、字符串驻留与各命令对语料文件的读取
+import asyncio
+import csv
+import os
+from pathlib import Path
+
+import pytest
+
+from corpus import Corpus, is_corpus_file
+from translate import (
+    CheckpointJournal,
+    compute_records,
+    count_max_words,
+    ensure_corpus,
+    iter_records,
+    process_file,
+    re_translate_failures,
+)
+
+ROWS = [
+    ["书名", "单词1", "单词2", "单词3"],
+    ["aa", "Farm", "cat", "dog", "cow"],
+    ["aa", "Pets", "cat", "dog"],
+    ["bb", "Empty"],
+    ["bb", "书与猫", "book", "cat"],
+]
+
+
+class Translator:
+    class _Result:
+        def __init__(self, text):
+            self.text = text
+
+    def __init__(self):
+        self.calls = []
+
+    async def translate(self, text, src="en", dest="zh-cn"):
+        self.calls.append(text)
+        return self._Result(f"{text}-zh")
+
+
+def _write_csv(path: Path, rows) -> None:
+    with path.open("w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(rows)
+
+
+def test_corpus_roundtrip_matches_csv_records(tmp_path: Path):
+    input_path = tmp_path / "raz.csv"
+    _write_csv(input_path, ROWS)
+    records = list(iter_records(str(input_path)))
+    corpus_path = tmp_path / "raz.corpus"
+    Corpus.from_records(records).save(str(corpus_path))
+
+    assert is_corpus_file(str(corpus_path)) and not is_corpus_file(str(input_path))
+    with Corpus.load(str(corpus_path)) as corpus:
+        assert list(corpus) == records
+        assert corpus[-1] == ("bb", "书与猫", ["book", "cat"])
+        # aa/bb、3 个书名、cat/dog/cow/book 各存一次
+        assert corpus.vocabulary_size == 9 and corpus.total_words == 7
+        assert corpus.max_words == 3
+        assert corpus[0][2][0] is corpus[1][2][0]  # 重复单词是同一个 str 对象
+        assert corpus.find("aa", "Pets") == 1 and corpus.find("bb", "Pets") is None
+        assert corpus.keys() == {("aa", "Farm"), ("aa", "Pets"), ("bb", "书与猫")}
+        head = corpus.head(2)
+        assert len(head) == 2 and head.max_words == 3 and head.total_words == 5
+
+
+def test_readers_accept_corpus_file_and_sidecar_is_refreshed(tmp_path: Path):
+    input_path = tmp_path / "raz.csv"
+    _write_csv(input_path, ROWS)
+    corpus_path = ensure_corpus(str(input_path))
+    assert corpus_path == str(input_path) + ".corpus"
+    assert ensure_corpus(corpus_path) == corpus_path
+
+    records, max_words = compute_records(corpus_path, limit=2)
+    assert len(records) == 2 and max_words == 3
+    # 返回的是内存副本：文件已关闭，记录仍可读取
+    assert records._closer is None and records[1] == ("aa", "Pets", ["cat", "dog"])
+    assert count_max_words(corpus_path, limit=1) == 3
+    assert list(iter_records(corpus_path)) == list(iter_records(str(input_path)))
+
+    _write_csv(input_path, ROWS + [["cc", "New", "fox"]])
+    stamp = os.path.getmtime(corpus_path) + 10
+    os.utime(input_path, (stamp, stamp))
+    ensure_corpus(str(input_path))
+    assert list(iter_records(corpus_path))[-1] == ("cc", "New", ["fox"])
+
+
+def test_process_file_output_is_identical_from_corpus(tmp_path: Path):
+    input_path = tmp_path / "raz.csv"
+    _write_csv(input_path, ROWS)
+    corpus_path = ensure_corpus(str(input_path))
+    outputs = []
+    for name, source in (("csv.csv", str(input_path)), ("corpus.csv", corpus_path)):
+        output_path = tmp_path / name
+        asyncio.run(
+            process_file(
+                source,
+                str(output_path),
+                translator=Translator(),
+                pause_seconds=0,
+                show_progress=False,
+            )
+        )
+        outputs.append(output_path.read_text(encoding="utf-8"))
+    assert outputs[0] == outputs[1]
+
+    # 断点续传按下标直接在语料中校验日志记录的书目
+    output_path = tmp_path / "corpus.csv"
+    assert os.path.exists(CheckpointJournal.path_for(str(output_path)))
+    translator = Translator()
+    asyncio.run(
+        process_file(
+            corpus_path,
+            str(output_path),
+            translator=translator,
+            pause_seconds=0,
+            show_progress=False,
+            resume=True,
+        )
+    )
+    assert translator.calls == [] and output_path.read_text(encoding="utf-8") == outputs[0]
+
+
+def test_re_translate_failures_skips_books_missing_from_source(tmp_path: Path):
+    failed_path = tmp_path / "failed.csv"
+    _write_csv(
+        failed_path,
+        [
+            ["RAZ Level", "Book Title", "单词1"],
+            ["aa", "农场", "[翻译失败:timeout]"],
+            ["aa", "Farm", "cat"],
+            ["zz", "旧书", "[翻译失败:timeout]"],
+            ["zz", "Gone", "owl"],
+        ],
+    )
+    input_path = tmp_path / "raz.csv"
+    _write_csv(input_path, ROWS)
+    translator = Translator()
+    stats = asyncio.run(
+        re_translate_failures(
+            str(failed_path),
+            str(tmp_path / "fixed.csv"),
+            translator=translator,
+            pause_seconds=0,
+            show_progress=False,
+            source=str(input_path),
+        )
+    )
+    assert translator.calls == ["cat"] and stats.total_words == 1
+    rows = list(csv.reader((tmp_path / "fixed.csv").open(encoding="utf-8", newline="")))
+    assert rows[1][2] == "cat-zh" and rows[3][2] == "[翻译失败:timeout]"
+
+
+def test_load_rejects_truncated_corpus(tmp_path: Path):
+    input_path = tmp_path / "raz.csv"
+    _write_csv(input_path, ROWS)
+    corpus_path = tmp_path / "raz.corpus"
+    Corpus.from_records(iter_records(str(input_path))).save(str(corpus_path))
+    data = corpus_path.read_bytes()
+    for size in (10, 30, len(data) - 1):  # 头部不完整、各区不完整、数据区不完整
+        corpus_path.write_bytes(data[:size])
+        with pytest.raises(ValueError, match="不完整|不是语料文件"):
+            Corpus.load(str(corpus_path))
@@ -0,0 +1,79 @@
+# codex: 2026-10-17 校验单词规范化规则，以及按规范形式去重后请求数减少、英文行保留原写法
+import asyncio
+import csv
+from pathlib import Path
+
+from normalize import WordNormalizer, lemmatize, load_exceptions
+from translate import main, plan_run, process_file
+
+
+class RecordingTranslator:
+    def __init__(self):
+        self.calls = []
+
+    async def translate(self, text, src="en", dest="zh-cn"):
+        self.calls.append(text)
+        return f"{text}-zh"
+
+
+def test_normalizer_steps_and_exceptions(tmp_path: Path):
+    full = WordNormalizer.parse("all")
+    cases = {
+        "Go": "go", " dogs. ": "dog", "cats": "cat", "jumps": "jump", "babies": "baby",
+        "boxes": "box", "dresses": "dress", "children": "child", "glasses": "glasses",
+        "bus": "bus", "this": "this", "don't": "don't", "ice  cream!": "ice cream", "...": "...",
+    }
+    assert {word: full(word) for word in cases} == cases
+    # 以 s 结尾的副词、代词等不是复数，还原后会与另一个意思不同的词合并
+    for word in ("sometimes", "besides", "yours", "others", "goods", "manners"):
+        assert lemmatize(word) == word
+    assert lemmatize("volcanoes") == "volcano"
+    # 动词与名词同形的不合并；-oes/-zzes 词尾规则会造出不存在的词，走例外表
+    assert (lemmatize("leaves"), lemmatize("lives")) == ("leaves", "lives")
+    assert (lemmatize("quizzes"), lemmatize("mangoes"), lemmatize("buzzes")) == ("quiz", "mango", "buzz")
+    # 首字母大写视为专有名词，不还原，只折叠大小写
+    assert full("Thomas") == "thomas" and lemmatize("Cats") == "Cats"
+    assert WordNormalizer.parse("none") is None
+    assert WordNormalizer.parse("case")("Cats") == "cats"
+
+    table = tmp_path / "exceptions.csv"
+    table.write_text("# 自定义\nmovies,film\ndishes,\n", encoding="utf-8")
+    assert load_exceptions(str(table)) == {"movies": "film", "dishes": "dishes"}
+    custom = WordNormalizer.parse("punct,lemma", str(table))
+    assert (custom("movies"), custom("dishes"), custom("wolves")) == ("film", "dishes", "wolf")
+
+
+def test_requests_are_keyed_on_canonical_form(tmp_path: Path, capsys):
+    input_path = tmp_path / "razfull.csv"
+    with input_path.open("w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(
+            [
+                ["RAZ Level", "Book Title", "Word List"],
+                ["aa", "Go", "Go", "go", "cats", " cat", "dogs,"],
+                ["aa", "Jump", "jumps", "jump", "Dog"],
+            ]
+        )
+    output_path = tmp_path / "out.csv"
+    translator = RecordingTranslator()
+    stats = asyncio.run(
+        process_file(
+            str(input_path),
+            str(output_path),
+            translator=translator,
+            pause_seconds=0,
+            show_progress=False,
+            normalize=WordNormalizer.parse("all"),
+        )
+    )
+    words = [w for w in translator.calls if w not in ("Go", "Jump")]
+    assert words == ["go", "cat", "dog", "jump"]
+    assert (stats.unique_words, stats.normalized) == (4, 4)  # 8 种写法合并为 4 个请求
+    rows = list(csv.reader(output_path.open(encoding="utf-8")))
+    assert rows[1][2:7] == ["go-zh", "go-zh", "cat-zh", "cat-zh", "dog-zh"]
+    assert rows[2][2:7] == ["Go", "go", "cats", "cat", "dogs,"]  # 英文行保留原写法
+    assert rows[4][2:5] == ["jumps", "jump", "Dog"]
+
+    plan = plan_run(str(input_path), str(tmp_path / "new.csv"), normalize=WordNormalizer.parse("all"))
+    assert (plan.unique_words, plan.normalized) == (4, 4)
+    main([str(input_path), str(tmp_path / "cli.csv"), "--plan", "--normalize", "punct,case"])
+    assert "规范化合并 1 个" in capsys.readouterr().out
@@ -0,0 +1,121 @@
+# codex: 2026-10-17 校验离线词典索引的编译、mmap 查找与远程回退
+import asyncio
+import csv
+import time
+from pathlib import Path
+
+from offline_dict import (
+    OfflineDictionary,
+    OfflineTranslator,
+    build_index,
+    ensure_index,
+    short_translation,
+)
+from translate import build_translator, main, translate_in_chunks
+
+
+class RecordingTranslator:
+    batch_mode = "list"
+
+    class _Result:
+        def __init__(self, text):
+            self.text = text
+
+    def __init__(self):
+        self.calls = []
+
+    async def translate(self, text, src="en", dest="zh-cn"):
+        self.calls.append(text)
+        if isinstance(text, list):
+            return [self._Result(f"{t}-remote") for t in text]
+        return self._Result(f"{text}-remote")
+
+
+def _write_ecdict(path: Path):
+    rows = [
+        ["word", "phonetic", "definition", "translation"],
+        ["cat", "kæt", "feline", "n. 猫；猫科动物\\nvt. 把锚吊起"],
+        ["Dog", "dɔg", "canine", "n. 狗"],
+        ["go", "gəʊ", "", "vi. 去, 走"],
+        ["zebra", "", "", ""],
+    ]
+    with path.open("w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(rows)
+
+
+def test_short_translation_strips_part_of_speech():
+    assert short_translation("n. 猫；猫科动物\\nvt. 把锚吊起") == "猫"
+    assert short_translation("vi. 去, 走") == "去, 走"
+
+
+def test_build_index_and_binary_search_lookup(tmp_path: Path):
+    csv_path = tmp_path / "ecdict.csv"
+    _write_ecdict(csv_path)
+    index_path = tmp_path / "ecdict.idx"
+    assert build_index(str(csv_path), str(index_path)) == 3
+    dictionary = OfflineDictionary(str(index_path))
+    assert len(dictionary) == 3
+    assert dictionary.lookup("cat") == "猫"
+    assert dictionary.lookup(" DOG ") == "狗"
+    assert dictionary.lookup("zebra") is None
+    assert dictionary.lookup("aardvark") is None
+    dictionary.close()
+    # CSV 路径会自动编译为旁边的 .idx
+    assert ensure_index(str(csv_path)) == str(csv_path) + ".idx"
+    assert ensure_index(str(index_path)) == str(index_path)
+
+
+def test_offline_translator_only_sends_misses_to_fallback(tmp_path: Path):
+    csv_path = tmp_path / "ecdict.csv"
+    _write_ecdict(csv_path)
+    remote = RecordingTranslator()
+    translator = OfflineTranslator(
+        OfflineDictionary(ensure_index(str(csv_path))), fallback=remote
+    )
+    result = asyncio.run(
+        translate_in_chunks(
+            ["cat", "dog", "zebra", "go"], translator, pause_seconds=0
+        )
+    )
+    assert result == ["猫", "狗", "zebra-remote", "去, 走"]
+    assert remote.calls == [["zebra"]]
+    assert translator.hits == 3 and translator.misses == 1
+    # 非中文目标语言全部交给远程
+    single = asyncio.run(translator.translate("cat", src="en", dest="ja"))
+    assert single.text == "cat-remote"
+
+
+def test_build_translator_offline_only(tmp_path: Path):
+    csv_path = tmp_path / "ecdict.csv"
+    _write_ecdict(csv_path)
+    translator = build_translator("offline", str(csv_path))
+    assert isinstance(translator, OfflineTranslator) and translator.fallback is None
+    result = asyncio.run(
+        translate_in_chunks(["cat", "zebra"], translator, pause_seconds=0, max_retries=0)
+    )
+    assert result[0] == "猫" and result[1].startswith("[翻译失败:")
+
+
+def test_offline_backend_without_fallback_fails_only_missing_words(tmp_path: Path):
+    csv_path = tmp_path / "ecdict.csv"
+    _write_ecdict(csv_path)
+    input_path = tmp_path / "input.csv"
+    with input_path.open("w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(
+            [
+                ["RAZ Level", "Book Title", "Word List"],
+                ["aa", "cat", "cat", "zebra", "dog", "yak", "go", "emu", "owl"],
+            ]
+        )
+    output_path = tmp_path / "out.csv"
+    started = time.monotonic()
+    main(
+        [str(input_path), str(output_path), "--backend", "offline", "--dict", str(csv_path),
+         "--no-cache", "--concurrency", "4"]
+    )
+    # 缺词不重试、不触发熔断：几个缺词也能立刻跑完
+    assert time.monotonic() - started < 2
+    rows = list(csv.reader(output_path.open(encoding="utf-8", newline="")))
+    assert rows[1][1:5] == ["猫", "猫", "[翻译失败:离线词典中没有 'zebra']", "狗"]
+    failed = [cell for cell in rows[1][2:] if cell.startswith("[翻译失败")]
+    assert len(failed) == 4  # zebra（无释义）、yak、emu、owl
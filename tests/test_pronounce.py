@@ -0,0 +1,126 @@
+# codex: 2026-10-17 用本地 HTTP 替身服务校验发音预取：内容寻址存储、索引、重试、限速与续传
+import asyncio
+import csv
+import hashlib
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from pronounce import Prefetcher, parse_entry, prefetch, vocabulary
+from translate import TokenBucket, main
+
+AUDIO = b"ID3-fake-cat-audio"
+ROWS = [
+    ["RAZ Level", "Book Title", "单词1", "单词2", "单词3"],
+    ["aa", "农场", "猫", "小猫", "狗"],
+    ["aa", "Farm", "Cat", "kitty", "dog"],
+    ["bb", "杂项", "", "", ""],
+    ["bb", "Misc", "zzz", "flaky", "down"],
+]
+
+
+def _entry(word, audio):
+    return [{"word": word, "phonetics": [{"text": ""}, {"text": f"/{word}/", "audio": audio}]}]
+
+
+class DictionaryStandIn(BaseHTTPRequestHandler):
+    """dictionaryapi.dev 替身：cat/kitty 的音频字节相同，dog 只有音标，zzz 404，flaky 首次 503，down 总是 500。"""
+
+    hits: Counter = Counter()
+
+    def do_GET(self):
+        self.hits[self.path] += 1
+        word = self.path.rsplit("/", 1)[-1]
+        if self.path.startswith("/audio/"):
+            return self._send(200, AUDIO)
+        if word == "zzz":
+            return self._send(404, b"{}")
+        if word == "down" or (word == "flaky" and self.hits[self.path] == 1):
+            return self._send(503 if word == "flaky" else 500, b"busy")
+        bodies = {
+            "cat": _entry("cat", "/audio/cat.mp3"),
+            "kitty": _entry("kitty", f"http://127.0.0.1:{self.server.server_port}/audio/kitty.mp3"),
+            "dog": [{"word": "dog", "phonetic": "/dɒɡ/", "phonetics": []}],
+            "flaky": _entry("flaky", ""),
+        }
+        self._send(200, json.dumps(bodies[word]).encode("utf-8"))
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api():
+    DictionaryStandIn.hits = Counter()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DictionaryStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/api/", DictionaryStandIn.hits
+    server.shutdown()
+    server.server_close()
+
+
+def _write_csv(path: Path) -> None:
+    with path.open("w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(ROWS)
+
+
+def test_vocabulary_and_entry_parsing_match_kid_quiz(tmp_path: Path):
+    path = tmp_path / "out.csv"
+    _write_csv(path)
+    assert vocabulary(str(path)) == ["cat", "kitty", "dog", "zzz", "flaky", "down"]
+    assert parse_entry(_entry("cat", "a.mp3")) == ("/cat/", "a.mp3")
+    assert parse_entry({"title": "No Definitions Found"}) == ("", "")
+
+
+def test_prefetch_stores_audio_by_content_and_resumes(tmp_path: Path, api):
+    base, hits = api
+    path = tmp_path / "out.csv"
+    _write_csv(path)
+    out_dir = tmp_path / "pron"
+
+    first = asyncio.run(
+        prefetch(str(path), str(out_dir), api_base=base, concurrency=3,
+                 limiter=TokenBucket(200), retry_pause=0.01)
+    )
+    assert (first.fetched, first.missing, first.failed) == (4, 1, ["down"])
+    index = json.loads((out_dir / "index.json").read_text(encoding="utf-8"))
+    words = index["words"]
+    digest = hashlib.sha256(AUDIO).hexdigest()
+    assert words["cat"] == {"phonetic": "/cat/", "audio": f"audio/{digest[:2]}/{digest}.mp3"}
+    assert words["kitty"]["audio"] == words["cat"]["audio"]  # 相同音频只存一份
+    assert words["dog"] == {"phonetic": "/dɒɡ/", "audio": ""}
+    assert words["zzz"] == {"phonetic": "", "audio": ""} and "down" not in words
+    assert (out_dir / words["cat"]["audio"]).read_bytes() == AUDIO
+    assert len(list((out_dir / "audio").rglob("*.mp3"))) == 1
+    assert hits["/api/flaky"] == 2 and hits["/api/down"] == 3
+
+    # 续传：只重新请求上次暂时失败的词
+    hits.clear()
+    second = Prefetcher(str(out_dir), api_base=base, retry_pause=0.01, max_retries=0)
+    asyncio.run(second.run(vocabulary(str(path))))
+    assert dict(hits) == {"/api/down": 1} and second.failed == ["down"]
+
+
+def test_pronounce_subcommand_and_kid_quiz_uses_local_index(tmp_path: Path, api, capsys):
+    base, _ = api
+    path = tmp_path / "out.csv"
+    _write_csv(path)
+    out_dir = tmp_path / "pron"
+    main(["pronounce", str(path), str(out_dir), "--api", base, "--retries", "0", "--rps", "0"])
+    assert "新增 3 个" in capsys.readouterr().out
+    assert (out_dir / "index.json").exists()
+
+    html = Path("kid_quiz.html").read_text(encoding="utf-8")
+    assert "const PRON_INDEX_PATH = PRON_DIR + 'index.json';" in html
+    assert "const local = (await loadPronunciationIndex())[key];" in html
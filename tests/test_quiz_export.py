@@ -0,0 +1,86 @@
+# codex: 2026-10-17 校验 kid_quiz 分片导出：分片内容、gzip、清单哈希与旧分片清理
+import csv
+import gzip
+import hashlib
+import json
+from pathlib import Path
+
+import pytest
+
+from quiz_export import export_shards, iter_bilingual_books
+from translate import main
+
+ROWS = [
+    ["RAZ Level", "Book Title", "单词1", "单词2"],
+    ["aa", "农场", "猫", ""],
+    ["aa", "Farm", "cat", "dog"],
+    ["bb", "宠物", "鸟", ""],
+    ["bb", "Pets", "bird", ""],
+    ["aa", "动物", "牛", ""],
+    ["aa", "Animals", "cow", ""],
+]
+
+
+def _write_csv(path: Path, rows) -> None:
+    with path.open("w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(rows)
+
+
+def test_iter_bilingual_books_matches_kid_quiz_parsing(tmp_path: Path):
+    path = tmp_path / "out.csv"
+    _write_csv(path, ROWS)
+    books = list(iter_bilingual_books(str(path)))
+    assert books[0] == ("aa", "Farm", "农场", [("cat", "猫"), ("dog", "dog")])
+    assert [b[0] for b in books] == ["aa", "bb", "aa"]
+
+
+def test_export_writes_shards_and_manifest_with_hashes(tmp_path: Path):
+    path = tmp_path / "out.csv"
+    _write_csv(path, ROWS)
+    out_dir = tmp_path / "quiz_data"
+    manifest = export_shards(str(path), str(out_dir))
+
+    assert json.loads((out_dir / "manifest.json").read_text(encoding="utf-8")) == manifest
+    entries = {e["level"]: e for e in manifest["levels"]}
+    assert list(entries) == ["aa", "bb"]
+    assert entries["aa"]["books"] == 2 and entries["aa"]["words"] == 3
+
+    aa = entries["aa"]
+    data = (out_dir / aa["file"]).read_bytes()
+    assert hashlib.sha256(data).hexdigest() == aa["sha256"]
+    assert aa["file"] == f"aa.{aa['sha256'][:12]}.json"
+    assert gzip.decompress((out_dir / (aa["file"] + ".gz")).read_bytes()) == data
+    shard = json.loads(data)
+    assert shard["books"][1] == {"en": "Animals", "zh": "动物", "words": [["cow", "牛"]]}
+
+
+def test_export_is_deterministic_and_removes_stale_shards(tmp_path: Path):
+    path = tmp_path / "out.csv"
+    out_dir = tmp_path / "quiz_data"
+    _write_csv(path, ROWS)
+    first = export_shards(str(path), str(out_dir))
+    gz_name = first["levels"][1]["file"] + ".gz"
+    gz_bytes = (out_dir / gz_name).read_bytes()
+
+    _write_csv(path, ROWS[:5] + [["aa", "动物", "马", ""], ["aa", "Animals", "horse", ""]])
+    second = export_shards(str(path), str(out_dir))
+    # bb 未变：文件名与 gzip 字节都不变；aa 换了哈希，旧分片被删除
+    assert (out_dir / gz_name).read_bytes() == gz_bytes
+    assert second["levels"][0]["file"] != first["levels"][0]["file"]
+    assert not (out_dir / first["levels"][0]["file"]).exists()
+    assert len(list(out_dir.iterdir())) == 5
+
+
+def test_export_subcommand_rejects_non_bilingual_csv(tmp_path: Path, capsys):
+    path = tmp_path / "raw.csv"
+    _write_csv(path, [["书名", "单词1"], ["Farm", "cat"]])
+    with pytest.raises(SystemExit):
+        main(["export", str(path), str(tmp_path / "quiz_data")])
+    assert "RAZ Level" in capsys.readouterr().out
+
+
+def test_kid_quiz_loads_manifest_and_selected_shard():
+    html = Path("kid_quiz.html").read_text(encoding="utf-8")
+    assert "const MANIFEST_PATH = DATA_DIR + 'manifest.json';" in html
+    assert "function ensureLevel(level)" in html
+    assert "new DecompressionStream('gzip')" in html
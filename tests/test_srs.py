@@ -0,0 +1,115 @@
+# codex: 2026-10-17 校验服务端间隔复习：调度规则与页面一致、到期查询走索引、HTTP API 往返
+import asyncio
+import json
+import sqlite3
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from srs import (
+    DAY_MS,
+    ERROR_SCHEDULE_DAYS,
+    MASTERED_SCHEDULE_DAYS,
+    LearnerStore,
+    SrsServer,
+    build_vocabulary,
+)
+
+BOOKS = {
+    "aa": [{"en": "Farm", "zh": "农场", "words": [["cat", "猫"], ["dog", "狗"], ["cow", "牛"], ["cat", "猫咪"]]}],
+    "bb": [{"en": "Sea", "zh": "海", "words": [["fish", "鱼"]]}],
+}
+
+
+def test_schedule_matches_kid_quiz(tmp_path: Path):
+    html = Path("kid_quiz.html").read_text(encoding="utf-8")
+    assert f"const EB_SCHEDULE_ERRORS = {list(ERROR_SCHEDULE_DAYS)};" in html
+    assert f"const EB_SCHEDULE_MASTERED = {list(MASTERED_SCHEDULE_DAYS)};" in html
+    assert "if (SRS_API) { srsAnswer(level, word, false); return; }" in html
+
+    store = LearnerStore(str(tmp_path / "kid.sqlite3"))
+    t0 = 1_000 * DAY_MS
+    for k in range(8):  # 连错 8 次：间隔依次 1, 2, 4, 7, 15, 30, 30, 30 天
+        assert store.record_wrong("aa", "cat", "猫", now=t0)["wrong_count"] == k + 1
+        days = ERROR_SCHEDULE_DAYS[min(k, 5)]
+        assert store.due_counts(now=t0 + days * DAY_MS - 1) == {}
+        assert store.due_counts(now=t0 + days * DAY_MS) == {"aa": {"errors": 1, "mastered": 0}}
+
+    # 答对：移出错题本，进入掌握本；再次答对时 first_right_at 不变、间隔递增
+    assert store.record_right("aa", "cat", "猫", now=t0)["review_count"] == 1
+    assert store.errors("aa") == []
+    assert store.record_right("aa", "cat", "猫", now=t0 + DAY_MS)["due_at"] == t0 + 8 * DAY_MS
+    row = store._conn.execute("SELECT * FROM mastered").fetchone()
+    assert (row["review_count"], row["first_right_at"], row["last_review_at"]) == (2, t0, t0 + DAY_MS)
+    store.close()
+
+
+def test_due_and_pick_use_indexes(tmp_path: Path):
+    assert build_vocabulary(str(tmp_path), BOOKS) == 4  # 同级重复的 cat 只保留一条
+    store = LearnerStore(str(tmp_path / "kid.sqlite3"), str(tmp_path / "vocab.sqlite3"))
+    store.record_right("aa", "cat", "猫", now=0)
+    store.record_wrong("aa", "dog", "狗", now=0)
+
+    assert {w["en"] for w in store.pick("aa", "excludeMastered", 10)} == {"dog", "cow"}
+    assert [w["en"] for w in store.pick("aa", "onlyMastered", 10)] == ["cat"]
+    assert [w["en"] for w in store.pick("aa", "errors", 10)] == ["dog"]
+    assert len(store.pick("aa", "all", 2)) == 2
+
+    def plan(sql, *params):
+        return " ".join(r[-1] for r in store._conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+    assert "USING COVERING INDEX errors_due (due_at<?)" in plan("SELECT level, COUNT(*) FROM errors INDEXED BY errors_due WHERE due_at <= ? GROUP BY level", 0)
+    assert "USING COVERING INDEX mastered_due (due_at<?)" in plan("SELECT level, COUNT(*) FROM mastered INDEXED BY mastered_due WHERE due_at <= ? GROUP BY level", 0)
+    exclude = plan(
+        "SELECT en, zh FROM vocab.words AS w WHERE level=? AND NOT EXISTS "
+        "(SELECT 1 FROM mastered AS m WHERE m.level = w.level AND m.en = w.en)",
+        "aa",
+    )
+    assert "SCAN" not in exclude.replace("SCAN CONSTANT", "")
+    store.close()
+
+
+def test_http_api_round_trip(tmp_path: Path):
+    build_vocabulary(str(tmp_path), BOOKS)
+
+    def call(port, path, body=None):
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}/api/learners/{path}",
+            data=None if body is None else json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request) as resp:
+                assert resp.headers["Access-Control-Allow-Origin"] == "*"
+                return resp.status, json.loads(resp.read())
+        except urllib.error.HTTPError as exc:
+            return exc.code, json.loads(exc.read())
+
+    async def scenario():
+        server = SrsServer(str(tmp_path))
+        port = await server.start(port=0)
+        try:
+            run = lambda *args: asyncio.to_thread(call, port, *args)
+            status, data = await run("amy/answer", {"level": "aa", "en": "dog", "zh": "狗", "correct": False})
+            assert status == 200 and data["wrong_count"] == 1
+            assert (await run("amy/errors?level=aa"))[1]["words"][0]["due_at"] == data["due_at"]
+            await run("amy/answer", {"level": "aa", "en": "cat", "zh": "猫", "correct": True})
+            await run("ben/import", {"level": "bb", "errors": [{"en": "fish", "zh": "鱼", "wrong_count": 2, "last_wrong_at": 1}]})
+            assert (await run("amy/due"))[1] == {"levels": {}}
+            assert (await run("ben/due"))[1] == {"levels": {"bb": {"errors": 1, "mastered": 0}}}
+            status, data = await run("amy/pick?level=aa&source=excludeMastered&limit=5")
+            assert status == 200 and {w["en"] for w in data["words"]} == {"dog", "cow"}
+            assert (await run("amy/clear", {"level": "aa"}))[1] == {"cleared": 1}
+            assert (await run("amy/pick?level=aa&source=bogus"))[0] == 400
+            assert (await run("../etc/due"))[0] == 404
+            assert (await run("a%20b/due"))[0] == 400
+            (tmp_path / "broken.sqlite3").write_bytes(b"not a database" * 16)
+            status, data = await run("broken/due")  # 损坏的数据库返回 JSON 错误而不是断开连接
+            assert status == 500 and data["error"].startswith("数据库错误")
+        finally:
+            await server.close()
+
+    asyncio.run(scenario())
+    conn = sqlite3.connect(str(tmp_path / "amy.sqlite3"))
+    assert conn.execute("SELECT COUNT(*) FROM mastered").fetchone()[0] == 1
+    conn.close()
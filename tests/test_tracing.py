@@ -0,0 +1,89 @@
+# codex: 2026-10-17 校验 --trace 时间线（阶段、请求、重试 span 与并发分行）与 --profile 输出
+import asyncio
+import csv
+import json
+import pstats
+from pathlib import Path
+
+import tracing
+import translate
+from translate import main, process_file
+
+ROWS = [
+    ["RAZ Level", "Book Title", "Word List"],
+    ["aa", "Farm", "cat", "dog", "cow"],
+    ["bb", "Sea", "fish"],
+]
+
+
+class FlakyTranslator:
+    """每次请求耗时 delay 秒；fail_once 中的词第一次请求失败。"""
+
+    def __init__(self, delay=0.01, fail_once=()):
+        self.delay = delay
+        self.fail_once = set(fail_once)
+
+    async def translate(self, text, src="en", dest="zh-cn"):
+        await asyncio.sleep(self.delay)
+        if text in self.fail_once:
+            self.fail_once.discard(text)
+            raise RuntimeError("timeout")
+        return f"{text}-zh"
+
+
+def _write_csv(path: Path) -> None:
+    with path.open("w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(ROWS)
+
+
+def test_trace_records_phases_requests_and_retries(tmp_path: Path):
+    input_path = tmp_path / "input.csv"
+    _write_csv(input_path)
+    trace_path = tmp_path / "trace.json"
+    with tracing.record(str(trace_path)):
+        asyncio.run(
+            process_file(
+                str(input_path),
+                str(tmp_path / "out.csv"),
+                translator=FlakyTranslator(fail_once={"dog"}),
+                pause_seconds=0.01,
+                show_progress=False,
+                concurrency=3,
+                window=2,
+            )
+        )
+    assert not tracing.enabled()
+
+    events = json.loads(trace_path.read_text(encoding="utf-8"))["traceEvents"]
+    spans = [e for e in events if e["ph"] == "X"]
+    names = {e["name"] for e in spans}
+    assert {"compute_records", "book", "translate", "retry", "flush"} <= names
+
+    requests = [e for e in spans if e["name"] == "translate"]
+    assert {e["args"]["text"] for e in requests} == {"Farm", "cat", "dog", "cow", "Sea", "fish"}
+    dog = sorted((e for e in requests if e["args"]["text"] == "dog"), key=lambda e: e["ts"])
+    assert [e["args"]["attempt"] for e in dog] == [0, 1]
+    assert dog[0]["args"]["book"] == "0:Farm"
+    # 并发请求分到不同的行，且行名写在元数据事件中
+    assert len({e["tid"] for e in requests}) > 1
+    lanes = {e["args"]["name"] for e in events if e["ph"] == "M" and e["name"] == "thread_name"}
+    assert "request 1" in lanes and "book 1" in lanes
+
+
+def test_span_is_shared_null_context_when_disabled():
+    assert not tracing.enabled()
+    assert tracing.span("a", "request", text="x") is tracing.span("b")
+
+
+def test_cli_writes_trace_and_profile(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(translate, "build_default_translator", lambda url=None: FlakyTranslator(0))
+    input_path = tmp_path / "input.csv"
+    _write_csv(input_path)
+    trace_path, profile_path = tmp_path / "t.json", tmp_path / "run.prof"
+    main(
+        [str(input_path), str(tmp_path / "out.csv"), "--no-cache",
+         "--trace", str(trace_path), "--profile", str(profile_path)]
+    )
+    assert json.loads(trace_path.read_text(encoding="utf-8"))["traceEvents"]
+    stats = pstats.Stats(str(profile_path))
+    assert any(func[2] == "process_file" for func in stats.stats)
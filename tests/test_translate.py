@@ -1,15 +1,39 @@
 # codex: 2025-11-25 校验 translate 脚本的解析、协程兼容与 razaa_ce 输出格式
 import asyncio
 import csv
+import json
+import sqlite3
 from pathlib import Path
 
 import pytest
 
 from translate import (
+    AdaptiveLimit,
+    CircuitBreaker,
+    LatencyHistogram,
+    PermanentTranslationError,
+    ProgressPrinter,
+    RetryScheduler,
+    TokenBucket,
+    TranslationCache,
+    CheckpointJournal,
     TranslationStats,
+    count_max_words,
+    detect_batch_mode,
+    get_processed_books,
+    iter_translated_records,
+    merge_shards,
+    parse_shard,
+    main,
     parse_word_list,
+    plan_run,
+    plan_unique_words,
     process_file,
+    re_translate_failures,
+    shard_of,
+    read_journal_tail,
     translate_in_chunks,
+    watch_file,
 )
 
 
@@ -216,3 +240,1158 @@ def test_process_file_returns_stats(tmp_path: Path):
     assert stats.processed == 2
     assert stats.success == 2
     assert stats.fail == 0
+
+
+class SlowTranslator(DummyTranslator):
+    """按单词长度反向延迟，用来打乱完成顺序并记录最大并发数。"""
+
+    def __init__(self, mapping=None):
+        super().__init__(mapping)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def translate(self, text, src="en", dest="zh-cn"):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01 / len(text))
+        self.in_flight -= 1
+        return await super().translate(text, src=src, dest=dest)
+
+
+def test_translate_in_chunks_concurrency_keeps_order_and_stats():
+    translator = SlowTranslator()
+    words = ["a", "bb", "ccc", "dddd", "eeeee", "f"]
+    stats = TranslationStats(total_words=len(words))
+    seen = []
+    result = asyncio.run(
+        translate_in_chunks(
+            words,
+            translator,
+            pause_seconds=0,
+            stats=stats,
+            progress_callback=lambda s, w, ok, attempts: seen.append((w, ok)),
+            concurrency=3,
+        )
+    )
+    assert result == [f"{w}-zh" for w in words]
+    assert translator.max_in_flight == 3
+    assert stats.processed == 6 and stats.success == 6 and stats.fail == 0
+    assert sorted(seen) == sorted((w, True) for w in words)
+
+
+def test_token_bucket_limits_request_rate():
+    async def run():
+        bucket = TokenBucket(rate=100, capacity=1)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(6):
+            await bucket.acquire()
+        return loop.time() - start
+
+    # 首个令牌立即可用，其后 5 个各需约 10ms
+    assert asyncio.run(run()) >= 0.045
+
+
+def test_token_bucket_default_has_no_startup_burst():
+    async def run():
+        bucket = TokenBucket(rate=100)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + 1.0
+        count = 0
+        while True:
+            await bucket.acquire()
+            if loop.time() > deadline:
+                return count
+            count += 1
+
+    # 默认不允许突发：首秒最多 rate + 1 次（桶里初始的一个令牌），而不是 2 × rate
+    assert 90 <= asyncio.run(run()) <= 101
+
+
+def _write_rows(path: Path, rows):
+    with path.open("w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(rows)
+
+
+def test_process_file_reuses_persistent_cache_across_runs(tmp_path: Path):
+    input_path = tmp_path / "input.csv"
+    _write_rows(
+        input_path,
+        [
+            ["RAZ Level", "Book Title", "Word List"],
+            ["aa", "Farm", "cat", "dog"],
+            ["aa", "Pets", "cat"],
+        ],
+    )
+    cache = TranslationCache(str(tmp_path / "cache.sqlite3"))
+    first = DummyTranslator()
+    stats = asyncio.run(
+        process_file(
+            str(input_path),
+            str(tmp_path / "out1.csv"),
+            translator=first,
+            pause_seconds=0,
+            show_progress=False,
+            cache=cache,
+        )
+    )
+    assert [c[0] for c in first.calls] == ["Farm", "cat", "dog", "Pets"]
+    assert stats.cache_hits == 0 and stats.cache_misses == 4
+    cache.close()
+
+    cache = TranslationCache(str(tmp_path / "cache.sqlite3"))
+    second = DummyTranslator()
+    stats = asyncio.run(
+        process_file(
+            str(input_path),
+            str(tmp_path / "out2.csv"),
+            translator=second,
+            pause_seconds=0,
+            show_progress=False,
+            cache=cache,
+        )
+    )
+    cache.close()
+    assert second.calls == []
+    assert stats.cache_hits == 4 and stats.cache_misses == 0
+    assert (tmp_path / "out1.csv").read_text(encoding="utf-8") == (
+        tmp_path / "out2.csv"
+    ).read_text(encoding="utf-8")
+
+
+def test_translation_cache_skips_failures_and_evicts(tmp_path: Path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.put("  big   dog ", "en", "zh-cn", "大狗")
+    cache.put("x", "en", "zh-cn", "[翻译失败:boom]")
+    assert cache.get("big dog", "en", "zh-cn") == "大狗"
+    assert cache.get("big dog", "en", "ja") is None
+    assert cache.get("x", "en", "zh-cn") is None
+    cache.put("a", "en", "zh-cn", "甲")
+    cache.put("b", "en", "zh-cn", "乙")
+    cache.close()
+    cache = TranslationCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    assert len(cache) == 2
+    cache.close()
+
+
+def test_plan_unique_words_keeps_first_occurrence_per_book():
+    records = [
+        ("aa", "A", ["cat", "dog", "cat"]),
+        ("aa", "B", ["dog", "pig"]),
+        ("bb", "C", ["cat"]),
+    ]
+    assert plan_unique_words(records) == [["cat", "dog"], ["pig"], []]
+
+
+def test_process_file_translates_each_unique_word_once(tmp_path: Path):
+    input_path = tmp_path / "input.csv"
+    output_path = tmp_path / "output.csv"
+    _write_rows(
+        input_path,
+        [
+            ["RAZ Level", "Book Title", "Word List"],
+            ["aa", "Farm", "cat", "dog"],
+            ["aa", "Pets", "dog", "cat", "fish"],
+        ],
+    )
+    translator = DummyTranslator()
+    stats = asyncio.run(
+        process_file(
+            str(input_path),
+            str(output_path),
+            translator=translator,
+            pause_seconds=0,
+            show_progress=False,
+        )
+    )
+    assert [c[0] for c in translator.calls] == ["Farm", "cat", "dog", "Pets", "fish"]
+    assert stats.total_words == 5 and stats.unique_words == 3
+    assert stats.processed == 3 and stats.success == 3
+    with output_path.open("r", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[3] == ["aa", "Pets-zh", "dog-zh", "cat-zh", "fish-zh"]
+
+
+class ListBatchTranslator(DummyTranslator):
+    """支持列表输入的替身；drop_last 时模拟批量结果少一项。"""
+
+    batch_mode = "list"
+
+    def __init__(self, mapping=None, drop_last=False):
+        super().__init__(mapping)
+        self.drop_last = drop_last
+
+    async def translate(self, text, src="en", dest="zh-cn"):
+        if isinstance(text, list):
+            self.calls.append((tuple(text), src, dest))
+            results = [self._Result(self.mapping.get(t, f"{t}-zh")) for t in text]
+            return results[:-1] if self.drop_last else results
+        return await super().translate(text, src=src, dest=dest)
+
+
+class JoinBatchTranslator(DummyTranslator):
+    batch_mode = "join"
+
+
+def test_detect_batch_mode_uses_protocol():
+    assert detect_batch_mode(DummyTranslator()) is None
+    assert detect_batch_mode(ListBatchTranslator()) == "list"
+    assert detect_batch_mode(JoinBatchTranslator()) == "join"
+    # googletrans 4.0.0-rc1 接受列表但逐项各发一次请求，未声明 batch_mode 时不按批量处理
+    GoogleLike = type("Translator", (DummyTranslator,), {"__module__": "googletrans.client"})
+    assert detect_batch_mode(GoogleLike()) is None
+
+
+def test_translate_in_chunks_sends_one_request_per_chunk_with_extra_texts():
+    translator = ListBatchTranslator({"Farm": "农场", "cat": "猫"})
+    stats = TranslationStats(total_words=3)
+    result = asyncio.run(
+        translate_in_chunks(
+            ["cat", "dog", "cow"],
+            translator,
+            chunk_size=2,
+            pause_seconds=0,
+            stats=stats,
+            extra_texts=["Farm"],
+        )
+    )
+    assert result == ["农场", "猫", "dog-zh", "cow-zh"]
+    # 书名并入第一块；最后一块只有一个词，直接逐词请求
+    assert [c[0] for c in translator.calls] == [("Farm", "cat", "dog"), "cow"]
+    assert stats.processed == 3 and stats.success == 3
+
+
+def test_translate_in_chunks_join_mode_splits_lines():
+    translator = JoinBatchTranslator()
+    result = asyncio.run(
+        translate_in_chunks(["sun", "moon"], translator, pause_seconds=0)
+    )
+    # 替身把整段 "sun\nmoon" 译为 "sun\nmoon-zh"，按行拆回两项
+    assert result == ["sun", "moon-zh"]
+    assert translator.calls == [("sun\nmoon", "en", "zh-cn")]
+
+
+def test_translate_in_chunks_falls_back_per_word_on_misaligned_batch():
+    translator = ListBatchTranslator(drop_last=True)
+    result = asyncio.run(
+        translate_in_chunks(
+            ["a", "b", "c", "d"], translator, chunk_size=2, pause_seconds=0
+        )
+    )
+    assert result == ["a-zh", "b-zh", "c-zh", "d-zh"]
+    assert [c[0] for c in translator.calls] == [
+        ("a", "b"),
+        "a",
+        "b",
+        ("c", "d"),
+        "c",
+        "d",
+    ]
+
+
+def test_process_file_pipeline_overlaps_books_and_keeps_input_order(tmp_path: Path):
+    input_path = tmp_path / "input.csv"
+    output_path = tmp_path / "output.csv"
+    # 第一本书的词最长（最慢），后面的书会先完成，必须经重排后按输入顺序写出
+    _write_rows(
+        input_path,
+        [
+            ["RAZ Level", "Book Title", "Word List"],
+            ["aa", "B1", "elephant", "b"],
+            ["aa", "B2", "c", "elephant"],
+            ["bb", "B3", "d"],
+        ],
+    )
+    translator = SlowTranslator()
+    stats = asyncio.run(
+        process_file(
+            str(input_path),
+            str(output_path),
+            translator=translator,
+            pause_seconds=0,
+            show_progress=False,
+            window=3,
+            concurrency=2,
+            flush_every=2,
+        )
+    )
+    # 三本书同时在窗口内，但在途请求总数仍受 concurrency 限制
+    assert translator.max_in_flight == 2
+    assert stats.unique_words == 4 and stats.success == 4
+    with output_path.open("r", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert [r[1] for r in rows[1:]] == ["B1-zh", "B1", "B2-zh", "B2", "B3-zh", "B3"]
+    assert rows[3] == ["aa", "B2-zh", "c-zh", "elephant-zh"]
+
+
+def test_process_file_pipeline_only_writes_complete_books_on_error(tmp_path: Path):
+    input_path = tmp_path / "input.csv"
+    output_path = tmp_path / "output.csv"
+    _write_rows(
+        input_path,
+        [
+            ["RAZ Level", "Book Title", "Word List"],
+            ["aa", "Good", "a"],
+            ["aa", "Bad", "b"],
+            ["aa", "Later", "c"],
+        ],
+    )
+
+    class ExplodingCache:
+        def get(self, text, src, dest):
+            if text == "b":
+                raise RuntimeError("cache is gone")
+            return None
+
+        def put(self, text, src, dest, translated):
+            pass
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(
+            process_file(
+                str(input_path),
+                str(output_path),
+                translator=DummyTranslator(),
+                pause_seconds=0,
+                show_progress=False,
+                cache=ExplodingCache(),
+                window=3,
+                flush_every=10,
+            )
+        )
+    with output_path.open("r", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert [r[1] for r in rows[1:]] == ["Good-zh", "Good"]
+
+
+def test_process_file_stream_mode_matches_in_memory_output(tmp_path: Path):
+    input_path = tmp_path / "input.csv"
+    rows = [["RAZ Level", "Book Title", "Word List"]]
+    rows += [
+        ["aa", f"Book {i}"] + [f"w{j}" for j in range(i % 4 + 1)] + ["", " "]
+        for i in range(12)
+    ]
+    _write_rows(input_path, rows)
+    assert count_max_words(str(input_path)) == 4
+    assert count_max_words(str(input_path), limit=2) == 2
+
+    outputs = {}
+    for stream in (False, True):
+        output_path = tmp_path / f"out-{stream}.csv"
+        stats = asyncio.run(
+            process_file(
+                str(input_path),
+                str(output_path),
+                translator=DummyTranslator(),
+                pause_seconds=0,
+                show_progress=False,
+                window=2,
+                stream=stream,
+            )
+        )
+        assert stats.total_words == 30 and stats.unique_words == 4
+        outputs[stream] = output_path.read_text(encoding="utf-8")
+    assert outputs[True] == outputs[False]
+
+
+class FailOnWordCache:
+    """缓存替身：查到指定单词时抛异常，用来模拟翻译中途被打断。"""
+
+    def __init__(self, word):
+        self.word = word
+
+    def get(self, text, src, dest):
+        if text == self.word:
+            raise RuntimeError("interrupted")
+        return None
+
+    def put(self, text, src, dest, translated):
+        pass
+
+
+def test_resume_from_journal_skips_done_books_and_reuses_partial_words(tmp_path: Path):
+    input_path = tmp_path / "input.csv"
+    output_path = tmp_path / "output.csv"
+    _write_rows(
+        input_path,
+        [
+            ["RAZ Level", "Book Title", "Word List"],
+            ["aa", "Farm", "cat", "dog"],
+            ["bb", "Farm", "pig"],
+            ["bb", "Zoo", "lion", "boom", "cat"],
+        ],
+    )
+    options = dict(chunk_size=1, pause_seconds=0, show_progress=False)
+    with pytest.raises(RuntimeError):
+        asyncio.run(
+            process_file(
+                str(input_path),
+                str(output_path),
+                translator=DummyTranslator(),
+                cache=FailOnWordCache("boom"),
+                **options,
+            )
+        )
+    state = read_journal_tail(CheckpointJournal.path_for(str(output_path)))
+    assert (state.index, state.level, state.title) == (1, "bb", "Farm")
+    assert state.partial == {"Zoo": "Zoo-zh", "lion": "lion-zh"}
+
+    # 模拟崩溃时写了一半的行：恢复时应按日志中的偏移截掉
+    with output_path.open("a", encoding="utf-8") as f:
+        f.write("bb,半行")
+    translator = DummyTranslator()
+    asyncio.run(
+        process_file(
+            str(input_path),
+            str(output_path),
+            translator=translator,
+            resume=True,
+            **options,
+        )
+    )
+    assert [c[0] for c in translator.calls] == ["boom", "cat"]
+    with output_path.open("r", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert [r[:2] for r in rows[1:]] == [
+        ["aa", "Farm-zh"],
+        ["aa", "Farm"],
+        ["bb", "Farm-zh"],
+        ["bb", "Farm"],
+        ["bb", "Zoo-zh"],
+        ["bb", "Zoo"],
+    ]
+    assert rows[5] == ["bb", "Zoo-zh", "lion-zh", "boom-zh", "cat-zh"]
+
+
+def test_read_journal_tail_stops_at_window_boundary(tmp_path: Path):
+    path = str(tmp_path / "out.csv.journal")
+    journal = CheckpointJournal(path, truncate=True)
+    for i in range(50):
+        journal.book_started(i)
+        journal.record(i, "aa", f"B{i}", f"w{i}", f"t{i}")
+        journal.commit(i, "aa", f"B{i}", offset=i * 10)
+    journal.book_started(50)
+    journal.book_started(51)
+    journal.record(51, "aa", "B51", "late", "迟")
+    journal.commit(50, "aa", "B50", offset=500)
+    journal.record(51, "aa", "B51", "later", "更迟")
+    journal.close()
+    state = read_journal_tail(path, block_size=64)
+    assert state.index == 50 and state.offset == 500
+    assert state.partial == {"late": "迟", "later": "更迟"}
+
+
+def test_get_processed_books_distinguishes_levels(tmp_path: Path):
+    output_path = tmp_path / "output.csv"
+    _write_rows(
+        output_path,
+        [
+            ["RAZ Level", "Book Title", "单词1"],
+            ["aa", "农场", "猫"],
+            ["aa", "Farm", "cat"],
+        ],
+    )
+    assert get_processed_books(str(output_path)) == {("aa", "Farm")}
+
+
+FAILED_OUTPUT_ROWS = [
+    ["RAZ Level", "Book Title", "单词1", "单词2"],
+    ["aa", "农场", "[翻译失败:timeout]", "狗"],
+    ["aa", "Farm", "cat", "dog"],
+    ["bb", "[翻译失败:timeout]", "[翻译失败:429]", ""],
+    ["bb", "Pets", "cat", ""],
+    ["bb", "好书", "书", ""],
+    ["bb", "Good", "book", ""],
+]
+
+
+def test_re_translate_failures_retries_each_failed_word_once(tmp_path: Path):
+    input_path = tmp_path / "failed.csv"
+    output_path = tmp_path / "fixed.csv"
+    _write_rows(input_path, FAILED_OUTPUT_ROWS)
+    translator = DummyTranslator({"cat": "猫", "Pets": "宠物"})
+    stats = asyncio.run(
+        re_translate_failures(
+            str(input_path),
+            str(output_path),
+            translator=translator,
+            pause_seconds=0,
+            show_progress=False,
+            concurrency=4,
+        )
+    )
+    assert sorted(c[0] for c in translator.calls) == ["Pets", "cat"]
+    assert stats.total_words == 3 and stats.unique_words == 2 and stats.success == 2
+    with output_path.open("r", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[1] == ["aa", "农场", "猫", "狗"]
+    assert rows[3] == ["bb", "宠物", "猫", ""]
+    assert rows[5:] == FAILED_OUTPUT_ROWS[5:]
+
+
+def test_re_translate_failures_in_place_replaces_atomically(tmp_path: Path):
+    input_path = tmp_path / "failed.csv"
+    _write_rows(input_path, FAILED_OUTPUT_ROWS)
+    asyncio.run(
+        re_translate_failures(
+            str(input_path),
+            translator=DummyTranslator(),
+            pause_seconds=0,
+            show_progress=False,
+            in_place=True,
+        )
+    )
+    text = input_path.read_text(encoding="utf-8")
+    assert "[翻译失败" not in text and "cat-zh" in text
+    assert [p.name for p in tmp_path.iterdir()] == ["failed.csv"]
+
+
+def test_latency_histogram_quantiles_interpolate_within_buckets():
+    hist = LatencyHistogram(bounds=(0.1, 0.2, 0.4))
+    for seconds in [0.05] * 50 + [0.15] * 45 + [0.3] * 5:
+        hist.observe(seconds)
+    assert hist.count == 100
+    assert hist.quantile(0.5) == pytest.approx(0.1)
+    assert 0.1 < hist.quantile(0.9) < 0.2
+    assert 0.2 < hist.quantile(0.99) <= 0.4
+
+
+def test_stats_record_latency_attempts_and_sleep():
+    class FlakyOnce(DummyTranslator):
+        async def translate(self, text, src="en", dest="zh-cn"):
+            if text == "cow" and not any(c[0] == "cow" for c in self.calls):
+                self.calls.append((text, src, dest))
+                raise RuntimeError("flaky")
+            return await super().translate(text, src=src, dest=dest)
+
+    stats = TranslationStats(unique_words=3)
+    asyncio.run(
+        translate_in_chunks(
+            ["cat", "dog", "cow"], FlakyOnce(), pause_seconds=0.01, stats=stats
+        )
+    )
+    assert stats.attempts == {1: 2, 2: 1}
+    assert stats.latency.count == 4  # 含失败的那次请求
+    assert stats.sleep_seconds >= 0.01
+    snapshot = stats.snapshot()
+    assert snapshot["attempts"] == {"1": 2, "2": 1} and snapshot["requests"] == 4
+    prom = stats.to_prometheus()
+    assert 'raz_translate_request_latency_seconds_bucket{le="+Inf"} 4' in prom
+    assert "raz_translate_success_total 3" in prom
+
+
+def test_progress_printer_throttles_output(capsys):
+    printer = ProgressPrinter(refresh_seconds=60)
+    stats = TranslationStats(unique_words=3)
+    for word in ["a", "b", "c"]:
+        stats.processed += 1
+        printer(stats, word, True, 0)
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 2  # 首次输出 + 完成时输出
+    assert lines[-1].startswith("[3/3]")
+
+
+def test_process_file_writes_metrics_snapshot_at_exit(tmp_path: Path):
+    input_path = tmp_path / "input.csv"
+    _write_rows(input_path, [["RAZ Level", "Book Title", "单词1"], ["aa", "Farm", "cat"]])
+    metrics_path = tmp_path / "metrics.json"
+    asyncio.run(
+        process_file(
+            str(input_path),
+            str(tmp_path / "out.csv"),
+            translator=DummyTranslator(),
+            pause_seconds=0,
+            show_progress=False,
+            metrics_out=str(metrics_path),
+        )
+    )
+    snapshot = json.loads(metrics_path.read_text(encoding="utf-8"))
+    assert snapshot["success"] == 1
+    assert snapshot["requests"] == 2  # 书名 + 单词
+    assert set(snapshot["latency_seconds"]) == {"p50", "p95", "p99"}
+
+
+def test_failed_word_is_retried_later_without_blocking_the_book():
+    class FailFirstTranslator(DummyTranslator):
+        async def translate(self, text, src="en", dest="zh-cn"):
+            first = all(c[0] != text for c in self.calls)
+            self.calls.append((text, src, dest))
+            if text == "bad" and first:
+                raise RuntimeError("flaky")
+            return self._Result(f"{text}-zh")
+
+    translator = FailFirstTranslator()
+    stats = TranslationStats(unique_words=3)
+    result = asyncio.run(
+        translate_in_chunks(
+            ["bad", "cat", "dog"], translator, pause_seconds=0.05, stats=stats
+        )
+    )
+    assert result == ["bad-zh", "cat-zh", "dog-zh"]
+    # 失败的词退避期间其余词照常翻译，重试排在最后
+    assert [c[0] for c in translator.calls] == ["bad", "cat", "dog", "bad"]
+    assert stats.retries == 1 and stats.success == 3
+
+
+def test_retry_scheduler_backoff_grows_exponentially_with_jitter():
+    scheduler = RetryScheduler(seed=1, max_delay=1.0)
+    for attempt, full in [(1, 0.1), (2, 0.2), (3, 0.4), (6, 1.0)]:
+        delay = scheduler.backoff(attempt, 0.1)
+        assert full / 2 <= delay <= full
+
+
+def test_circuit_breaker_opens_after_burst_and_probes_before_closing():
+    async def run():
+        breaker = CircuitBreaker(threshold=2, cooldown=0.05)
+        breaker.record_failure()
+        assert breaker.state == "closed"
+        breaker.record_failure()
+        assert breaker.state == "open" and breaker.trips == 1
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await breaker.wait()  # 冷却后作为探测请求放行
+        assert loop.time() - start >= 0.04 and breaker.state == "half_open"
+        waiter = asyncio.create_task(breaker.wait())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()  # 探测结果出来前其余请求保持暂停
+        breaker.record_success()
+        await asyncio.wait_for(waiter, 1)
+        assert breaker.state == "closed"
+
+    asyncio.run(run())
+
+
+def test_permanent_errors_fail_fast_without_tripping_breaker():
+    class MissingWords(DummyTranslator):
+        async def translate(self, text, src="en", dest="zh-cn"):
+            if text.startswith("x"):
+                self.calls.append((text, src, dest))
+                raise PermanentTranslationError(f"词典中没有 '{text}'")
+            return await super().translate(text, src, dest)
+
+    async def run(concurrency):
+        translator = MissingWords()
+        scheduler = RetryScheduler(concurrency, breaker_threshold=2)
+        stats = TranslationStats(unique_words=10)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        words = [f"x{k}" for k in range(7)] + ["a", "b", "c"]
+        result = await translate_in_chunks(
+            words, translator, pause_seconds=0.5, stats=stats,
+            concurrency=concurrency, scheduler=scheduler, batch=None,
+        )
+        # 缺词各只请求一次：不退避、不重试，熔断器保持闭合（串行模式另有一次块后暂停）
+        assert loop.time() - start < (1.0 if concurrency == 1 else 0.5)
+        assert [r.startswith("[翻译失败") for r in result] == [True] * 7 + [False] * 3
+        assert sum(1 for c in translator.calls if c[0].startswith("x")) == 7
+        assert (stats.fail, stats.retries) == (7, 0)
+        assert scheduler.breaker.state == "closed" and scheduler.breaker.trips == 0
+
+    asyncio.run(run(4))
+    asyncio.run(run(1))
+
+
+def test_adaptive_limit_halves_on_throttle_and_recovers_on_success():
+    async def run():
+        limit = AdaptiveLimit(8, maximum=10, decrease_interval=0)
+        limit.on_throttle()
+        assert limit.limit == 4
+        for _ in range(4):
+            limit.on_success()
+        assert limit.limit == 5
+        for _ in range(100):
+            limit.on_success()
+        assert limit.limit == 10
+
+    asyncio.run(run())
+
+
+def test_scheduler_reduces_concurrency_when_throttled():
+    class ThrottleOnce(SlowTranslator):
+        def __init__(self):
+            super().__init__()
+            self.throttled = False
+
+        async def translate(self, text, src="en", dest="zh-cn"):
+            if not self.throttled:
+                self.throttled = True
+                raise RuntimeError("429 Too Many Requests")
+            return await super().translate(text, src=src, dest=dest)
+
+    scheduler = RetryScheduler(4)
+    stats = TranslationStats(unique_words=3)
+    result = asyncio.run(
+        translate_in_chunks(
+            ["a", "b", "c"],
+            ThrottleOnce(),
+            pause_seconds=0,
+            stats=stats,
+            concurrency=4,
+            scheduler=scheduler,
+        )
+    )
+    assert result == ["a-zh", "b-zh", "c-zh"]
+    assert stats.throttled == 1 and scheduler.throttled == 1
+    assert scheduler.limit.limit < 4  # 减半后只随少量成功部分回升
+
+
+class DestTranslator(DummyTranslator):
+    async def translate(self, text, src="en", dest="zh-cn"):
+        self.calls.append((text, src, dest))
+        return self._Result(f"{text}-{dest}")
+
+
+MULTI_ROWS = [
+    ["RAZ Level", "Book Title", "单词1", "单词2"],
+    ["aa", "Farm", "cat", "dog"],
+    ["bb", "Pets", "cat"],
+]
+
+
+def test_process_file_multi_dest_writes_one_file_per_language(tmp_path: Path):
+    input_path = tmp_path / "input.csv"
+    _write_rows(input_path, MULTI_ROWS)
+    translator = DestTranslator()
+    stats = asyncio.run(
+        process_file(
+            str(input_path),
+            str(tmp_path / "out.csv"),
+            translator=translator,
+            pause_seconds=0,
+            show_progress=False,
+            concurrency=4,
+            dest="zh-cn,ja",
+        )
+    )
+    assert stats.unique_words == 4 and stats.success == 4
+    # 书名与去重后的单词各按每种语言请求一次
+    assert sorted(c[0] for c in translator.calls if c[2] == "ja") == [
+        "Farm", "Pets", "cat", "dog"
+    ]
+    assert not (tmp_path / "out.csv").exists()
+    with (tmp_path / "out.ja.csv").open(encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[1:] == [
+        ["aa", "Farm-ja", "cat-ja", "dog-ja"],
+        ["aa", "Farm", "cat", "dog"],
+        ["bb", "Pets-ja", "cat-ja", ""],
+        ["bb", "Pets", "cat", ""],
+    ]
+    assert "cat-zh-cn" in (tmp_path / "out.zh-cn.csv").read_text(encoding="utf-8")
+
+
+def test_process_file_writes_header_to_every_new_output(tmp_path: Path):
+    input_path = tmp_path / "input.csv"
+    _write_rows(input_path, MULTI_ROWS)
+    # 基础输出文件已存在（如之前的单语言运行）时，各语言文件仍是新文件
+    (tmp_path / "out.csv").write_text("RAZ Level,Book Title,单词1\n", encoding="utf-8")
+    header = ["RAZ Level", "Book Title", "单词1", "单词2"]
+
+    def run(**kwargs):
+        asyncio.run(
+            process_file(
+                str(input_path),
+                str(tmp_path / "out.csv"),
+                translator=DestTranslator(),
+                pause_seconds=0,
+                show_progress=False,
+                **kwargs,
+            )
+        )
+
+    run(dest="zh-cn,ja")
+    for name in ("out.zh-cn.csv", "out.ja.csv"):
+        rows = list(csv.reader((tmp_path / name).open(encoding="utf-8", newline="")))
+        assert rows[0] == header and len(rows) == 5
+    run()  # 覆盖写入已存在的非空文件同样重写表头
+    rows = list(csv.reader((tmp_path / "out.csv").open(encoding="utf-8", newline="")))
+    assert rows[0] == header and len(rows) == 5
+
+
+def test_process_file_multi_dest_wide_layout(tmp_path: Path):
+    input_path = tmp_path / "input.csv"
+    output_path = tmp_path / "out.csv"
+    _write_rows(input_path, MULTI_ROWS)
+    asyncio.run(
+        process_file(
+            str(input_path),
+            str(output_path),
+            translator=DestTranslator(),
+            pause_seconds=0,
+            show_progress=False,
+            dest=["zh-cn", "zh-tw"],
+            layout="wide",
+            window=2,
+        )
+    )
+    with output_path.open(encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert [r[1] for r in rows[1:]] == [
+        "Farm-zh-cn", "Farm-zh-tw", "Farm", "Pets-zh-cn", "Pets-zh-tw", "Pets"
+    ]
+    assert not Path(str(output_path) + ".journal").exists()
+
+
+def test_process_file_multi_dest_rejects_resume(tmp_path: Path):
+    input_path = tmp_path / "input.csv"
+    _write_rows(input_path, MULTI_ROWS)
+    with pytest.raises(ValueError):
+        asyncio.run(
+            process_file(
+                str(input_path),
+                str(tmp_path / "out.csv"),
+                translator=DestTranslator(),
+                resume=True,
+                dest="zh-cn,ja",
+            )
+        )
+
+
+SHARD_ROWS = [["RAZ Level", "Book Title", "Word List"]] + [
+    ["aa" if i % 3 else "bb", f"Book{i}"] + [f"w{j}" for j in range(i % 4 + 1)]
+    for i in range(12)
+]
+
+
+def _run_shards(tmp_path: Path, count: int):
+    input_path = tmp_path / "input.csv"
+    _write_rows(input_path, SHARD_ROWS)
+    paths = []
+    for index in range(count):
+        path = tmp_path / f"part{index}.csv"
+        asyncio.run(
+            process_file(
+                str(input_path),
+                str(path),
+                translator=DummyTranslator(),
+                pause_seconds=0,
+                show_progress=False,
+                shard=(index, count),
+            )
+        )
+        paths.append(str(path))
+    return input_path, paths
+
+
+def test_shard_of_is_stable_and_partitions_every_book():
+    assert parse_shard("1/4") == (1, 4)
+    with pytest.raises(ValueError):
+        parse_shard("4/4")
+    owners = [shard_of(r[0], r[1], 3) for r in SHARD_ROWS[1:]]
+    assert owners == [shard_of(r[0], r[1], 3) for r in SHARD_ROWS[1:]]
+    assert set(owners) == {0, 1, 2}
+
+
+def test_merge_restores_input_order_and_global_header(tmp_path: Path):
+    input_path, paths = _run_shards(tmp_path, 3)
+    full_path = tmp_path / "full.csv"
+    asyncio.run(
+        process_file(
+            str(input_path),
+            str(full_path),
+            translator=DummyTranslator(),
+            pause_seconds=0,
+            show_progress=False,
+        )
+    )
+    merged_path = tmp_path / "merged.csv"
+    assert merge_shards(str(input_path), list(reversed(paths)), str(merged_path)) == 12
+    assert merged_path.read_text(encoding="utf-8") == full_path.read_text(encoding="utf-8")
+
+
+def test_merge_reports_missing_and_duplicate_books(tmp_path: Path):
+    input_path, paths = _run_shards(tmp_path, 2)
+    with open(paths[0], encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    _write_rows(Path(paths[0]), rows[:1] + rows[3:] + rows[3:5])  # 删掉第一本，末尾重复一本
+    merged_path = tmp_path / "merged.csv"
+    with pytest.raises(ValueError) as excinfo:
+        merge_shards(str(input_path), paths, str(merged_path))
+    assert "缺少 1 本" in str(excinfo.value) and "重复 1 本" in str(excinfo.value)
+    assert not merged_path.exists() and not Path(str(merged_path) + ".tmp").exists()
+
+
+def _incremental_run(input_path: Path, output_path: Path, translator):
+    return asyncio.run(
+        process_file(
+            str(input_path),
+            str(output_path),
+            translator=translator,
+            pause_seconds=0,
+            show_progress=False,
+            incremental=True,
+        )
+    )
+
+
+def test_incremental_build_translates_only_changed_books(tmp_path: Path):
+    input_path = tmp_path / "input.csv"
+    output_path = tmp_path / "out.csv"
+    _write_rows(
+        input_path,
+        [
+            ["RAZ Level", "Book Title", "Word List"],
+            ["aa", "Farm", "cat", "dog"],
+            ["aa", "Pets", "bird"],
+            ["bb", "Zoo", "lion"],
+        ],
+    )
+    _incremental_run(input_path, output_path, DummyTranslator({"cat": "猫"}))
+    assert Path(str(output_path) + ".books.json").exists()
+
+    # 未变化时不发请求也不改写输出
+    unchanged = DummyTranslator()
+    mtime = output_path.stat().st_mtime_ns
+    _incremental_run(input_path, output_path, unchanged)
+    assert unchanged.calls == [] and output_path.stat().st_mtime_ns == mtime
+
+    # Farm 多了一个词、Pets 被删除、新增 Sea，Zoo 不变；新表头更宽
+    _write_rows(
+        input_path,
+        [
+            ["RAZ Level", "Book Title", "Word List"],
+            ["aa", "Farm", "cat", "dog", "cow"],
+            ["bb", "Zoo", "lion"],
+            ["bb", "Sea", "fish", "lion"],
+        ],
+    )
+    translator = DummyTranslator()
+    stats = _incremental_run(input_path, output_path, translator)
+    assert sorted(c[0] for c in translator.calls) == ["Sea", "cow", "fish"]
+    assert stats.unique_words == 2
+    with output_path.open(encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["RAZ Level", "Book Title", "单词1", "单词2", "单词3"]
+    assert rows[1:] == [
+        ["aa", "Farm-zh", "猫", "dog-zh", "cow-zh"],
+        ["aa", "Farm", "cat", "dog", "cow"],
+        ["bb", "Zoo-zh", "lion-zh", "", ""],
+        ["bb", "Zoo", "lion", "", ""],
+        ["bb", "Sea-zh", "fish-zh", "lion-zh", ""],
+        ["bb", "Sea", "fish", "lion", ""],
+    ]
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "input.csv", "out.csv", "out.csv.books.json"
+    ]
+
+
+PLAN_ROWS = [
+    ["RAZ Level", "Book Title", "Word List"],
+    ["aa", "Farm", "cat", "dog", "cow"],
+    ["aa", "Pets", "cat", "bird"],
+    ["bb", "Sea", "fish"],
+]
+
+
+def test_plan_run_predicts_requests_without_translating(tmp_path: Path):
+    input_path = tmp_path / "input.csv"
+    output_path = tmp_path / "out.csv"
+    _write_rows(input_path, PLAN_ROWS)
+    cache = TranslationCache(str(tmp_path / "cache.sqlite"))
+    cache.put("dog", "en", "zh-cn", "狗")
+    translator = DummyTranslator()
+    kwargs = dict(translator=translator, chunk_size=2, pause_seconds=0, cache=cache)
+
+    plan = plan_run(str(input_path), str(output_path), latency=0.5, **kwargs)
+    assert translator.calls == [] and not output_path.exists()
+    assert (plan.books, plan.total_words, plan.unique_words) == (3, 6, 5)
+    assert plan.resolved_cache == 1 and plan.to_translate == 7 and plan.requests == 7
+    assert plan.seconds == pytest.approx(3.5)
+
+    asyncio.run(process_file(str(input_path), str(output_path), show_progress=False, **kwargs))
+    assert len(translator.calls) == plan.requests
+    cache.close()
+
+    # 输出已完整：续传不再需要任何请求；换成批量时每块一次请求
+    resumed = plan_run(str(input_path), str(output_path), resume=True, batch="list", chunk_size=2)
+    assert resumed.books_skipped == 3 and resumed.requests == 0
+    batched = plan_run(str(input_path), str(tmp_path / "new.csv"), batch="list", chunk_size=2)
+    assert batched.chunks == 4 and batched.requests == 4
+    # 未给出翻译器时按默认 googletrans 逐词计，请求数即书名加去重后的单词数
+    default = plan_run(str(input_path), str(tmp_path / "new.csv"), chunk_size=2)
+    assert default.batch_mode is None and default.requests == 8
+
+
+def test_plan_cli_prints_json(tmp_path: Path, capsys):
+    input_path = tmp_path / "input.csv"
+    _write_rows(input_path, PLAN_ROWS)
+    main(
+        [str(input_path), str(tmp_path / "out.csv"), "--plan", "json", "--no-cache",
+         "--limit", "2", "--concurrency", "4", "--plan-failure-rate", "0.5"]
+    )
+    plan = json.loads(capsys.readouterr().out)
+    assert plan["books"] == 2 and plan["mode"] == "concurrent"
+    assert plan["retry_seconds"] > 0 and plan["retry_seconds_max"] > plan["retry_seconds"]
+    assert not (tmp_path / "out.csv").exists()
+
+    # 缓存不存在时不创建；已存在时只读打开，命中计入估算但文件不被改动或淘汰
+    cache_path = tmp_path / "cache.sqlite3"
+    args = [str(input_path), str(tmp_path / "out.csv"), "--plan", "json", "--cache", str(cache_path)]
+    main(args + ["--cache-max-entries", "0"])
+    assert not cache_path.exists()
+    cache = TranslationCache(str(cache_path))
+    cache.put("dog", "en", "zh-cn", "狗")
+    cache.close()
+    before = cache_path.read_bytes()
+    capsys.readouterr()
+    main(args + ["--cache-max-entries", "0"])
+    assert json.loads(capsys.readouterr().out)["resolved_cache"] == 1
+    assert cache_path.read_bytes() == before
+
+
+class GatedTranslator(DummyTranslator):
+    """每个词的请求挂起到对应 Event 被放行；记录被取消的请求。"""
+
+    def __init__(self):
+        super().__init__()
+        self.gates = {}
+        self.cancelled = []
+
+    async def translate(self, text, src="en", dest="zh-cn"):
+        gate = self.gates.setdefault(text, asyncio.Event())
+        try:
+            await gate.wait()
+        except asyncio.CancelledError:
+            self.cancelled.append(text)
+            raise
+        return await super().translate(text, src, dest)
+
+
+def test_iter_translated_records_streams_without_files(tmp_path: Path):
+    translator = DummyTranslator({"cat": "猫"})
+    books = [("aa", "Farm", ["cat", "dog"]), ("aa", "Zoo", ["cat", "lion"])]
+
+    async def from_async():
+        for book in books:
+            yield book
+
+    async def collect(source, **kwargs):
+        return [item async for item in iter_translated_records(source, translator, pause_seconds=0, **kwargs)]
+
+    stats = TranslationStats()
+    items = asyncio.run(collect(iter(books), stats=stats))
+    assert [(i.index, i.title_translated, i.translations) for i in items] == [
+        (0, "Farm-zh", ["猫", "dog-zh"]),
+        (1, "Zoo-zh", ["猫", "lion-zh"]),
+    ]
+    assert items[1].record == books[1]
+    assert [c[0] for c in translator.calls].count("cat") == 1  # 跨书去重
+    assert (stats.total_words, stats.unique_words) == (4, 3)
+
+    translator.calls.clear()
+    items = asyncio.run(collect(from_async(), dest="zh-cn,ja", window=1))
+    assert items[0].translations[0] == ("猫", "猫") and items[1].title_translated == ("Zoo-zh", "Zoo-zh")
+    assert not list(tmp_path.iterdir())
+
+
+def test_iter_translated_records_backpressure_order_and_cancellation():
+    async def scenario():
+        translator = GatedTranslator()
+        read = []
+
+        def books():
+            for k in range(10):
+                read.append(k)
+                yield "aa", f"B{k}", [f"w{k}"]
+
+        stream = iter_translated_records(
+            books(), translator, window=2, concurrency=4, ordered=False, pause_seconds=0, batch=None
+        )
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.01)
+        assert read == [0, 1, 2]  # 窗口满后停止读取，只有第 3 本已读入并等待名额
+        for text in ("B1", "w1"):  # 第二本先完成，乱序模式下先产出
+            translator.gates.setdefault(text, asyncio.Event()).set()
+        assert (await first).title == "B1"
+        await asyncio.sleep(0.01)
+        assert read == [0, 1, 2]  # 调用方取下一本之前名额不释放
+        second = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.01)
+        assert read == [0, 1, 2, 3] and "B2" in translator.gates
+
+        second.cancel()  # 取消消费方即取消全部在途请求
+        with pytest.raises(asyncio.CancelledError):
+            await second
+        assert sorted(translator.cancelled) == ["B0", "B2", "w0", "w2"]
+
+    asyncio.run(scenario())
+
+
+def test_watch_debounces_edits_and_rebuilds_only_changed_books(tmp_path: Path):
+    input_path = tmp_path / "input.csv"
+    output_path = tmp_path / "out.csv"
+    header = ["RAZ Level", "Book Title", "Word List"]
+    _write_rows(input_path, [header, ["aa", "Farm", "cat"], ["bb", "Sea", "fish"]])
+    translator = DummyTranslator()
+
+    async def scenario():
+        task = asyncio.create_task(
+            watch_file(
+                str(input_path),
+                str(output_path),
+                translator=translator,
+                poll_interval=0.01,
+                debounce=0.2,
+                max_runs=2,
+                pause_seconds=0,
+                show_progress=False,
+            )
+        )
+        while not Path(str(output_path) + ".books.json").exists():
+            await asyncio.sleep(0.01)
+        translator.calls.clear()
+        for k in range(1, 4):  # 一连串修改只触发一次构建，且只用最后的内容
+            _write_rows(input_path, [header, ["aa", "Farm", "cat"], ["bb", "Sea", "fish", "crab" + "s" * k]])
+            await asyncio.sleep(0.03)
+        return await asyncio.wait_for(task, 5)
+
+    assert asyncio.run(scenario()) == 2
+    assert [call[0] for call in translator.calls] == ["crabsss"]
+    rows = list(csv.reader(output_path.open(encoding="utf-8")))
+    assert rows[3][2:4] == ["fish-zh", "crabsss-zh"] and rows[4][3] == "crabsss"
+    assert not Path(str(output_path) + ".tmp").exists()
+
+
+def test_watch_survives_unexpected_build_errors(tmp_path: Path, capsys):
+    input_path = tmp_path / "input.csv"
+    output_path = tmp_path / "out.csv"
+    header = ["RAZ Level", "Book Title", "Word List"]
+    _write_rows(input_path, [header, ["aa", "Farm", "cat"]])
+
+    class LockedOnce(TranslationCache):
+        armed = False
+
+        def commit(self):
+            if self.armed:
+                self.armed = False
+                raise sqlite3.OperationalError("database is locked")
+            super().commit()
+
+    cache = LockedOnce(str(tmp_path / "cache.sqlite3"))
+    cache.armed = True  # 第一次构建结束提交缓存时失败
+
+    async def scenario():
+        task = asyncio.create_task(
+            watch_file(
+                str(input_path),
+                str(output_path),
+                translator=DummyTranslator(),
+                cache=cache,
+                poll_interval=0.01,
+                debounce=0.05,
+                max_runs=2,
+                pause_seconds=0,
+                show_progress=False,
+            )
+        )
+        while "更新失败" not in capsys.readouterr().out:
+            if task.done():
+                task.result()  # 守护提前退出时抛出其异常
+            await asyncio.sleep(0.01)
+        _write_rows(input_path, [header, ["aa", "Farm", "cat", "dog"]])
+        return await asyncio.wait_for(task, 5)
+
+    # 第一次构建的 sqlite3 错误只打印，守护继续轮询并完成下一次构建
+    assert asyncio.run(scenario()) == 2
+    assert cache.get("dog", "en", "zh-cn") == "dog-zh"
+    cache.close()
@@ -0,0 +1,145 @@
+# codex: 2026-10-17 请求时间线追踪：记录各阶段与每次翻译请求的 span，写出 Chrome trace-event JSON
+"""
+运行时间线追踪（--trace）。
+
+span(名称, 分组, **参数) 记录一段耗时，写出为 Chrome trace-event 格式（chrome://tracing 或
+https://ui.perfetto.dev 可直接打开）。同一分组内同时进行的 span 分到不同的行（lane），
+因此并发请求、书目窗口与空闲间隙在时间线上一目了然：
+
+- main：读取输入、扫描输出、落盘等同步阶段，固定在一行内按调用关系嵌套；
+- book：每本书从开始翻译到全部译文就绪；
+- request：每次翻译请求（单词或整块、尝试序号、所属书目）；
+- sleep：固定暂停、重试退避与限速等待。
+
+未启用追踪时 span() 只判断一次全局变量并返回共享的空上下文，开销可以忽略。
+"""
+
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Optional
+
+MAIN = "main"
+_GROUPS = (MAIN, "book", "request", "sleep")
+_NULL = contextlib.nullcontext()
+_TRACER: Optional["Tracer"] = None
+_BOOK: contextvars.ContextVar = contextvars.ContextVar("trace_book", default=None)
+
+
+class Tracer:
+    """收集 span 为 Chrome trace 的 "X"（完整事件），按分组分配互不重叠的行。"""
+
+    def __init__(self) -> None:
+        self.events: List[dict] = []
+        self._origin = time.perf_counter()
+        self._busy: Dict[str, List[bool]] = {}
+
+    def _tid(self, group: str, lane: int) -> int:
+        index = _GROUPS.index(group) if group in _GROUPS else len(_GROUPS)
+        return index * 1000 + lane
+
+    def _take_lane(self, group: str) -> int:
+        if group == MAIN:
+            return 0
+        busy = self._busy.setdefault(group, [])
+        for lane, taken in enumerate(busy):
+            if not taken:
+                busy[lane] = True
+                return lane
+        busy.append(True)
+        tid = self._tid(group, len(busy) - 1)
+        self.events.append(
+            {"ph": "M", "name": "thread_name", "pid": 1, "tid": tid,
+             "args": {"name": f"{group} {len(busy) - 1}"}}
+        )
+        self.events.append(
+            {"ph": "M", "name": "thread_sort_index", "pid": 1, "tid": tid,
+             "args": {"sort_index": tid}}
+        )
+        return len(busy) - 1
+
+    @contextlib.contextmanager
+    def span(self, name: str, group: str = MAIN, **args) -> Iterator[None]:
+        lane = self._take_lane(group)
+        book = _BOOK.get()
+        if book is not None and group != "book":
+            args.setdefault("book", book)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            if group != MAIN:
+                self._busy[group][lane] = False
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": group,
+                    "ph": "X",
+                    "ts": round((start - self._origin) * 1e6, 1),
+                    "dur": round((end - start) * 1e6, 1),
+                    "pid": 1,
+                    "tid": self._tid(group, lane),
+                    "args": args,
+                }
+            )
+
+    def write(self, path: str) -> None:
+        """原子写出 {"traceEvents": [...]}。"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"traceEvents": self.events, "displayTimeUnit": "ms"},
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, path)
+
+
+def enabled() -> bool:
+    return _TRACER is not None
+
+
+def span(name: str, group: str = MAIN, **args):
+    """记录一段耗时；未启用追踪时返回共享的空上下文。"""
+    tracer = _TRACER
+    if tracer is None:
+        return _NULL
+    return tracer.span(name, group, **args)
+
+
+def traced(func):
+    """装饰同步函数，启用追踪时在 main 分组记录一次以函数名命名的 span。"""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _TRACER is None:
+            return func(*args, **kwargs)
+        with _TRACER.span(func.__name__):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def set_book(index: int, title: str) -> None:
+    """标记当前任务（及其后创建的子任务）所属的书目，之后的 span 自动带上 book 参数。"""
+    if _TRACER is not None:
+        _BOOK.set(f"{index}:{title}")
+
+
+@contextlib.contextmanager
+def record(path: Optional[str]) -> Iterator[Optional[Tracer]]:
+    """path 不为空时在此范围内启用追踪，退出时（包括异常退出）写出 trace 文件。"""
+    global _TRACER
+    if not path:
+        yield None
+        return
+    tracer = _TRACER = Tracer()
+    try:
+        yield tracer
+    finally:
+        _TRACER = None
+        tracer.write(path)
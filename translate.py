@@ -7,22 +7,121 @@
 
 import argparse
 import asyncio
+import bisect
+import contextlib
 import csv
+import functools
+import hashlib
+import io
+import itertools
+import json
 import os
+import random
+import sqlite3
 import sys
-from dataclasses import dataclass
-from typing import Callable, List, Optional, Sequence, Tuple
+import tempfile
+import time
+import urllib.request
+from collections import deque
+from dataclasses import dataclass, field
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+    Union,
+    runtime_checkable,
+)
 
+import tracing
+from backend_pool import BackendPool
+from corpus import CORPUS_SUFFIX, Corpus, is_corpus_file
+from normalize import WordNormalizer
 
-def build_default_translator():
-    """延迟导入默认翻译器，便于测试替换。"""
+
+def build_default_translator(service_url: Optional[str] = None):
+    """延迟导入默认翻译器，便于测试替换；service_url 指定 Google 翻译域名（如 translate.google.com.hk）。"""
     try:
         from googletrans import Translator
     except ImportError as exc:  # pragma: no cover
         raise ImportError("请先安装 googletrans==4.0.0-rc1") from exc
+    if service_url:
+        return Translator(service_urls=[service_url])
     return Translator()
 
 
+BACKENDS = ("offline", "google")
+
+
+def build_translator(
+    backend: str = "google",
+    dict_path: Optional[str] = None,
+    *,
+    hedge_quantile: float = 0.9,
+    hedge_delay: float = 1.0,
+):
+    """
+    按逗号分隔的后端链构建翻译器，如 "offline,google"：先查离线词典，未命中再请求 googletrans。
+    offline 需要 dict_path（词典 CSV 或已编译的索引）；只写 "offline" 时未命中即视为失败。
+    链中一环可以是用 "|" 连接的远程后端池，如 "google|google@translate.google.com.hk"
+    （google@域名 指定服务域名），组成 BackendPool：按各后端延迟与健康度路由，
+    超过观测延迟 hedge_quantile 分位数（样本不足时 hedge_delay 秒）未返回即对冲到另一个后端。
+    """
+    names = [name.strip() for name in backend.split(",") if name.strip()]
+    members = [[m.strip() for m in name.split("|")] for name in names]
+    unknown = [
+        m for group in members for m in group if m.split("@", 1)[0] not in BACKENDS
+    ]
+    if not names or unknown:
+        raise ValueError(f"未知的翻译后端: {backend}（可选 {', '.join(BACKENDS)}）")
+    if any(len(group) > 1 and "offline" in group for group in members):
+        raise ValueError("offline 后端不能放入 | 后端池，请写在链的前面，如 offline,google|google")
+    translator = None
+    for name, group in zip(reversed(names), reversed(members)):
+        if len(group) > 1:
+            translator = BackendPool(
+                [build_default_translator(m.partition("@")[2] or None) for m in group],
+                names=group,
+                hedge_quantile=hedge_quantile,
+                hedge_delay=hedge_delay,
+            )
+        elif name.startswith("google"):
+            translator = build_default_translator(name.partition("@")[2] or None)
+        else:
+            if not dict_path:
+                raise ValueError("offline 后端需要通过 --dict 指定词典文件")
+            from offline_dict import OfflineDictionary, OfflineTranslator, ensure_index
+
+            translator = OfflineTranslator(
+                OfflineDictionary(ensure_index(dict_path)), fallback=translator
+            )
+    return translator
+
+
+def _backend_pools(translator) -> List[BackendPool]:
+    """沿 fallback 链找出其中的后端池，用于运行结束时汇报各后端情况。"""
+    pools = []
+    while translator is not None:
+        if isinstance(translator, BackendPool):
+            pools.append(translator)
+        translator = getattr(translator, "fallback", None)
+    return pools
+
+
+def _share_limiter(translator, limiter: Optional["TokenBucket"]) -> None:
+    """把本次运行的令牌桶交给链上的后端池，对冲与改发的额外请求同样受 --rps 限制。"""
+    for pool in _backend_pools(translator):
+        pool.limiter = limiter
+
+
 def parse_word_list(row: Sequence[str]) -> List[str]:
     """前两列为等级与书名，剩余列视为单词；去空白并过滤空字符串。"""
     words: List[str] = []
@@ -33,6 +132,648 @@ def parse_word_list(row: Sequence[str]) -> List[str]:
     return words
 
 
+class TokenBucket:
+    """
+    令牌桶限速器：按 rate（次/秒）补充令牌，capacity 为允许的突发请求数。
+    capacity 默认为 1：桶满时也只放行一个请求，任意一秒内最多 rate + 1 次，
+    避免空闲后一口气放出 rate 个请求、首秒达到 2 × rate。
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        if rate <= 0:
+            raise ValueError("rate 必须大于 0")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else 1.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """取走一个令牌；令牌不足时等待补充，多个协程按到达顺序排队。"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+    """粗略判断异常是否为限流（HTTP 429 / Too Many Requests）。"""
+    for obj in (exc, getattr(exc, "response", None)):
+        if getattr(obj, "status_code", None) == 429 or getattr(obj, "status", None) == 429:
+            return True
+    message = str(exc).lower()
+    return "429" in message or "too many requests" in message
+
+
+def is_permanent_error(exc: BaseException) -> bool:
+    """
+    判断异常是否对该条目必然重现（如离线词典里没有这个词）：异常带 retryable = False 属性即是。
+    这类错误直接写失败占位，不重试、不退避，也不计入熔断（后端本身是正常的）。
+    """
+    return getattr(exc, "retryable", True) is False
+
+
+class PermanentTranslationError(Exception):
+    """翻译器可抛出的不可重试错误，见 is_permanent_error。"""
+
+    retryable = False
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续 threshold 次请求失败后断开，暂停所有派发 cooldown 秒；
+    之后进入半开状态，只放行一个探测请求，成功则恢复，失败则加倍冷却时间（上限 max_cooldown）再断开。
+    """
+
+    def __init__(
+        self, threshold: int = 5, cooldown: float = 2.0, max_cooldown: float = 60.0
+    ) -> None:
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = "closed"
+        self.failures = 0  # 连续失败次数
+        self.trips = 0  # 断开次数
+        self._cooldown = cooldown
+        self._opened_at = 0.0
+        self._probing = False
+        self._changed = asyncio.Event()
+
+    async def wait(self) -> None:
+        """断开时等待冷却；半开时只有第一个调用者返回（作为探测），其余等待探测结果。"""
+        while self.state != "closed":
+            if self.state == "open":
+                remaining = self._opened_at + self._cooldown - time.monotonic()
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+                    continue
+                self.state = "half_open"
+                self._probing = False
+            if not self._probing:
+                self._probing = True
+                return
+            try:
+                # 探测请求被取消时不会回报结果，超时后允许下一个请求重新探测
+                await asyncio.wait_for(self._changed.wait(), self._cooldown)
+            except asyncio.TimeoutError:
+                self._probing = False
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def record_success(self) -> None:
+        self.failures = 0
+        if self.state != "closed":
+            self.state = "closed"
+            self._cooldown = self.base_cooldown
+            self._notify()
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open":
+            self._cooldown = min(self.max_cooldown, self._cooldown * 2)
+        elif not (self.state == "closed" and self.failures >= self.threshold):
+            return
+        self.state = "open"
+        self.trips += 1
+        self._opened_at = time.monotonic()
+        self._notify()
+
+
+class AdaptiveLimit:
+    """
+    自适应并发上限（AIMD）：限流时减半（每 decrease_interval 秒最多一次），
+    连续成功数达到当前上限时加 1，不超过 maximum。用法同 asyncio.Semaphore。
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        *,
+        minimum: int = 1,
+        maximum: Optional[int] = None,
+        decrease_interval: float = 1.0,
+    ) -> None:
+        self.minimum = max(1, minimum)
+        self.maximum = max(initial, maximum or initial)
+        self.limit = max(self.minimum, initial)
+        self.decrease_interval = decrease_interval
+        self.in_flight = 0
+        self._successes = 0
+        self._decreased_at = float("-inf")
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self) -> "AdaptiveLimit":
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            # 只唤醒空出名额数量的等待者（含 on_success 新增的名额），避免大量排队时反复惊群
+            self._cond.notify(self.limit - self.in_flight)
+
+    def on_success(self) -> None:
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.maximum:
+            self.limit += 1
+            self._successes = 0
+
+    def on_throttle(self) -> None:
+        self._successes = 0
+        now = time.monotonic()
+        if now - self._decreased_at >= self.decrease_interval:
+            self.limit = max(self.minimum, self.limit // 2)
+            self._decreased_at = now
+
+
+class RetryScheduler:
+    """
+    整个运行共享的派发控制：指数退避 + 抖动的延迟重试、熔断器与自适应并发上限。
+    失败请求在退避期间不占用并发名额，其余请求照常派发；限流错误只降低并发，其余错误计入熔断。
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 1,
+        *,
+        max_concurrency: Optional[int] = None,
+        max_delay: float = 30.0,
+        breaker_threshold: int = 5,
+        breaker_cooldown: float = 2.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.limit = AdaptiveLimit(concurrency, maximum=max_concurrency)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self.max_delay = max_delay
+        self.throttled = 0
+        self._rng = random.Random(seed)
+
+    def backoff(self, attempt: int, base: float) -> float:
+        """第 attempt 次重试前的等待：base * 2^(attempt-1)（封顶 max_delay）的一半固定、一半随机。"""
+        delay = min(self.max_delay, base * 2 ** (attempt - 1))
+        return delay / 2 + self._rng.uniform(0, delay / 2)
+
+    def record_success(self) -> None:
+        self.breaker.record_success()
+        self.limit.on_success()
+
+    def record_failure(self, exc: BaseException) -> None:
+        # 限流说明后端可用只是太快，交给自适应并发降速，不计入熔断
+        if is_throttle_error(exc):
+            self.throttled += 1
+            self.limit.on_throttle()
+        else:
+            self.breaker.record_failure()
+
+
+FAILURE_PREFIX = "[翻译失败"
+DEFAULT_CACHE_PATH = "translation_cache.sqlite3"
+
+
+class TranslationCache:
+    """
+    基于 SQLite 的持久翻译缓存，键为 (规范化原文, src, dest)，跨运行、跨书目共享。
+
+    max_entries / max_age_days 为可选淘汰策略：打开与关闭时删除过期条目，
+    并只保留最新的 max_entries 条。失败占位文本永不写入。
+    read_only=True 时以 SQLite 只读模式打开已存在的缓存（不存在则报错），不建表、不淘汰、
+    不写入，供 --plan 只读估算使用。
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        *,
+        max_entries: Optional[int] = None,
+        max_age_days: Optional[float] = None,
+        commit_every: int = 50,
+        read_only: bool = False,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.commit_every = commit_every
+        self.read_only = read_only
+        self._pending = 0
+        if read_only:
+            uri = "file:" + urllib.request.pathname2url(os.path.abspath(path)) + "?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True)
+            return
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "text TEXT NOT NULL, src TEXT NOT NULL, dest TEXT NOT NULL, "
+            "translated TEXT NOT NULL, created_at REAL NOT NULL, "
+            "PRIMARY KEY (text, src, dest))"
+        )
+        self.evict()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """去首尾空白并合并内部连续空白。"""
+        return " ".join(text.split())
+
+    def get(self, text: str, src: str, dest: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT translated FROM translations WHERE text=? AND src=? AND dest=?",
+            (self.normalize(text), src, dest),
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, text: str, src: str, dest: str, translated: str) -> None:
+        if self.read_only or translated.startswith(FAILURE_PREFIX):
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?)",
+            (self.normalize(text), src, dest, translated, time.time()),
+        )
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.commit()
+
+    def commit(self) -> None:
+        self._conn.commit()
+        self._pending = 0
+
+    def evict(self) -> None:
+        """按年龄与条数淘汰最旧的条目。"""
+        if self.max_age_days is not None:
+            cutoff = time.time() - self.max_age_days * 86400
+            self._conn.execute(
+                "DELETE FROM translations WHERE created_at < ?", (cutoff,)
+            )
+        if self.max_entries is not None:
+            self._conn.execute(
+                "DELETE FROM translations WHERE rowid NOT IN ("
+                "SELECT rowid FROM translations ORDER BY created_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+        self.commit()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    def close(self) -> None:
+        if not self.read_only:
+            self.evict()
+        self._conn.close()
+
+
+BATCH_DELIMITER = "\n"
+
+
+@runtime_checkable
+class BatchTranslator(Protocol):
+    """
+    批量翻译能力协议：batch_mode 声明 translate 如何处理一整块文本。
+
+    - "list": translate 接受字符串列表，一次请求返回等长的结果列表；
+    - "join": 可把以换行拼接的文本整体翻译，再按行拆回。
+    未实现该协议的翻译器一律逐词请求。googletrans 4.0.0-rc1 虽接受列表，但内部逐项各发一次
+    HTTP 请求（且都在同一个限速令牌与并发名额内），不算批量，因此同样逐词请求。
+    """
+
+    batch_mode: Optional[str]
+
+    async def translate(self, text, src: str = "en", dest: str = "zh-cn"): ...
+
+
+def detect_batch_mode(translator) -> Optional[str]:
+    """返回翻译器支持的批量模式："list"、"join" 或 None（仅支持逐词）。"""
+    if isinstance(translator, BatchTranslator):
+        return translator.batch_mode
+    return None
+
+
+def _result_text(result) -> str:
+    """兼容 googletrans 结果对象、纯字符串与其他可转字符串的返回值。"""
+    if hasattr(result, "text"):
+        return result.text
+    if isinstance(result, str):
+        return result
+    if result is not None:
+        return str(result)
+    raise ValueError("翻译结果为空")
+
+
+def _record_result(
+    stats: Optional["TranslationStats"],
+    progress_callback: Optional[Callable[["TranslationStats", str, bool, int], None]],
+    word: str,
+    success: bool,
+    attempts: int,
+) -> None:
+    if stats:
+        stats.processed += 1
+        if success:
+            stats.success += 1
+        else:
+            stats.fail += 1
+        stats.retries += attempts
+        stats.attempts[attempts + 1] = stats.attempts.get(attempts + 1, 0) + 1
+        stats.throughput.mark()
+    if progress_callback:
+        progress_callback(stats, word, success, attempts)
+
+
+def _lookup_cache(
+    cache: Optional[TranslationCache],
+    text: str,
+    src: str,
+    dest: str,
+    stats: Optional["TranslationStats"],
+) -> Optional[str]:
+    if cache is None:
+        return None
+    cached = cache.get(text, src, dest)
+    if stats:
+        if cached is None:
+            stats.cache_misses += 1
+        else:
+            stats.cache_hits += 1
+    return cached
+
+
+async def _sleep(
+    seconds: float, stats: Optional["TranslationStats"], reason: str = "pause"
+) -> None:
+    """计入 stats.sleep_seconds 的 asyncio.sleep；reason 为追踪中的 span 名（pause / retry）。"""
+    with tracing.span(reason, "sleep", seconds=seconds):
+        await asyncio.sleep(seconds)
+    if stats:
+        stats.sleep_seconds += seconds
+
+
+async def _acquire(
+    limiter: Optional[TokenBucket], stats: Optional["TranslationStats"]
+) -> None:
+    """等待限速令牌，等待时间计入 stats.sleep_seconds。"""
+    if limiter is None:
+        return
+    started = time.perf_counter()
+    with tracing.span("rate-limit", "sleep"):
+        await limiter.acquire()
+    if stats:
+        stats.sleep_seconds += time.perf_counter() - started
+
+
+async def _timed_call(translate_func, text, stats, **kwargs):
+    """调用翻译器并把本次请求耗时记入延迟直方图（成功失败都记）。"""
+    started = time.perf_counter()
+    try:
+        return await translate_func(text, **kwargs)
+    finally:
+        if stats:
+            stats.observe_request(time.perf_counter() - started)
+
+
+async def _dispatch(
+    translate_func,
+    payload,
+    *,
+    src: str,
+    dest: str,
+    gate,
+    scheduler: Optional[RetryScheduler],
+    limiter: Optional[TokenBucket],
+    stats: Optional["TranslationStats"],
+    attempt: int = 0,
+):
+    """
+    派发一次请求：等待熔断器与并发名额、取限速令牌后调用翻译器，并把结果回报给调度器。
+    attempt 为尝试序号，仅用于追踪。
+    """
+    if scheduler is not None:
+        await scheduler.breaker.wait()
+    async with gate if gate is not None else contextlib.nullcontext():
+        await _acquire(limiter, stats)
+        try:
+            with tracing.span(
+                "translate",
+                "request",
+                text=payload if isinstance(payload, str) else f"[{len(payload)} 条]",
+                attempt=attempt,
+                dest=dest,
+            ):
+                result = await _timed_call(
+                    translate_func, payload, stats, src=src, dest=dest
+                )
+        except Exception as exc:
+            if stats and is_throttle_error(exc):
+                stats.throttled += 1
+            if scheduler is not None:
+                if is_permanent_error(exc):
+                    scheduler.breaker.record_success()  # 后端正常应答，只是这个条目无解
+                else:
+                    scheduler.record_failure(exc)
+            raise
+    if scheduler is not None:
+        scheduler.record_success()
+    return result
+
+
+async def _request_word(
+    word: str,
+    translate_func,
+    *,
+    src: str,
+    dest: str,
+    max_retries: int,
+    retry_pause: float,
+    limiter: Optional[TokenBucket] = None,
+    stats: Optional["TranslationStats"] = None,
+    gate=None,
+    scheduler: Optional[RetryScheduler] = None,
+    first_attempt: int = 0,
+    last_attempt: Optional[int] = None,
+) -> Tuple[str, bool, int, bool]:
+    """
+    逐词请求，失败按 max_retries 重试；返回 (译文或失败占位, 是否成功, 重试次数, 可否再重试)。
+    重试前按 scheduler.backoff 退避，退避期间不占用 gate 名额；is_permanent_error 的错误不重试。
+    first_attempt/last_attempt 限定本次调用执行的尝试序号，用于把重试拆到延迟队列。
+    """
+    last_attempt = max_retries if last_attempt is None else last_attempt
+    attempt = first_attempt
+    last_error: Optional[BaseException] = None
+    while attempt <= last_attempt:
+        if attempt:
+            delay = (
+                scheduler.backoff(attempt, retry_pause) if scheduler else retry_pause
+            )
+            await _sleep(delay, stats, "retry")
+        try:
+            result = await _dispatch(
+                translate_func,
+                word,
+                src=src,
+                dest=dest,
+                gate=gate,
+                scheduler=scheduler,
+                limiter=limiter,
+                stats=stats,
+                attempt=attempt,
+            )
+            return _result_text(result), True, attempt, False
+        except Exception as exc:  # pragma: no cover
+            if is_permanent_error(exc):
+                return f"[翻译失败:{exc}]", False, attempt, False
+            last_error = exc
+            attempt += 1
+    return f"[翻译失败:{last_error}]", False, min(attempt, max_retries), True
+
+
+async def _request_batch(
+    texts: Sequence[str],
+    translate_func,
+    mode: str,
+    *,
+    src: str,
+    dest: str,
+    limiter: Optional[TokenBucket] = None,
+    stats: Optional["TranslationStats"] = None,
+    gate=None,
+    scheduler: Optional[RetryScheduler] = None,
+) -> Optional[List[str]]:
+    """一次请求翻译整块文本；异常或结果无法与输入逐项对齐时返回 None。"""
+    if mode == "join" and any(BATCH_DELIMITER in text for text in texts):
+        return None
+    dispatch = functools.partial(
+        _dispatch,
+        translate_func,
+        src=src,
+        dest=dest,
+        gate=gate,
+        scheduler=scheduler,
+        limiter=limiter,
+        stats=stats,
+    )
+    try:
+        if mode == "list":
+            result = await dispatch(list(texts))
+            if not isinstance(result, (list, tuple)):
+                return None
+            pieces = [_result_text(item) for item in result]
+        else:
+            joined = await dispatch(BATCH_DELIMITER.join(texts))
+            pieces = [p.strip() for p in _result_text(joined).split(BATCH_DELIMITER)]
+    except Exception:  # pragma: no cover
+        return None
+    if len(pieces) != len(texts) or not all(pieces):
+        return None
+    return pieces
+
+
+async def _translate_chunk(
+    chunk: Sequence[str],
+    counted: Sequence[bool],
+    translate_func,
+    *,
+    batch_mode: Optional[str],
+    src: str,
+    dest: str,
+    max_retries: int,
+    retry_pause: float,
+    stats: Optional["TranslationStats"],
+    progress_callback: Optional[Callable[["TranslationStats", str, bool, int], None]],
+    limiter: Optional[TokenBucket],
+    cache: Optional[TranslationCache],
+    on_result: Optional[Callable[[str, str], None]] = None,
+    gate=None,
+    scheduler: Optional[RetryScheduler] = None,
+    deferred: Optional[List["asyncio.Task"]] = None,
+) -> List[str]:
+    """
+    翻译一块文本：先查缓存，余下的在支持批量时一次请求，
+    批量失败或无法对齐则仅对本块逐词回退。counted 为 False 的条目（如书名）不计入统计。
+    on_result(原文, 译文) 在每个条目成功译出后立即调用（缓存命中不调用）。
+    传入 deferred 列表时，首次失败的词改由后台任务退避重试（任务追加到 deferred），
+    本块立即继续；任务完成后就地填入返回的列表，调用方需先等待 deferred 再读取。
+    """
+    results: List[Optional[str]] = [None] * len(chunk)
+    pending: List[int] = []
+    for i, text in enumerate(chunk):
+        cached = _lookup_cache(cache, text, src, dest, stats)
+        if cached is None:
+            pending.append(i)
+            continue
+        results[i] = cached
+        if counted[i]:
+            _record_result(stats, progress_callback, text, True, 0)
+
+    if batch_mode and len(pending) > 1:
+        texts = [chunk[i] for i in pending]
+        batch = await _request_batch(
+            texts,
+            translate_func,
+            batch_mode,
+            src=src,
+            dest=dest,
+            limiter=limiter,
+            stats=stats,
+            gate=gate,
+            scheduler=scheduler,
+        )
+        if batch is not None:
+            for i, text in zip(pending, batch):
+                results[i] = text
+                if cache is not None:
+                    cache.put(chunk[i], src, dest, text)
+                if on_result:
+                    on_result(chunk[i], text)
+                if counted[i]:
+                    _record_result(stats, progress_callback, chunk[i], True, 0)
+            pending = []
+
+    def finish(
+        i: int, text: str, success: bool, attempts: int, retryable: bool = False
+    ) -> None:
+        results[i] = text
+        if success and cache is not None:
+            cache.put(chunk[i], src, dest, text)
+        if success and on_result:
+            on_result(chunk[i], text)
+        if counted[i]:
+            _record_result(stats, progress_callback, chunk[i], success, attempts)
+
+    request = functools.partial(
+        _request_word,
+        translate_func=translate_func,
+        src=src,
+        dest=dest,
+        max_retries=max_retries,
+        retry_pause=retry_pause,
+        limiter=limiter,
+        stats=stats,
+        gate=gate,
+        scheduler=scheduler,
+    )
+
+    async def retry_later(i: int) -> None:
+        finish(i, *await request(chunk[i], first_attempt=1))
+
+    for i in pending:
+        if deferred is None or max_retries == 0:
+            finish(i, *await request(chunk[i]))
+            continue
+        text, success, attempts, retryable = await request(chunk[i], last_attempt=0)
+        if not retryable:
+            finish(i, text, success, attempts)
+        else:
+            deferred.append(asyncio.create_task(retry_later(i)))
+    return results  # type: ignore[return-value]
+
+
 async def translate_in_chunks(
     words: Sequence[str],
     translator,
@@ -46,55 +787,104 @@ async def translate_in_chunks(
     progress_callback: Optional[
         Callable[["TranslationStats", str, bool, int], None]
     ] = None,
+    concurrency: int = 1,
+    rps: Optional[float] = None,
+    limiter: Optional[TokenBucket] = None,
+    cache: Optional[TranslationCache] = None,
+    batch: Optional[str] = "auto",
+    extra_texts: Sequence[str] = (),
+    on_result: Optional[Callable[[str, str], None]] = None,
+    scheduler: Optional[RetryScheduler] = None,
 ) -> List[str]:
-    """分块翻译单词；重试失败写占位。"""
-    translated: List[str] = []
+    """
+    分块翻译单词；重试失败写占位。
+
+    默认逐词串行，每块之后固定暂停 pause_seconds。
+    指定 concurrency>1、rps 或 limiter 时进入并发模式：最多 concurrency 个请求同时在途，
+    由令牌桶控制每秒请求数并取代固定暂停；输出顺序与输入一致。
+    失败的词进入延迟重试（退避基数为 pause_seconds，为 0 时取 0.2 秒），其余词照常翻译。
+    scheduler 可在多次调用间共享（熔断与自适应并发随之共享）；并发模式下请求名额取自
+    scheduler.limit，未传入时按 concurrency 新建。串行模式本次调用只有一个请求在途，
+    传入 scheduler 时还与共享它的其他调用（窗口内的其他书目）争用同一组名额。
+    传入 cache 时先查缓存，命中的词不发请求。
+    batch 为 "auto" 时按 detect_batch_mode 探测翻译器能力，"list"/"join" 强制指定，
+    None 关闭批量；批量时每块只发一次请求。
+    extra_texts（如书名）随第一块一起翻译，译文排在返回列表最前，不计入统计与进度。
+    on_result(原文, 译文) 在每个条目实际译出后立即回调，用于写断点日志。
+    """
     translate_func = getattr(translator, "translate")
+    batch_mode = detect_batch_mode(translator) if batch == "auto" else batch
+    items = list(extra_texts) + list(words)
+    counted = [False] * len(extra_texts) + [True] * len(words)
+    bounds = [0] if items else []
+    bounds += list(range(len(extra_texts) + chunk_size, len(items), chunk_size))
+    spans = list(zip(bounds, bounds[1:] + [len(items)]))
+    chunk_kwargs = dict(
+        batch_mode=batch_mode,
+        src=src,
+        dest=dest,
+        max_retries=max_retries,
+        retry_pause=pause_seconds or 0.2,
+        stats=stats,
+        progress_callback=progress_callback,
+        cache=cache,
+        on_result=on_result,
+    )
 
-    for start in range(0, len(words), chunk_size):
-        chunk = words[start : start + chunk_size]
-        for word in chunk:
-            attempt = 0
-            last_error = None
-            while attempt <= max_retries:
-                try:
-                    result = await translate_func(word, src=src, dest=dest)
-                    if hasattr(result, "text"):
-                        translated.append(result.text)
-                    elif isinstance(result, str):
-                        translated.append(result)
-                    elif result is not None:
-                        translated.append(str(result))
-                    else:
-                        raise ValueError("翻译结果为空")
-                    if stats:
-                        stats.processed += 1
-                        stats.success += 1
-                        stats.retries += attempt
-                    if progress_callback:
-                        progress_callback(stats, word, True, attempt)
-                    break
-                except Exception as exc:  # pragma: no cover
-                    last_error = exc
-                    attempt += 1
-                    if attempt <= max_retries:
-                        await asyncio.sleep(pause_seconds or 0.2)
-            else:
-                translated.append(f"[翻译失败:{last_error}]")
-                if stats:
-                    stats.processed += 1
-                    stats.fail += 1
-                    stats.retries += max_retries
-                if progress_callback:
-                    progress_callback(stats, word, False, max_retries)
-        if pause_seconds:
-            await asyncio.sleep(pause_seconds)
-    return translated
-
-
-def get_processed_titles(output_path: str) -> set[str]:
-    """从已存在的输出文件中读取并返回已处理过的英文书名集合。"""
-    processed = set()
+    deferred: List[asyncio.Task] = []
+    try:
+        if concurrency <= 1 and rps is None and limiter is None:
+            _share_limiter(translator, None)
+            chunk_kwargs.update(
+                gate=scheduler.limit if scheduler is not None else asyncio.Semaphore(1),
+                scheduler=scheduler or RetryScheduler(),
+                limiter=None,
+            )
+            parts = []
+            for start, end in spans:
+                parts.append(
+                    await _translate_chunk(
+                        items[start:end],
+                        counted[start:end],
+                        translate_func,
+                        deferred=deferred,
+                        **chunk_kwargs,
+                    )
+                )
+                if pause_seconds:
+                    await _sleep(pause_seconds, stats)
+        else:
+            if limiter is None and rps is not None:
+                limiter = TokenBucket(rps)
+            _share_limiter(translator, limiter)
+            scheduler = scheduler or RetryScheduler(max(1, concurrency))
+            chunk_kwargs.update(gate=scheduler.limit, scheduler=scheduler, limiter=limiter)
+            if not batch_mode:
+                # 不支持批量时每个词单独成块，各自排队等待并发名额
+                spans = [(i, i + 1) for i in range(len(items))]
+            parts = await asyncio.gather(
+                *(
+                    _translate_chunk(
+                        items[start:end],
+                        counted[start:end],
+                        translate_func,
+                        deferred=deferred,
+                        **chunk_kwargs,
+                    )
+                    for start, end in spans
+                )
+            )
+        await asyncio.gather(*deferred)
+    finally:
+        for task in deferred:
+            task.cancel()
+    return [text for part in parts for text in part]
+
+
+@tracing.traced
+def get_processed_books(output_path: str) -> set[Tuple[str, str]]:
+    """从已存在的输出文件中读取已处理书目的 (等级, 英文书名) 集合，避免不同等级同名书互相覆盖。"""
+    processed: set[Tuple[str, str]] = set()
     if not os.path.exists(output_path):
         return processed
     with open(output_path, "r", encoding="utf-8", newline="") as f:
@@ -103,31 +893,151 @@ def get_processed_titles(output_path: str) -> set[str]:
             header = next(reader)
             title_idx = header.index("Book Title")
         except (StopIteration, ValueError):
-            return processed  # 文件为空或表头不正确
+            return processed
 
-        # 每两行（中文、英文）构成一个记录
         while True:
             try:
-                _ = next(reader)  # 跳过中文行
+                _ = next(reader)
                 row_en = next(reader)
                 if len(row_en) > title_idx:
-                    processed.add(row_en[title_idx])
+                    processed.add((row_en[0], row_en[title_idx]))
             except StopIteration:
                 break
     return processed
 
 
-def compute_records(
-    input_path: str, limit: Optional[int] = None
-) -> Tuple[List[Tuple[str, str, List[str]]], int]:
-    """读取输入，返回 (level, title, words) 列表及最大单词数。"""
-    records: List[Tuple[str, str, List[str]]] = []
-    max_words = 0
+@dataclass
+class JournalState:
+    """断点日志尾部恢复出的状态。"""
+
+    index: int  # 最后一本已完整落盘书目在输入中的序号，-1 表示只写了表头
+    level: str
+    title: str
+    offset: int  # 此时输出文件的有效字节长度，之后的内容视为残缺
+    partial: Dict[str, str]  # 未完成书目中已译出的 原文 -> 译文
+
+
+class CheckpointJournal:
+    """
+    输出文件旁的追加式断点日志（JSON Lines，默认路径为 <输出文件>.journal）：
+
+    - {"t": "w", "i", "level", "title", "src", "text"}：第 i 本书中一个已译出的词或书名；
+    - {"t": "c", "i", "level", "title", "offset", "started"}：序号 ≤ i 的书目都已完整落盘，
+      输出文件有效长度为 offset，started 为此刻已开始翻译的最大序号。
+
+    记录先进内存缓冲，每 sync_every 条或每次提交时批量写入并 fsync。
+    """
+
+    def __init__(self, path: str, *, truncate: bool = False, sync_every: int = 100):
+        self.path = path
+        self.sync_every = max(1, sync_every)
+        self.started = -1
+        self._lines: List[str] = []
+        self._f = open(path, "w" if truncate else "a", encoding="utf-8")
+
+    @staticmethod
+    def path_for(output_path: str) -> str:
+        return output_path + ".journal"
+
+    def book_started(self, index: int) -> None:
+        self.started = max(self.started, index)
+
+    def record(self, index: int, level: str, title: str, src: str, text: str) -> None:
+        self._append(
+            {"t": "w", "i": index, "level": level, "title": title, "src": src, "text": text}
+        )
+        if len(self._lines) >= self.sync_every:
+            self.sync()
+
+    def commit(self, index: int, level: str, title: str, offset: int) -> None:
+        self._append(
+            {
+                "t": "c",
+                "i": index,
+                "level": level,
+                "title": title,
+                "offset": offset,
+                "started": max(self.started, index),
+            }
+        )
+        self.sync()
+
+    def _append(self, entry: dict) -> None:
+        self._lines.append(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def sync(self) -> None:
+        if self._lines:
+            self._f.write("".join(self._lines))
+            self._lines.clear()
+            self._f.flush()
+            os.fsync(self._f.fileno())
+
+    def close(self) -> None:
+        self.sync()
+        self._f.close()
+
+
+def read_journal_tail(path: str, *, block_size: int = 1 << 16) -> Optional[JournalState]:
+    """
+    从文件末尾向前按块读取断点日志，找到最后一条提交记录即可确定已完成的书目；
+    再向前读到某条 started 不超过该序号的提交为止，收集未完成书目的逐词结果。
+    读取量只与流水线窗口有关，与日志总长度无关。无有效提交记录时返回 None。
+    """
+    if not os.path.exists(path):
+        return None
+    commit: Optional[dict] = None
+    partial: Dict[str, str] = {}
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        remainder = b""
+        done = False
+        while pos > 0 and not done:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + remainder).split(b"\n")
+            remainder = lines.pop(0) if pos > 0 else b""
+            for line in reversed(lines):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # 崩溃时写了一半的行
+                if entry.get("t") == "c":
+                    if commit is None:
+                        commit = entry
+                    if entry["started"] <= commit["i"]:
+                        done = True
+                        break
+                elif commit is None or entry["i"] > commit["i"]:
+                    partial.setdefault(entry["src"], entry["text"])
+    if commit is None:
+        return None
+    return JournalState(
+        index=commit["i"],
+        level=commit["level"],
+        title=commit["title"],
+        offset=commit["offset"],
+        partial=partial,
+    )
+
+
+Record = Tuple[str, str, List[str]]
+
+
+def iter_records(input_path: str, limit: Optional[int] = None) -> Iterator[Record]:
+    """
+    逐行读取输入并产出 (level, title, words)，不在内存中保留整个文件。
+    input_path 也可以是语料文件（见 ensure_corpus），此时 limit 按书目计数。
+    """
+    if is_corpus_file(input_path):
+        with Corpus.load(input_path) as corpus:
+            yield from corpus if limit is None else corpus.head(limit)
+        return
     with open(input_path, "r", encoding="utf-8", newline="") as f_in:
         reader = csv.reader(f_in)
         header = next(reader, None)
         if header is None:
-            return records, max_words
+            return
         for i, row in enumerate(reader):
             if limit is not None and i >= limit:
                 print(f"已达到处理行数上限 ({limit})。")
@@ -138,189 +1048,1901 @@ def compute_records(
             words = parse_word_list(row)
             if not words:
                 continue
-            max_words = max(max_words, len(words))
-            records.append((level, title, words))
+            yield level, title, words
+
+
+@tracing.traced
+def count_max_words(input_path: str, limit: Optional[int] = None) -> int:
+    """轻量预扫描：只统计每行非空单词列数，返回最大值，用于确定表头宽度。"""
+    if is_corpus_file(input_path):
+        with Corpus.load(input_path) as corpus:
+            return (corpus if limit is None else corpus.head(limit)).max_words
+    max_words = 0
+    with open(input_path, "r", encoding="utf-8", newline="") as f_in:
+        reader = csv.reader(f_in)
+        if next(reader, None) is None:
+            return max_words
+        for i, row in enumerate(reader):
+            if limit is not None and i >= limit:
+                break
+            if len(row) >= 3:
+                max_words = max(max_words, sum(1 for cell in row[2:] if cell.strip()))
+    return max_words
+
+
+@tracing.traced
+def compute_records(
+    input_path: str, limit: Optional[int] = None
+) -> Tuple[Sequence[Record], int]:
+    """
+    读取输入，返回 (level, title, words) 序列及最大单词数。
+    语料文件经 mmap 读入内存中的 Corpus 后即关闭文件，不再解析 CSV，
+    且同一单词在各书目中是同一个 str 对象。
+    """
+    if is_corpus_file(input_path):
+        with Corpus.load(input_path) as loaded:
+            corpus = (loaded if limit is None else loaded.head(limit)).in_memory()
+        return corpus, corpus.max_words
+    records = list(iter_records(input_path, limit=limit))
+    max_words = max((len(words) for _, _, words in records), default=0)
     return records, max_words
 
 
-def pad_words(words: List[str], max_words: int) -> List[str]:
-    """将单词列表补齐到最大列数。"""
-    return words + [""] * (max_words - len(words))
+@tracing.traced
+def build_corpus(input_path: str, corpus_path: str) -> Corpus:
+    """把输入 CSV 编译为语料文件（先写临时文件再原子替换），返回内存中的 Corpus。"""
+    corpus = Corpus.from_records(iter_records(input_path))
+    corpus.save(corpus_path)
+    return corpus
+
+
+def ensure_corpus(input_path: str) -> str:
+    """input_path 为 CSV 时在旁边生成/刷新 <input_path>.corpus 并返回其路径；已是语料文件则原样返回。"""
+    if is_corpus_file(input_path):
+        return input_path
+    corpus_path = input_path + CORPUS_SUFFIX
+    if not os.path.exists(corpus_path) or os.path.getmtime(
+        corpus_path
+    ) < os.path.getmtime(input_path):
+        build_corpus(input_path, corpus_path)
+    return corpus_path
+
+
+class _WordPlanner:
+    """
+    跨书去重：fresh(words) 返回该书中首次出现的请求键（保持顺序、不重复）。
+    key 为规范化函数（见 normalize.WordNormalizer）时请求键为规范形式，
+    merged 为因规范化合并掉的请求数（不同写法数 - 规范形式数）。
+    """
+
+    def __init__(self, key: Optional[Callable[[str], str]] = None) -> None:
+        self.key = key
+        self.seen: set[str] = set()
+        self._surfaces: set[str] = set()
+
+    def fresh(self, words: Iterable[str]) -> List[str]:
+        fresh = []
+        for word in words:
+            if self.key is not None:
+                self._surfaces.add(word)
+                word = self.key(word)
+            if word not in self.seen:
+                self.seen.add(word)
+                fresh.append(word)
+        return fresh
+
+    @property
+    def merged(self) -> int:
+        return len(self._surfaces) - len(self.seen) if self.key is not None else 0
+
+
+def iter_unique_words(
+    records: Iterable[Record], key: Optional[Callable[[str], str]] = None
+) -> Iterator[Tuple[Record, List[str]]]:
+    """逐本产出 (record, 该书中首次出现的请求键)，可用于流式输入；key 见 _WordPlanner。"""
+    planner = _WordPlanner(key)
+    for record in records:
+        yield record, planner.fresh(record[2])
+
+
+def plan_unique_words(
+    records: Sequence[Record], key: Optional[Callable[[str], str]] = None
+) -> List[List[str]]:
+    """
+    语料级去重：返回与 records 对齐的列表，每项为该书中首次出现的单词（保持出现顺序）。
+    各项依次拼接即为全局不重复词表，每个词只需翻译一次，后续书目直接复用结果。
+    key 不为空时按规范形式去重，列表中为规范形式。
+    """
+    return [fresh for _, fresh in iter_unique_words(records, key)]
+
+
+def pad_words(words: List[str], max_words: int) -> List[str]:
+    """将单词列表补齐到最大列数。"""
+    return words + [""] * (max_words - len(words))
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """解析 "i/N"（i 从 0 开始，0 <= i < N）。"""
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"分片格式应为 i/N，例如 0/4: '{text}'") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"分片编号需满足 0 <= i < N: '{text}'")
+    return index, count
+
+
+def shard_of(level: str, title: str, count: int) -> int:
+    """按 (等级, 书名) 的稳定哈希分片；与进程、机器和 PYTHONHASHSEED 无关。"""
+    digest = hashlib.sha1(f"{level}\0{title}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+BOOK_HASHES_SUFFIX = ".books.json"
+
+
+def book_hash(level: str, title: str, words: Sequence[str]) -> str:
+    """书目内容哈希：(等级, 书名, 单词列表) 任一变化都会改变。"""
+    payload = json.dumps([level, title, list(words)], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _output_signature(path: str) -> List[int]:
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def save_book_hashes(output_path: str, records: Sequence[Record]) -> None:
+    """在输出旁写入 <输出>.books.json：各书目内容哈希（按输出顺序）及输出文件的大小与修改时间。"""
+    data = {
+        "version": 1,
+        "output": _output_signature(output_path),
+        "books": [[level, title, book_hash(level, title, words)] for level, title, words in records],
+    }
+    path = output_path + BOOK_HASHES_SUFFIX
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def load_book_hashes(output_path: str) -> Optional[List[str]]:
+    """读取书目哈希清单；清单缺失、损坏或输出文件在那之后被改动过时返回 None。"""
+    path = output_path + BOOK_HASHES_SUFFIX
+    if not (os.path.exists(path) and os.path.exists(output_path)):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except ValueError:
+        return None
+    if data.get("output") != _output_signature(output_path):
+        return None
+    return [digest for _, _, digest in data["books"]]
+
+
+@tracing.traced
+def _scan_previous_output(path: str) -> Tuple[Dict[str, str], set[Tuple[str, str]], set[str]]:
+    """
+    逐本扫描上次的输出，返回 (英文 -> 译文词表, 已有的 (等级, 书名), 书目内容哈希集合)。
+    内容哈希由英文行重新计算，与清单是否过期无关；失败占位不进入词表，会被重新翻译。
+    """
+    vocab: Dict[str, str] = {}
+    keys: set[Tuple[str, str]] = set()
+    hashes: set[str] = set()
+    _, books = _iter_output_books(path)
+    for row_cn, row_en in books:
+        if len(row_en) < 2:
+            continue
+        level, title = row_en[0], row_en[1]
+        words = [w for w in row_en[2:] if w]
+        keys.add((level, title))
+        hashes.add(book_hash(level, title, words))
+        for en, cn in zip(row_en[1:], row_cn[1:]):
+            if en and cn and not cn.startswith(FAILURE_PREFIX):
+                vocab.setdefault(en, cn)
+    return vocab, keys, hashes
+
+
+class _PreviousRows:
+    """
+    按内容哈希从上次输出中取出未变化书目的行。顺读旧文件，路过的其他书目暂存，
+    输入只有增删时暂存区始终很小；被删除的书目留在暂存区中不再写出。
+    """
+
+    def __init__(self, path: str, max_words: int) -> None:
+        _, self._books = _iter_output_books(path)
+        self.max_words = max_words
+        self._skipped: Dict[str, Deque[List[List[str]]]] = {}
+
+    def __call__(self, record: Record) -> List[List[str]]:
+        digest = book_hash(*record)
+        waiting = self._skipped.get(digest)
+        rows = waiting.popleft() if waiting else None
+        while rows is None:
+            book = next(self._books, None)
+            if book is None:
+                raise ValueError(f"上次输出中找不到书目 {record[:2]}")
+            row_en = book[1]
+            found = book_hash(row_en[0], row_en[1], [w for w in row_en[2:] if w])
+            if found == digest:
+                rows = book
+            else:
+                self._skipped.setdefault(found, deque()).append(book)
+        width = len(record[2])
+        return [row[:2] + pad_words(row[2 : 2 + width], self.max_words) for row in rows]
+
+    def close(self) -> None:
+        self._books.close()  # type: ignore[attr-defined]
+
+
+class _ReorderWriter:
+    """
+    按输入顺序写出书目行对：乱序完成的书目先进入重排缓冲区，凑齐下一个序号才输出。
+    输出先在内存中累积，每 flush_every 本或距上次落盘超过 flush_interval 秒时整体写入并 flush；
+    落盘的永远是完整的中英行对。传入 journal 时每次落盘后 fsync 输出并写入提交记录。
+    """
+
+    def __init__(
+        self,
+        f_out,
+        *,
+        flush_every: int = 1,
+        flush_interval: Optional[float] = None,
+        journal: Optional[CheckpointJournal] = None,
+    ) -> None:
+        self.f_out = f_out
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self.journal = journal
+        self.next_index = 0
+        self._last_book: Optional[Tuple[int, str, str]] = None
+        self._buffer: Dict[int, Tuple[int, List[List[str]]]] = {}
+        self._pending = io.StringIO()
+        self._pending_writer = csv.writer(self._pending)
+        self._pending_books = 0
+        self._last_flush = time.monotonic()
+
+    def put(self, seq: int, rows: List[List[str]], book_index: Optional[int] = None) -> int:
+        """放入第 seq 本书的行（book_index 为其在输入中的序号）；返回本次按序写出的书目数。"""
+        self._buffer[seq] = (seq if book_index is None else book_index, rows)
+        emitted = 0
+        while self.next_index in self._buffer:
+            book_index, rows = self._buffer.pop(self.next_index)
+            self._pending_writer.writerows(rows)
+            self._last_book = (book_index, rows[-1][0], rows[-1][1])
+            self.next_index += 1
+            self._pending_books += 1
+            emitted += 1
+        self.maybe_flush()
+        return emitted
+
+    def maybe_flush(self) -> None:
+        due = self._pending_books >= self.flush_every or (
+            self.flush_interval is not None
+            and self._pending_books
+            and time.monotonic() - self._last_flush >= self.flush_interval
+        )
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with tracing.span("flush", books=self._pending_books):
+            self._flush()
+
+    def _flush(self) -> None:
+        committed = self._pending_books > 0
+        if committed:
+            self.f_out.write(self._pending.getvalue())
+            self._pending.seek(0)
+            self._pending.truncate()
+            self._pending_books = 0
+        self.f_out.flush()
+        self._last_flush = time.monotonic()
+        if committed and self.journal is not None and self._last_book is not None:
+            os.fsync(self.f_out.fileno())
+            self.journal.commit(*self._last_book, offset=self.f_out.tell())
+
+
+class _FanoutWriter:
+    """
+    多目标语言分文件输出：每本书的行为 [各语言译文行..., 英文行]，
+    第 k 个写出器收到 [第 k 种语言译文行, 英文行]，各文件仍是两行格式且按同一顺序写出。
+    """
+
+    def __init__(self, writers: Sequence[_ReorderWriter]) -> None:
+        self.writers = list(writers)
+        self.flush_interval = self.writers[0].flush_interval
+
+    def put(self, seq: int, rows: List[List[str]], book_index: Optional[int] = None) -> int:
+        emitted = 0
+        for k, writer in enumerate(self.writers):
+            emitted = writer.put(seq, [rows[k], rows[-1]], book_index)
+        return emitted
+
+    def maybe_flush(self) -> None:
+        for writer in self.writers:
+            writer.maybe_flush()
+
+    def flush(self) -> None:
+        for writer in self.writers:
+            writer.flush()
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    """固定桶延迟直方图（秒）：observe 只做一次二分与计数，分位数按桶内线性插值估算。"""
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # 最后一个桶为 +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket in enumerate(self.counts):
+            if bucket and cumulative + bucket >= rank:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - cumulative) / bucket
+            cumulative += bucket
+        return self.bounds[-1]
+
+
+class RateMeter:
+    """滚动速率：按整秒分桶计数，只保留最近 window 秒。"""
+
+    def __init__(self, window: int = 10) -> None:
+        self.window = window
+        self._buckets: Deque[List[int]] = deque()  # [整秒, 计数]
+        self._started = time.monotonic()
+
+    def _trim(self, now: float) -> None:
+        while self._buckets and self._buckets[0][0] <= now - self.window:
+            self._buckets.popleft()
+
+    def mark(self, n: int = 1) -> None:
+        now = time.monotonic()
+        second = int(now)
+        if self._buckets and self._buckets[-1][0] == second:
+            self._buckets[-1][1] += n
+        else:
+            self._buckets.append([second, n])
+            self._trim(now)
+
+    def rate(self) -> float:
+        now = time.monotonic()
+        self._trim(now)
+        span = min(self.window, max(now - self._started, 1e-9))
+        return sum(count for _, count in self._buckets) / span
+
+
+@dataclass
+class TranslationStats:
+    total_words: int = 0  # 所有书目的单词总数（含重复）
+    unique_words: int = 0  # 去重后实际需要翻译的单词数
+    normalized: int = 0  # 单词规范化合并掉的请求数（见 normalize.WordNormalizer）
+    processed: int = 0  # 以下计数均按翻译请求（去重后的单词）统计
+    success: int = 0
+    fail: int = 0
+    retries: int = 0
+    cache_hits: int = 0  # 含书名查询
+    cache_misses: int = 0
+    throttled: int = 0  # 被限流（429）的请求数
+    attempts: Dict[int, int] = field(default_factory=dict)  # 尝试次数 -> 单词数
+    sleep_seconds: float = 0.0  # 固定暂停、重试等待与限速等待的累计时间
+    translator_seconds: float = 0.0  # 等待翻译器返回的累计时间（并发时会超过墙钟时间）
+    latency: LatencyHistogram = field(
+        default_factory=LatencyHistogram, repr=False, compare=False
+    )
+    throughput: RateMeter = field(default_factory=RateMeter, repr=False, compare=False)
+
+    def observe_request(self, seconds: float) -> None:
+        self.latency.observe(seconds)
+        self.translator_seconds += seconds
+
+    def snapshot(self) -> dict:
+        """可 JSON 序列化的指标快照。"""
+        return {
+            "total_words": self.total_words,
+            "unique_words": self.unique_words,
+            "normalized": self.normalized,
+            "processed": self.processed,
+            "success": self.success,
+            "fail": self.fail,
+            "retries": self.retries,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "throttled": self.throttled,
+            "requests": self.latency.count,
+            "latency_seconds": {
+                "p50": round(self.latency.quantile(0.50), 4),
+                "p95": round(self.latency.quantile(0.95), 4),
+                "p99": round(self.latency.quantile(0.99), 4),
+            },
+            "attempts": {str(k): v for k, v in sorted(self.attempts.items())},
+            "sleep_seconds": round(self.sleep_seconds, 3),
+            "translator_seconds": round(self.translator_seconds, 3),
+            "words_per_sec": round(self.throughput.rate(), 2),
+        }
+
+    def to_prometheus(self, prefix: str = "raz_translate") -> str:
+        """Prometheus 文本格式（node_exporter textfile collector 可直接读取）。"""
+        lines = []
+        counters = (
+            "processed",
+            "success",
+            "fail",
+            "retries",
+            "cache_hits",
+            "cache_misses",
+            "throttled",
+        )
+        for name in counters:
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {getattr(self, name)}")
+        for name in ("total_words", "unique_words", "normalized"):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {getattr(self, name)}")
+        for name in ("sleep_seconds", "translator_seconds"):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {getattr(self, name):.6f}")
+        lines.append(f"# TYPE {prefix}_words_per_second gauge")
+        lines.append(f"{prefix}_words_per_second {self.throughput.rate():.3f}")
+        lines.append(f"# TYPE {prefix}_attempts gauge")
+        for tries, count in sorted(self.attempts.items()):
+            lines.append(f'{prefix}_attempts{{tries="{tries}"}} {count}')
+        metric = f"{prefix}_request_latency_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, count in zip(self.latency.bounds, self.latency.counts):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{le="+Inf"}} {self.latency.count}')
+        lines.append(f"{metric}_sum {self.latency.sum:.6f}")
+        lines.append(f"{metric}_count {self.latency.count}")
+        return "\n".join(lines) + "\n"
+
+
+def write_metrics(stats: TranslationStats, path: str) -> None:
+    """原子写出指标快照：.prom 结尾写 Prometheus 文本格式，否则写 JSON。"""
+    if path.endswith(".prom"):
+        content = stats.to_prometheus()
+    else:
+        content = json.dumps(stats.snapshot(), ensure_ascii=False, indent=2)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+@contextlib.asynccontextmanager
+async def _metrics_exporter(
+    stats: TranslationStats, path: Optional[str], interval: float
+):
+    """运行期间每 interval 秒写一次指标快照，退出时（含异常）再写最终快照。"""
+    if not path:
+        yield
+        return
+
+    async def loop() -> None:
+        while True:
+            await asyncio.sleep(interval)
+            write_metrics(stats, path)
+
+    task = asyncio.create_task(loop())
+    try:
+        yield
+    finally:
+        task.cancel()
+        write_metrics(stats, path)
+
+
+PROGRESS_REFRESH_SECONDS = 0.5
+
+
+class ProgressPrinter:
+    """
+    节流的进度输出：最多每 refresh_seconds 刷新一行，最后一个请求完成时必定输出；
+    替代逐词打印，长任务下不再被 stdout 拖慢。
+    """
+
+    def __init__(self, refresh_seconds: float = PROGRESS_REFRESH_SECONDS) -> None:
+        self.refresh_seconds = refresh_seconds
+        self._last = 0.0
+
+    def __call__(
+        self, s: TranslationStats, word: str, success: bool, attempts: int
+    ) -> None:
+        now = time.monotonic()
+        if now - self._last < self.refresh_seconds and s.processed < s.unique_words:
+            return
+        self._last = now
+        print(
+            f"[{s.processed}/{s.unique_words}] 成功:{s.success} 失败:{s.fail} "
+            f"重试:{s.retries} p50/p95:{s.latency.quantile(0.5) * 1000:.0f}/"
+            f"{s.latency.quantile(0.95) * 1000:.0f}ms "
+            f"{s.throughput.rate():.1f} 词/秒 最近:{word}"
+        )
+
+
+DEFAULT_DEST = "zh-cn"
+LAYOUTS = ("split", "wide")
+
+
+def parse_dests(dest: Union[str, Sequence[str]]) -> List[str]:
+    """解析目标语言：接受 "zh-cn,zh-tw,ja" 或列表，去掉空项与重复项并保持顺序。"""
+    items = dest.split(",") if isinstance(dest, str) else list(dest)
+    dests = list(dict.fromkeys(d.strip() for d in items if d.strip()))
+    if not dests:
+        raise ValueError("至少需要一个目标语言")
+    return dests
+
+
+def output_paths(output_path: str, dests: Sequence[str], layout: str = "split") -> List[str]:
+    """
+    各目标语言对应的输出文件：单一语言或 wide 布局只有 output_path 一个文件；
+    split 布局下为 <名称>.<语言><扩展名>，如 out.zh-tw.csv。
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"未知的输出布局 '{layout}'，可选: {', '.join(LAYOUTS)}")
+    if len(dests) == 1 or layout == "wide":
+        return [output_path]
+    root, ext = os.path.splitext(output_path)
+    return [f"{root}.{d}{ext}" for d in dests]
+
+
+async def _translate_multi(
+    words: Sequence[str],
+    *,
+    dests: Sequence[str],
+    extra_texts: Sequence[str] = (),
+    on_result=None,
+    **kwargs,
+) -> List[Tuple[str, ...]]:
+    """同一批条目同时按每种目标语言翻译（共享限速与调度），返回每个条目的各语言译文元组。"""
+    per_dest = await asyncio.gather(
+        *(
+            translate_in_chunks(words, extra_texts=extra_texts, dest=d, **kwargs)
+            for d in dests
+        )
+    )
+    return list(zip(*per_dest))
+
+
+def _book_translator(
+    translator,
+    dests: Sequence[str],
+    *,
+    stats: TranslationStats,
+    window: int,
+    concurrency: int,
+    rps: Optional[float],
+    max_concurrency: Optional[int],
+    **kwargs,
+) -> Callable:
+    """
+    每本书的翻译函数（供 _translate_stream 调用）：所有书目共享一个令牌桶与 RetryScheduler，
+    在途请求总数不超过 concurrency（window 只决定预读几本书，不放大并发）；
+    多目标语言时同一批条目按各语言同时翻译。其余参数透传给 translate_in_chunks。
+    """
+    translate_kwargs = dict(
+        translator=translator,
+        stats=stats,
+        concurrency=concurrency,
+        limiter=TokenBucket(rps) if rps else None,
+        scheduler=_build_scheduler(concurrency, rps, max_concurrency),
+        **kwargs,
+    )
+    if len(dests) > 1:
+        return functools.partial(_translate_multi, dests=dests, **translate_kwargs)
+    return functools.partial(translate_in_chunks, dest=dests[0], **translate_kwargs)
+
+
+@dataclass
+class TranslatedRecord:
+    """
+    iter_translated_records 产出的一本书：translations 与 words 一一对应，失败的条目为
+    FAILURE_PREFIX 开头的占位。多目标语言时 title_translated 与 translations 的每项
+    为按 dest 顺序排列的各语言译文元组。
+    """
+
+    index: int  # 在输入中的序号
+    level: str
+    title: str
+    words: List[str]
+    title_translated: Union[str, Tuple[str, ...], None]
+    translations: Optional[List[Union[str, Tuple[str, ...]]]]  # None 表示该书未翻译（增量构建沿用旧行）
+
+    @property
+    def record(self) -> Record:
+        return self.level, self.title, self.words
+
+
+async def _aiter(items: Union[Iterable, AsyncIterable]) -> AsyncIterator:
+    """把同步或异步可迭代对象统一为异步迭代；同步输入仍按需逐项读取。"""
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def _translate_stream(
+    planned: Union[
+        Iterable[Tuple[int, Record, Optional[List[str]]]],
+        AsyncIterable[Tuple[int, Record, Optional[List[str]]]],
+    ],
+    *,
+    window: int,
+    translate_book: Callable,
+    journal: Optional[CheckpointJournal] = None,
+    preloaded: Optional[Dict[str, str]] = None,
+    ordered: bool = True,
+    key: Optional[Callable[[str], str]] = None,
+) -> AsyncIterator[TranslatedRecord]:
+    """
+    流水线核心：按顺序启动书目翻译，逐本产出 TranslatedRecord。
+    ordered=True 时按输入顺序产出（乱序完成的先在缓冲区等待），否则按完成顺序产出。
+    背压：在途与已完成未取走的书目合计最多 window 本，调用方每取走一本才再读入一本，
+    planned 可以是惰性的同步或异步迭代器。
+    每个单词的译文由首次出现它的书目产出，后续书目等待同一个 Future，因此全程只翻译一次。
+    planned 的每项为 (输入序号, record, 该书首次出现的单词)；单词列表为 None 的书目不翻译，
+    产出 translations 为 None 的条目（增量构建沿用旧输出）。
+    preloaded 为断点日志中已译出的 原文 -> 译文，直接复用；新译出的结果逐条写入 journal。
+    任一书目异常时立即抛出；迭代器关闭（提前 break、取消或异常）时取消全部在途翻译。
+    key 为单词规范化函数时，planned 中的单词为规范形式，书中各写法按 key 取对应译文。
+    """
+    loop = asyncio.get_running_loop()
+    request_key = key if key is not None else (lambda word: word)
+    translations: Dict[str, asyncio.Future] = {}
+    slots = asyncio.Semaphore(max(1, window))
+    finished: asyncio.Queue = asyncio.Queue()
+    preloaded = preloaded or {}
+
+    async def translate_one(
+        seq: int, index: int, record: Record, new_words: List[str]
+    ) -> None:
+        level, title_en, words_en = record
+        on_result = None
+        if journal is not None:
+            on_result = functools.partial(journal.record, index, level, title_en)
+        todo = [word for word in new_words if word not in preloaded]
+        extra = [] if title_en in preloaded else [title_en]
+        tracing.set_book(index, title_en)
+        try:
+            with tracing.span("book", "book", index=index, title=title_en, words=len(todo)):
+                results = await translate_book(
+                    todo, extra_texts=extra, on_result=on_result
+                )
+            title_cn = results[0] if extra else preloaded[title_en]
+            done = dict(zip(todo, results[len(extra) :]))
+            for word in new_words:
+                translations[word].set_result(done.get(word, preloaded.get(word)))
+            words_cn = [await translations[request_key(word)] for word in words_en]
+        except Exception as exc:
+            await finished.put((seq, exc))
+            return
+        await finished.put(
+            (seq, TranslatedRecord(index, level, title_en, list(words_en), title_cn, words_cn))
+        )
+
+    async def produce() -> None:
+        total = 0
+        try:
+            async for index, record, new_words in _aiter(planned):
+                await slots.acquire()
+                if new_words is None:
+                    level, title, words = record
+                    await finished.put(
+                        (total, TranslatedRecord(index, level, title, list(words), None, None))
+                    )
+                    total += 1
+                    continue
+                for word in new_words:
+                    translations[word] = loop.create_future()
+                if journal is not None:
+                    journal.book_started(index)
+                tasks.append(
+                    asyncio.create_task(translate_one(total, index, record, new_words))
+                )
+                total += 1
+        except Exception as exc:
+            await finished.put((total, exc))  # 读取输入出错，经产出端抛出
+            return
+        await finished.put((total, None))  # 结束标记，携带书目总数
+
+    tasks: List[asyncio.Task] = []
+    producer = asyncio.create_task(produce())
+    ready: Dict[int, TranslatedRecord] = {}
+    next_seq = 0
+    total: Optional[int] = None
+    try:
+        while total is None or next_seq < total:
+            seq, item = await finished.get()
+            if item is None:
+                total = seq
+                continue
+            if isinstance(item, Exception):
+                raise item
+            if not ordered:
+                seq = next_seq
+            ready[seq] = item
+            while next_seq in ready:
+                next_seq += 1
+                yield ready.pop(next_seq - 1)
+                slots.release()  # 调用方取走后才放行下一本，形成背压
+    finally:
+        pending = [task for task in [producer, *tasks] if not task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def iter_translated_records(
+    records: Union[Iterable[Record], AsyncIterable[Record]],
+    translator=None,
+    *,
+    dest: Union[str, Sequence[str]] = DEFAULT_DEST,
+    window: int = 4,
+    ordered: bool = True,
+    chunk_size: int = 10,
+    pause_seconds: float = 0.5,
+    concurrency: int = 1,
+    rps: Optional[float] = None,
+    cache: Optional[TranslationCache] = None,
+    batch: Optional[str] = "auto",
+    max_concurrency: Optional[int] = None,
+    stats: Optional[TranslationStats] = None,
+    progress_callback: Optional[
+        Callable[[TranslationStats, str, bool, int], None]
+    ] = None,
+    normalize: Optional[Callable[[str], str]] = None,
+) -> AsyncIterator[TranslatedRecord]:
+    """
+    库接口：翻译任意 (等级, 书名, 单词列表) 的同步或异步可迭代对象，每本书译完即产出
+    TranslatedRecord，不读写任何文件。process_file 就是在同一条流水线上加了 CSV 读写。
+
+    - 最多 window 本书同时翻译；调用方不取结果时输入停止读取（背压），内存由 window 决定；
+    - ordered=False 时按完成顺序产出，慢书不会挡住后面已完成的书；
+    - 提前 break、取消所在任务或关闭迭代器（建议配合 contextlib.aclosing）都会取消在途请求；
+    - 单词跨书去重，同一单词只请求一次；其余参数含义同 process_file，stats 传入时累计统计。
+    """
+    dests = parse_dests(dest)
+    stats = stats if stats is not None else TranslationStats()
+    translate_book = _book_translator(
+        translator or build_default_translator(),
+        dests,
+        stats=stats,
+        window=window,
+        chunk_size=chunk_size,
+        pause_seconds=pause_seconds,
+        concurrency=concurrency,
+        rps=rps,
+        cache=cache,
+        batch=batch,
+        max_concurrency=max_concurrency,
+        progress_callback=progress_callback,
+    )
+
+    planner = _WordPlanner(normalize)
+
+    async def planned() -> AsyncIterator[Tuple[int, Record, List[str]]]:
+        index = 0
+        async for level, title, words in _aiter(records):
+            words = list(words)
+            fresh = planner.fresh(words)
+            stats.total_words += len(words) * len(dests)
+            stats.unique_words += len(fresh) * len(dests)
+            stats.normalized = planner.merged * len(dests)
+            yield index, (level, title, words), fresh
+            index += 1
+
+    stream = _translate_stream(
+        planned(),
+        window=window,
+        translate_book=translate_book,
+        ordered=ordered,
+        key=normalize,
+    )
+    async with contextlib.aclosing(stream):
+        async for item in stream:
+            yield item
+
+
+def _record_rows(
+    item: TranslatedRecord, max_words: int, languages: int = 0
+) -> List[List[str]]:
+    """
+    一本书的输出行：译文行加英文行。languages>0 时 item 的译文为各语言元组，
+    依次输出 languages 行译文行。
+    """
+    level, title_cn, words_cn = item.level, item.title_translated, item.translations
+    if languages:
+        rows = [
+            [level, title_cn[k]] + pad_words([w[k] for w in words_cn], max_words)
+            for k in range(languages)
+        ]
+    else:
+        rows = [[level, title_cn] + pad_words(list(words_cn), max_words)]
+    rows.append([level, item.title] + pad_words(list(item.words), max_words))
+    return rows
+
+
+@contextlib.asynccontextmanager
+async def _periodic_flush(reorder) -> AsyncIterator[None]:
+    """设置了 flush_interval 时在后台按间隔检查落盘，书目迟迟未完成时也能及时写出。"""
+    interval = reorder.flush_interval
+    if interval is None:
+        yield
+        return
+
+    async def loop() -> None:
+        while True:
+            await asyncio.sleep(interval)
+            reorder.maybe_flush()
+
+    task = asyncio.create_task(loop())
+    try:
+        yield
+    finally:
+        task.cancel()
+
+
+def _pending_records(
+    records: Iterable[Record],
+    *,
+    start_index: int = 0,
+    processed_books: Optional[set] = None,
+    shard: Optional[Tuple[int, int]] = None,
+) -> Iterator[Tuple[int, Record]]:
+    """产出 (输入序号, record)：跳过其他分片、断点之前及输出中已有的书目。"""
+    for index, record in enumerate(records):
+        if shard is not None and shard_of(record[0], record[1], shard[1]) != shard[0]:
+            continue
+        if index >= start_index and record[:2] not in (processed_books or ()):
+            yield index, record
+
+
+def _build_scheduler(
+    concurrency: int, rps: Optional[float], max_concurrency: Optional[int]
+) -> RetryScheduler:
+    """串行模式只共享退避与熔断；并发模式另由 scheduler.limit 控制全局在途请求数。"""
+    if concurrency <= 1 and not rps:
+        return RetryScheduler()
+    return RetryScheduler(max(1, concurrency), max_concurrency=max_concurrency)
+
+
+async def process_file(
+    input_path: str = "razfull.csv",
+    output_path: str = "translated_output.csv",
+    *,
+    translator=None,
+    chunk_size: int = 10,
+    pause_seconds: float = 0.5,
+    show_progress: bool = True,
+    limit: Optional[int] = None,
+    resume: bool = False,
+    concurrency: int = 1,
+    rps: Optional[float] = None,
+    cache: Optional[TranslationCache] = None,
+    batch: Optional[str] = "auto",
+    window: int = 1,
+    flush_every: int = 1,
+    flush_interval: Optional[float] = None,
+    stream: bool = False,
+    checkpoint: bool = True,
+    metrics_out: Optional[str] = None,
+    metrics_interval: float = 10.0,
+    max_concurrency: Optional[int] = None,
+    dest: Union[str, Sequence[str]] = DEFAULT_DEST,
+    layout: str = "split",
+    shard: Optional[Tuple[int, int]] = None,
+    incremental: bool = False,
+    normalize: Optional[Callable[[str], str]] = None,
+) -> TranslationStats:
+    """
+    翻译 input_path（CSV 或语料文件）并写出两行格式（译文行 + 英文行），表头为
+    “RAZ Level,Book Title,单词1..N”；返回统计。翻译本身由 _translate_stream 完成
+    （与 iter_translated_records 同一条流水线），这里只负责读入、续传/增量判断与按序写出。
+    各参数与同名命令行选项一一对应，含义见 main 中的 --help 说明。
+    """
+    dests = parse_dests(dest)
+    paths = output_paths(output_path, dests, layout)
+    multi = len(dests) > 1
+    if multi and resume:
+        raise ValueError("多目标语言模式暂不支持断点续传")
+    if incremental and (resume or stream or multi):
+        raise ValueError("增量构建不能与 resume、stream 或多目标语言同时使用")
+    checkpoint = checkpoint and not multi and not incremental
+    translator = translator or build_default_translator()
+    journal_path = CheckpointJournal.path_for(output_path)
+
+    # Resume logic：优先读取断点日志尾部，缺失或与输入不一致时退回扫描输出文件
+    start_index = 0
+    preloaded: Dict[str, str] = {}
+    processed_books: set[Tuple[str, str]] = set()
+    state: Optional[JournalState] = None
+    if resume:
+        state = _usable_journal_state(journal_path, output_path, input_path, limit)
+        if state is not None:
+            with open(output_path, "r+b") as f:
+                f.truncate(state.offset)  # 丢弃最后一次提交之后的残缺内容
+            start_index = state.index + 1
+            preloaded = state.partial
+            print(
+                f"断点续传模式：断点日志显示前 {start_index} 本已完成，"
+                f"复用 {len(preloaded)} 条未完成书目的已译结果。"
+            )
+        else:
+            processed_books = get_processed_books(output_path)
+            if processed_books:
+                print(f"断点续传模式：检测到 {len(processed_books)} 个已处理书目，将跳过。")
+
+    pending = functools.partial(
+        _pending_records,
+        start_index=start_index,
+        processed_books=processed_books,
+        shard=shard,
+    )
+
+    if stream:
+        max_words = count_max_words(input_path, limit=limit)
+        if not max_words:
+            return TranslationStats(total_words=0)
+        stats = TranslationStats()
+        planner = _WordPlanner(normalize)
+
+        def count_planned(indexed):
+            for index, record in indexed:
+                new_words = planner.fresh(record[2])
+                stats.total_words += len(record[2]) * len(dests)
+                stats.unique_words += len(new_words) * len(dests)
+                stats.normalized = planner.merged * len(dests)
+                yield index, record, new_words
+
+        planned = count_planned(pending(iter_records(input_path, limit=limit)))
+    else:
+        records, max_words = compute_records(input_path, limit=limit)
+        if not records:
+            return TranslationStats(total_words=0)
+
+        # Filter records if resuming
+        indexed = list(pending(records))
+        if not indexed:
+            print("所有书目均已处理完毕。")
+            return TranslationStats()
+
+        reused: set[int] = set()  # 增量构建中沿用旧行的书目（indexed 中的位置）
+        if incremental and os.path.exists(output_path):
+            hashes = [book_hash(*record) for _, record in indexed]
+            if load_book_hashes(output_path) == hashes:
+                print("增量构建：输入与上次输出一致，无需更新。")
+                return TranslationStats(total_words=sum(len(r[2]) for _, r in indexed))
+            preloaded, old_keys, old_hashes = _scan_previous_output(output_path)
+            if normalize is not None:
+                for word, translated in list(preloaded.items()):
+                    preloaded.setdefault(normalize(word), translated)
+            reused = {k for k, digest in enumerate(hashes) if digest in old_hashes}
+            changed = [indexed[k][1] for k in range(len(indexed)) if k not in reused]
+            updated = sum(1 for record in changed if record[:2] in old_keys)
+            new_keys = {record[:2] for _, record in indexed}
+            print(
+                f"增量构建：沿用 {len(reused)} 本，变更 {updated} 本，"
+                f"新增 {len(changed) - updated} 本，删除 {len(old_keys - new_keys)} 本。"
+            )
+
+        planner = _WordPlanner(normalize)
+        new_words_by_book = [
+            planner.fresh(record[2])
+            for k, (_, record) in enumerate(indexed)
+            if k not in reused
+        ]
+        stats = TranslationStats(
+            total_words=sum(len(record[2]) for _, record in indexed) * len(dests),
+            unique_words=sum(
+                1 for words in new_words_by_book for w in words if w not in preloaded
+            )
+            * len(dests),
+            normalized=planner.merged * len(dests),
+        )
+        print(
+            f"语料去重：共 {stats.total_words} 个单词，"
+            f"去重后需翻译 {stats.unique_words} 个"
+            + (f"（规范化合并 {stats.normalized} 个）。" if normalize is not None else "。")
+        )
+        fresh = iter(new_words_by_book)
+        planned = (
+            (index, record, None if k in reused else next(fresh))
+            for k, (index, record) in enumerate(indexed)
+        )
+
+    progress_callback = ProgressPrinter() if show_progress else None
+
+    open_mode = "a" if resume else "w"
+
+    def is_new_file(path: str) -> bool:
+        """按每个输出文件各自判断是否需要写表头：覆盖写入、不存在或为空。"""
+        return (
+            incremental  # 增量构建总是写入新的临时文件
+            or open_mode == "w"
+            or not os.path.exists(path)
+            or os.path.getsize(path) == 0
+        )
+    journal = (
+        # 日志不可用时重新开始记录，避免残留的旧记录干扰下次恢复
+        CheckpointJournal(journal_path, truncate=state is None)
+        if checkpoint
+        else None
+    )
+
+    translate_book = _book_translator(
+        translator,
+        dests,
+        stats=stats,
+        window=window,
+        chunk_size=chunk_size,
+        pause_seconds=pause_seconds,
+        concurrency=concurrency,
+        rps=rps,
+        cache=cache,
+        batch=batch,
+        max_concurrency=max_concurrency,
+        progress_callback=progress_callback,
+    )
+
+    final_paths = paths
+    copy_rows: Optional[_PreviousRows] = None
+    if incremental:
+        paths = [output_path + ".tmp"]
+        if os.path.exists(output_path):
+            copy_rows = _PreviousRows(output_path, max_words)
+
+    try:
+        with contextlib.ExitStack() as files:
+            writers = []
+            for path in paths:
+                new_file = is_new_file(path)  # 须在打开（截断）之前判断
+                f_out = files.enter_context(
+                    open(path, open_mode, encoding="utf-8", newline="")
+                )
+                if new_file:
+                    header_row = ["RAZ Level", "Book Title"] + [
+                        f"单词{i}" for i in range(1, max_words + 1)
+                    ]
+                    csv.writer(f_out).writerow(header_row)
+                    if journal is not None:
+                        f_out.flush()
+                        journal.commit(-1, "", "", offset=f_out.tell())
+                writers.append(
+                    _ReorderWriter(
+                        f_out,
+                        flush_every=flush_every,
+                        flush_interval=flush_interval,
+                        journal=journal,
+                    )
+                )
+            reorder = writers[0] if len(writers) == 1 else _FanoutWriter(writers)
+            translated = _translate_stream(
+                planned,
+                window=window,
+                translate_book=translate_book,
+                journal=journal,
+                preloaded=preloaded,
+                key=normalize,
+            )
+            try:
+                async with contextlib.AsyncExitStack() as running:
+                    await running.enter_async_context(
+                        _metrics_exporter(stats, metrics_out, metrics_interval)
+                    )
+                    await running.enter_async_context(_periodic_flush(reorder))
+                    await running.enter_async_context(contextlib.aclosing(translated))
+                    seq = 0
+                    async for item in translated:
+                        if item.translations is None:
+                            rows = copy_rows(item.record)  # type: ignore[misc]
+                        else:
+                            rows = _record_rows(item, max_words, len(dests) if multi else 0)
+                        reorder.put(seq, rows, item.index)
+                        seq += 1
+            finally:
+                reorder.flush()  # 中断时也保存已按序完成的书目
+        if incremental:
+            os.replace(paths[0], final_paths[0])
+            save_book_hashes(final_paths[0], [record for _, record in indexed])
+    finally:
+        if journal is not None:
+            journal.close()
+        if copy_rows is not None:
+            copy_rows.close()
+        if incremental and os.path.exists(paths[0]):
+            os.remove(paths[0])
+    return stats
+
+
+WATCH_POLL_SECONDS = 1.0
+WATCH_DEBOUNCE_SECONDS = 2.0
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """(修改时间, 大小)；文件不存在（编辑器保存时可能短暂删除）时为 None。"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+async def _wait_until_stable(
+    path: str, signature: Optional[Tuple[int, int]], poll_interval: float, debounce: float
+) -> Tuple[int, int]:
+    """防抖：等到文件存在且连续 debounce 秒没有变化，返回此时的签名。"""
+    stable_since = time.monotonic()
+    while True:
+        await asyncio.sleep(min(poll_interval, debounce))
+        current = _file_signature(path)
+        if current != signature:
+            signature, stable_since = current, time.monotonic()
+        elif current is not None and time.monotonic() - stable_since >= debounce:
+            return current
+
+
+async def watch_file(
+    input_path: str = "razfull.csv",
+    output_path: str = "translated_output.csv",
+    *,
+    translator=None,
+    cache: Optional[TranslationCache] = None,
+    poll_interval: float = WATCH_POLL_SECONDS,
+    debounce: float = WATCH_DEBOUNCE_SECONDS,
+    corpus: bool = False,
+    export_dir: Optional[str] = None,
+    max_runs: Optional[int] = None,
+    **process_kwargs,
+) -> int:
+    """
+    守护模式：轮询 input_path，修改停止 debounce 秒后做一次增量构建（见 process_file 的
+    incremental），只翻译新增与变更的书目，结果先写临时文件再原子替换，读取方不会读到半截文件。
+    翻译器、缓存连接与规范化设置在多次构建间保持常驻，不再每次冷启动。
+    启动时先构建一次；corpus=True 时每次先按需重建语料文件（见 ensure_corpus）；
+    export_dir 不为空时每次构建后重新导出 kid_quiz 分片（见 quiz_export.export_shards）。
+    构建失败（输入表头损坏、缓存数据库被锁等任何异常）只打印错误并等待下一次修改；
+    只有 Ctrl+C（KeyboardInterrupt）与任务取消会结束守护。
+    max_runs 为构建次数上限（测试用），默认一直运行直到被中断；返回完成的构建次数。
+    其余参数透传给 process_file。
+    """
+    translator = translator or build_default_translator()
+    built: Optional[Tuple[int, int]] = None
+    runs = 0
+    print(f"[watch] 监视 {input_path}（每 {poll_interval:g}s 检查，防抖 {debounce:g}s），Ctrl+C 退出。")
+    while max_runs is None or runs < max_runs:
+        signature = _file_signature(input_path)
+        if signature is None or signature == built:
+            await asyncio.sleep(poll_interval)
+            continue
+        if built is not None:
+            signature = await _wait_until_stable(input_path, signature, poll_interval, debounce)
+        started = time.monotonic()
+        try:
+            source = ensure_corpus(input_path) if corpus else input_path
+            stats = await process_file(
+                source,
+                output_path,
+                translator=translator,
+                cache=cache,
+                incremental=True,
+                **process_kwargs,
+            )
+            if cache is not None:
+                cache.commit()
+            if export_dir:
+                from quiz_export import export_shards
+
+                export_shards(output_path, export_dir)
+        except Exception as exc:  # 常驻进程不因单次构建失败退出
+            print(f"[watch] 更新失败：{type(exc).__name__}: {exc}；等待下一次修改。")
+        else:
+            print(
+                f"[watch] {time.strftime('%H:%M:%S')} 已更新 {output_path}："
+                f"请求 {stats.processed} 个（成功 {stats.success}，失败 {stats.fail}），"
+                f"耗时 {time.monotonic() - started:.1f}s"
+            )
+        built = signature
+        runs += 1
+    return runs
+
+
+def _usable_journal_state(
+    journal_path: str, output_path: str, input_path: str, limit: Optional[int]
+) -> Optional[JournalState]:
+    """读取断点日志尾部，并确认输出文件长度与输入中对应书目都和日志一致。"""
+    state = read_journal_tail(journal_path)
+    if state is None or not os.path.exists(output_path):
+        return None
+    if os.path.getsize(output_path) < state.offset:
+        return None
+    if state.index >= 0 and is_corpus_file(input_path):
+        with Corpus.load(input_path) as corpus:  # 语料文件可按下标直接取书目
+            in_range = state.index < len(corpus) and (limit is None or state.index < limit)
+            key = corpus[state.index][:2] if in_range else None
+        if key != (state.level, state.title):
+            print("断点日志与当前输入不一致，改为扫描输出文件。")
+            return None
+    elif state.index >= 0:
+        record = next(
+            itertools.islice(iter_records(input_path, limit=limit), state.index, None),
+            None,
+        )
+        if record is None or record[:2] != (state.level, state.title):
+            print("断点日志与当前输入不一致，改为扫描输出文件。")
+            return None
+    return state
+
+
+PLAN_LATENCY_SECONDS = 0.3  # --plan 默认假设的单次请求耗时
 
 
 @dataclass
-class TranslationStats:
+class RunPlan:
+    """
+    plan_run 的估算结果。文本数含书名；resolved_* 为不必请求远程翻译器的文本数，
+    分别来自断点日志/上次输出、持久缓存与离线词典。多目标语言时按 (文本, 语言) 计数。
+    """
+
+    books: int = 0  # 输入（limit 之后）的书目数
+    books_pending: int = 0  # 需要翻译的书目数
+    books_skipped: int = 0  # 已完成、其他分片或增量构建中沿用的书目数
     total_words: int = 0
-    processed: int = 0
-    success: int = 0
-    fail: int = 0
-    retries: int = 0
+    unique_words: int = 0  # 语料级去重后的单词数，与 TranslationStats 一致
+    normalized: int = 0  # 单词规范化合并掉的请求数
+    resolved_previous: int = 0
+    resolved_cache: int = 0
+    resolved_dictionary: int = 0
+    to_translate: int = 0  # 需要远程翻译的文本数
+    chunks: int = 0
+    requests: int = 0  # 预计远程请求数（不含重试）
+    mode: str = "serial"
+    batch_mode: Optional[str] = None
+    latency: float = PLAN_LATENCY_SECONDS
+    failure_rate: float = 0.0
+    seconds: float = 0.0  # 预计墙钟时间（含按 failure_rate 估算的重试）
+    retry_seconds: float = 0.0  # 其中重试与退避的部分
+    retry_seconds_max: float = 0.0  # 所有请求都用尽重试时额外增加的时间上限
 
+    def to_dict(self) -> dict:
+        data = dict(self.__dict__)
+        for key in ("seconds", "retry_seconds", "retry_seconds_max"):
+            data[key] = round(data[key], 1)
+        return data
 
-async def process_file(
+    def format(self) -> str:
+        return "\n".join(
+            [
+                f"书目: {self.books} 本，需翻译 {self.books_pending} 本，跳过 {self.books_skipped} 本",
+                f"单词: 共 {self.total_words} 个，去重后 {self.unique_words} 个"
+                + (f"（规范化合并 {self.normalized} 个）" if self.normalized else ""),
+                f"本地可得: 已有结果 {self.resolved_previous}，缓存 {self.resolved_cache}，"
+                f"离线词典 {self.resolved_dictionary}",
+                f"需远程翻译: {self.to_translate} 条（含书名），{self.chunks} 块，"
+                f"约 {self.requests} 次请求（{self.mode}，批量: {self.batch_mode or 'off'}）",
+                f"预计耗时: {_format_duration(self.seconds)}（单次请求按 {self.latency:g}s、"
+                f"失败率 {self.failure_rate:.0%} 估算，其中重试 {_format_duration(self.retry_seconds)}；"
+                f"全部重试耗尽时最多再加 {_format_duration(self.retry_seconds_max)}）",
+            ]
+        )
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, secs = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{secs:02d}s" if hours else f"{minutes}m{secs:02d}s"
+
+
+def plan_run(
     input_path: str = "razfull.csv",
     output_path: str = "translated_output.csv",
     *,
     translator=None,
     chunk_size: int = 10,
     pause_seconds: float = 0.5,
-    show_progress: bool = True,
+    max_retries: int = 2,
     limit: Optional[int] = None,
     resume: bool = False,
-) -> TranslationStats:
+    concurrency: int = 1,
+    rps: Optional[float] = None,
+    cache: Optional[TranslationCache] = None,
+    batch: Optional[str] = "auto",
+    window: int = 1,
+    dest: Union[str, Sequence[str]] = DEFAULT_DEST,
+    shard: Optional[Tuple[int, int]] = None,
+    incremental: bool = False,
+    latency: float = PLAN_LATENCY_SECONDS,
+    failure_rate: float = 0.0,
+    normalize: Optional[Callable[[str], str]] = None,
+) -> RunPlan:
     """
-    逐行解析并输出两行格式（中文行+英文章），表头为“RAZ Level,Book Title,单词1..N”。
-    包含 RAZ 等级列和书名。
+    不调用翻译器、不改动任何文件，估算 process_file 同样参数下的工作量与耗时。
+
+    读取与筛选同 process_file（compute_records、limit、resume 的断点日志或输出扫描、
+    shard、incremental 的沿用判断、语料级去重），再按 translate_in_chunks 的分块方式逐块
+    扣除缓存与离线词典（translator 带 dictionary 时）命中，得到远程请求数。
+    batch="auto" 时按 translator 探测，未给出 translator 时按默认的 googletrans 逐词计。
+    耗时：串行模式为 请求数 * latency，加上各块的 pause_seconds（书目窗口与多语言并行分摊）；
+    并发模式为 请求数 * latency / concurrency，受 rps 下限约束。
+    重试按每次请求以 failure_rate 独立失败、最多 max_retries 次，退避取
+    RetryScheduler.backoff 的期望值。结果均为粗略估计。
     """
-    translator = translator or build_default_translator()
+    dests = parse_dests(dest)
+    if batch == "auto":
+        batch_mode = detect_batch_mode(translator) if translator is not None else None
+    else:
+        batch_mode = batch
+    lookup = getattr(getattr(translator, "dictionary", None), "lookup", None)
+    if lookup is not None:
+        from offline_dict import DICT_DESTS
+    plan = RunPlan(batch_mode=batch_mode, latency=latency, failure_rate=failure_rate)
 
-    # Resume logic
-    processed_titles = set()
+    records, _ = compute_records(input_path, limit=limit)
+    plan.books = len(records)
+    start_index = 0
+    preloaded: Dict[str, str] = {}
+    processed_books: set[Tuple[str, str]] = set()
     if resume:
-        processed_titles = get_processed_titles(output_path)
-        if processed_titles:
-            print(f"断点续传模式：检测到 {len(processed_titles)} 个已处理书目，将跳过。")
+        state = _usable_journal_state(
+            CheckpointJournal.path_for(output_path), output_path, input_path, limit
+        )
+        if state is not None:
+            start_index, preloaded = state.index + 1, state.partial
+        else:
+            processed_books = get_processed_books(output_path)
+    indexed = list(
+        _pending_records(
+            records, start_index=start_index, processed_books=processed_books, shard=shard
+        )
+    )
+    reused: set[int] = set()
+    if incremental and os.path.exists(output_path):
+        hashes = [book_hash(*record) for _, record in indexed]
+        if load_book_hashes(output_path) == hashes:
+            reused = set(range(len(indexed)))
+        else:
+            preloaded, _, old_hashes = _scan_previous_output(output_path)
+            if normalize is not None:
+                for word, translated in list(preloaded.items()):
+                    preloaded.setdefault(normalize(word), translated)
+            reused = {k for k, digest in enumerate(hashes) if digest in old_hashes}
+    active = [record for k, (_, record) in enumerate(indexed) if k not in reused]
+    plan.books_pending = len(active)
+    plan.books_skipped = plan.books - len(active)
+    plan.total_words = sum(len(record[2]) for record in active) * len(dests)
 
-    records, max_words = compute_records(input_path, limit=limit)
-    if not records:
-        return TranslationStats(total_words=0)
+    requests_by_book: List[int] = []
+    chunks_by_book: List[int] = []
+    planner = _WordPlanner(normalize)
+    for record in active:
+        new_words = planner.fresh(record[2])
+        plan.unique_words += len(new_words) * len(dests)
+        texts = [record[1]] + new_words
+        todo = [text for text in texts if text not in preloaded]
+        plan.resolved_previous += (len(texts) - len(todo)) * len(dests)
+        extra = 1 if todo and todo[0] == record[1] else 0
+        bounds = list(range(0, len(todo), chunk_size))
+        if extra:
+            bounds = [0] + list(range(1 + chunk_size, len(todo), chunk_size))
+        for language in dests:
+            requests = 0
+            for start, end in zip(bounds, bounds[1:] + [len(todo)]):
+                remote = 0
+                for text in todo[start:end]:
+                    if cache is not None and cache.get(text, "en", language) is not None:
+                        plan.resolved_cache += 1
+                    elif (
+                        lookup is not None
+                        and language.lower() in DICT_DESTS
+                        and lookup(text) is not None
+                    ):
+                        plan.resolved_dictionary += 1
+                    else:
+                        remote += 1
+                plan.to_translate += remote
+                requests += 1 if remote and batch_mode else remote
+            requests_by_book.append(requests)
+            chunks_by_book.append(len(bounds))
+    plan.normalized = planner.merged * len(dests)
+    plan.requests = sum(requests_by_book)
+    plan.chunks = sum(chunks_by_book)
 
-    # Filter records if resuming
-    records_to_process = [r for r in records if r[1] not in processed_titles]
-    if not records_to_process:
-        print("所有书目均已处理完毕。")
-        return TranslationStats()
+    base = pause_seconds or 0.2
+    max_delay = RetryScheduler().max_delay
 
-    stats = TranslationStats(total_words=sum(len(r[2]) for r in records_to_process))
+    def retry_cost(p: float) -> float:
+        """每次请求因失败重试带来的期望额外时间（请求耗时 + 平均退避）。"""
+        return sum(
+            p**attempt * (latency + 0.75 * min(max_delay, base * 2 ** (attempt - 1)))
+            for attempt in range(1, max_retries + 1)
+        )
 
-    progress_callback = None
-    if show_progress:
+    if concurrency <= 1 and not rps:
+        plan.mode = "serial"
+        lanes = 1
+        pauses = plan.chunks * pause_seconds / (max(1, window) * len(dests))
+    else:
+        plan.mode = "concurrent"
+        lanes = max(1, concurrency)
+        pauses = 0.0
+    plan.retry_seconds = plan.requests * retry_cost(failure_rate) / lanes
+    plan.retry_seconds_max = plan.requests * retry_cost(1.0) / lanes
+    plan.seconds = plan.requests * latency / lanes + pauses + plan.retry_seconds
+    if rps:
+        plan.seconds = max(plan.seconds, plan.requests * (1 + failure_rate) / rps)
+    return plan
 
-        def print_progress(
-            s: TranslationStats, word: str, success: bool, attempts: int
-        ):
-            status = "OK" if success else "FAIL"
-            print(
-                f"[{s.processed}/{s.total_words}] {status} {word} "
-                f"(attempts:{attempts + 1}, retries_total:{s.retries})"
-            )
 
-        progress_callback = print_progress
+@tracing.traced
+def scan_failures(
+    path: str, keep: Optional[Callable[[str, str], bool]] = None
+) -> Tuple[Dict[int, List[int]], List[str]]:
+    """
+    扫描整份双语文件中的失败占位（书名列与单词列）。
+    返回 ({书目序号: [失败列号...]}, 去重后的英文原文列表，按首次出现顺序)。
+    keep(等级, 英文书名) 为 False 的书目不计入。
+    表头缺失或不含 "Book Title" 时抛出 ValueError。
+    """
+    positions: Dict[int, List[int]] = {}
+    sources: Dict[str, None] = {}
+    with open(path, "r", encoding="utf-8", newline="") as f_in:
+        reader = csv.reader(f_in)
+        header = next(reader, None)
+        if header is None or "Book Title" not in header:
+            raise ValueError("输入文件为空或表头不正确")
+        for book, (row_cn, row_en) in enumerate(zip(reader, reader)):
+            if keep is not None and not keep(*(row_en + ["", ""])[:2]):
+                continue
+            for col in range(1, min(len(row_cn), len(row_en))):
+                if row_cn[col].strip().startswith(FAILURE_PREFIX):
+                    positions.setdefault(book, []).append(col)
+                    sources.setdefault(row_en[col], None)
+    return positions, list(sources)
 
-    open_mode = "a" if resume else "w"
-    is_new_file = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
 
-    with open(output_path, open_mode, encoding="utf-8", newline="") as f_out:
+def _rewrite_failures(
+    input_path: str,
+    output_path: str,
+    positions: Dict[int, List[int]],
+    repaired: Dict[str, str],
+) -> None:
+    """单次流式改写：只替换扫描阶段记录的失败单元格，其余行原样写出。"""
+    with open(input_path, "r", encoding="utf-8", newline="") as f_in, open(
+        output_path, "w", encoding="utf-8", newline=""
+    ) as f_out:
+        reader = csv.reader(f_in)
         writer = csv.writer(f_out)
-        if is_new_file:
-            header_row = ["RAZ Level", "Book Title"] + [
-                f"单词{i}" for i in range(1, max_words + 1)
-            ]
-            writer.writerow(header_row)
-
-        translate_func = getattr(translator, "translate")
+        writer.writerow(next(reader))
+        for book, (row_cn, row_en) in enumerate(zip(reader, reader)):
+            if book in positions:
+                row_cn = list(row_cn)
+                for col in positions[book]:
+                    row_cn[col] = repaired[row_en[col]]
+            writer.writerow(row_cn)
+            writer.writerow(row_en)
 
-        for level, title_en, words_en in records_to_process:
-            title_result = await translate_func(title_en, src="en", dest="zh-cn")
-            title_cn = (
-                title_result.text
-                if hasattr(title_result, "text")
-                else str(title_result)
-            )
-            words_cn = await translate_in_chunks(
-                words_en,
-                translator,
-                chunk_size=chunk_size,
-                pause_seconds=pause_seconds,
-                stats=stats,
-                progress_callback=progress_callback,
-            )
 
-            writer.writerow([level, title_cn] + pad_words(words_cn, max_words))
-            writer.writerow([level, title_en] + pad_words(words_en, max_words))
-            f_out.flush()  # Immediately save progress
-    return stats
+def _rebase_journal(path: str, old_size: int) -> None:
+    """
+    原地修复会改变文件长度，需同步断点日志：日志恰好覆盖整个旧文件时追加一条以新长度为准的提交，
+    否则删除日志，下次 --resume 改为扫描输出文件。
+    """
+    journal_path = CheckpointJournal.path_for(path)
+    state = read_journal_tail(journal_path)
+    if state is None:
+        return
+    if state.offset != old_size:
+        os.remove(journal_path)
+        return
+    journal = CheckpointJournal(journal_path)
+    journal.commit(state.index, state.level, state.title, offset=os.path.getsize(path))
+    journal.close()
 
 
 async def re_translate_failures(
     input_path: str,
-    output_path: str,
+    output_path: Optional[str] = None,
     *,
     translator=None,
     chunk_size: int = 10,
     pause_seconds: float = 0.5,
     show_progress: bool = True,
+    concurrency: int = 1,
+    rps: Optional[float] = None,
+    cache: Optional[TranslationCache] = None,
+    batch: Optional[str] = "auto",
+    in_place: bool = False,
+    metrics_out: Optional[str] = None,
+    metrics_interval: float = 10.0,
+    max_concurrency: Optional[int] = None,
+    dest: str = DEFAULT_DEST,
+    source: Optional[str] = None,
 ) -> TranslationStats:
-    """读取包含失败标记的文件，仅重试失败的单词，并生成一个全新的、修正过的文件。"""
+    """
+    读取包含失败标记的文件，仅重试失败的单词，并生成一个修正过的文件。
+
+    先整体扫描收集所有失败单元格及其位置，把失败原文去重后统一重试
+    （共享 concurrency/rps 限速），再单次流式改写输出。
+    in_place=True 时写入同目录临时文件后原子替换输入文件，无需 output_path。
+    metrics_out、max_concurrency 同 process_file；dest 为该文件译文的目标语言。
+    source 为原始输入（CSV 或语料文件，CSV 会先编译为语料，见 ensure_corpus）时，
+    只重试仍存在于其中的书目，已从输入删除的书目保持原样。
+    """
     translator = translator or build_default_translator()
+    limiter = TokenBucket(rps) if rps else None
+    scheduler = _build_scheduler(concurrency, rps, max_concurrency)
     stats = TranslationStats()  # Stats will be for retried words
 
     print(f"错误恢复模式：正在读取 '{input_path}'...")
+    keep = None
+    if source is not None:
+        with Corpus.load(ensure_corpus(source)) as corpus:
+            books = corpus.keys()
+        keep = lambda level, title: (level, title) in books
+    try:
+        positions, sources = scan_failures(input_path, keep)
+    except ValueError:
+        print("错误：输入文件为空或表头不正确。")
+        return stats
 
-    with open(input_path, "r", encoding="utf-8", newline="") as f_in, open(
-        output_path, "w", encoding="utf-8", newline=""
-    ) as f_out:
-        reader = csv.reader(f_in)
-        writer = csv.writer(f_out)
+    stats.total_words = sum(len(cols) for cols in positions.values())
+    stats.unique_words = len(sources)
+    print(
+        f"共 {len(positions)} 本书含 {stats.total_words} 处失败，"
+        f"去重后需重试 {stats.unique_words} 个。"
+    )
 
-        try:
-            header = next(reader)
-            writer.writerow(header)
-            title_idx = header.index("Book Title")
-        except (StopIteration, ValueError):
-            print("错误：输入文件为空或表头不正确。")
-            return stats
+    progress_callback = ProgressPrinter() if show_progress else None
+    async with _metrics_exporter(stats, metrics_out, metrics_interval):
+        retried = await translate_in_chunks(
+            sources,
+            translator,
+            chunk_size=chunk_size,
+            pause_seconds=pause_seconds,
+            stats=stats,
+            progress_callback=progress_callback,
+            concurrency=concurrency,
+            limiter=limiter,
+            cache=cache,
+            batch=batch,
+            scheduler=scheduler,
+            dest=dest,
+        )
+    repaired = dict(zip(sources, retried))
 
-        while True:
-            try:
-                row_cn = next(reader)
-                row_en = next(reader)
-            except StopIteration:
-                break
+    if not in_place:
+        if output_path is None:
+            raise ValueError("未指定 output_path 时需使用 in_place=True")
+        _rewrite_failures(input_path, output_path, positions, repaired)
+        return stats
 
-            words_to_retry_indices = []
-            words_to_retry_en = []
+    old_size = os.path.getsize(input_path)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(input_path)), suffix=".tmp"
+    )
+    os.close(fd)
+    try:
+        _rewrite_failures(input_path, tmp_path, positions, repaired)
+        os.replace(tmp_path, input_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    _rebase_journal(input_path, old_size)
+    return stats
 
-            # Words start at index 2 (after Level and Title)
-            for i in range(2, len(row_cn)):
-                if row_cn[i].strip().startswith("[翻译失败"):
-                    words_to_retry_indices.append(i)
-                    if i < len(row_en):
-                        words_to_retry_en.append(row_en[i])
 
-            if not words_to_retry_en:
-                writer.writerow(row_cn)
-                writer.writerow(row_en)
-                continue
+def _iter_output_books(path: str) -> Tuple[List[str], Iterator[List[List[str]]]]:
+    """打开两行格式输出文件，返回 (表头, 逐本产出 [中文行, 英文行] 的迭代器)。"""
+    f = open(path, "r", encoding="utf-8", newline="")
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if not header or header[:2] != ["RAZ Level", "Book Title"]:
+        f.close()
+        raise ValueError(f"{path} 不是翻译输出文件（表头应以 RAZ Level,Book Title 开头）")
 
-            print(f"书目 '{row_en[title_idx]}': 找到 {len(words_to_retry_en)} 个失败单词，正在重试...")
-            stats.total_words += len(words_to_retry_en)
+    def books() -> Iterator[List[List[str]]]:
+        with f:
+            for row_cn in reader:
+                yield [row_cn, next(reader, [])]
 
-            newly_translated_words = await translate_in_chunks(
-                words_to_retry_en,
-                translator,
-                chunk_size=chunk_size,
-                pause_seconds=pause_seconds,
-                stats=stats,
-                progress_callback=None,  # Simplified progress for retry
+    return header, books()
+
+
+def merge_shards(input_path: str, shard_paths: Sequence[str], output_path: str) -> int:
+    """
+    按原始输入顺序流式合并 --shard 产生的各分片输出，返回合并的书目数。
+
+    分片数取 len(shard_paths)；每个文件属于哪一片由其第一本书的哈希确定，文件顺序任意。
+    表头按所有分片中最宽的统一为 单词1..N，各行补齐到该宽度。
+    逐本对照输入：分片中缺少的书目、重复出现或输入中不存在的书目都会汇总为 ValueError，
+    此时不写出结果；成功时先写临时文件再原子替换 output_path。
+    """
+    count = len(shard_paths)
+    opened = [_iter_output_books(path) for path in shard_paths]
+    max_words = max(len(header) - 2 for header, _ in opened)
+    streams: Dict[int, Iterator[List[List[str]]]] = {}
+    heads: Dict[int, Optional[List[List[str]]]] = {}
+    empty = []
+    for path, (_, books) in zip(shard_paths, opened):
+        first = next(books, None)
+        if first is None:
+            empty.append(books)
+            continue
+        index = shard_of(first[1][0], first[1][1], count)
+        if index in streams:
+            raise ValueError(f"{path} 与另一个文件同属第 {index} 片，请检查分片数是否为 {count}")
+        streams[index], heads[index] = books, first
+    for index in range(count):
+        if index not in streams and empty:
+            streams[index], heads[index] = empty.pop(), None
+
+    missing: List[Tuple[str, str]] = []
+    duplicates: List[Tuple[str, str]] = []
+    merged: set[Tuple[str, str]] = set()
+    written = 0
+    tmp_path = output_path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f_out:
+            writer = csv.writer(f_out)
+            writer.writerow(
+                ["RAZ Level", "Book Title"] + [f"单词{i}" for i in range(1, max_words + 1)]
             )
+            for level, title, _ in iter_records(input_path):
+                index = shard_of(level, title, count)
+                head = heads.get(index)
+                # 已合并过的书目再次出现在分片头部，即为重复
+                while (
+                    head is not None
+                    and head[1][:2] != [level, title]
+                    and tuple(head[1][:2]) in merged
+                ):
+                    duplicates.append(tuple(head[1][:2]))
+                    head = heads[index] = next(streams[index], None)
+                if head is None or head[1][:2] != [level, title]:
+                    missing.append((level, title))
+                    continue
+                for row in head:
+                    writer.writerow(row[:2] + pad_words(row[2:], max_words))
+                merged.add((level, title))
+                written += 1
+                heads[index] = next(streams[index], None)
+        extra = [
+            tuple(book[1][:2])
+            for index, head in heads.items()
+            if head is not None
+            for book in itertools.chain([head], streams[index])
+        ]
+        duplicates += [book for book in extra if book in merged]
+        unknown = [book for book in extra if book not in merged]
+        problems = []
+        if missing:
+            problems.append(f"缺少 {len(missing)} 本（如 {missing[0]}）")
+        if duplicates:
+            problems.append(f"重复 {len(duplicates)} 本（如 {duplicates[0]}）")
+        if unknown:
+            problems.append(f"输入中不存在或顺序不符 {len(unknown)} 本（如 {unknown[0]}）")
+        if problems:
+            raise ValueError("分片合并校验失败：" + "；".join(problems))
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return written
 
-            new_row_cn = list(row_cn)
-            for i, translated_word in enumerate(newly_translated_words):
-                original_index = words_to_retry_indices[i]
-                new_row_cn[original_index] = translated_word
 
-            writer.writerow(new_row_cn)
-            writer.writerow(row_en)
-            f_out.flush()
+def merge_main(argv: Sequence[str]) -> None:
+    """merge 子命令：按输入顺序合并 --shard 各分片的输出。"""
+    parser = argparse.ArgumentParser(
+        prog="translate.py merge",
+        description="按原始输入顺序合并 --shard i/N 产生的分片输出，并校验书目不缺不重。",
+    )
+    parser.add_argument("input_path", help="各分片共用的原始输入 CSV。")
+    parser.add_argument("output_path", help="合并后的输出 CSV。")
+    parser.add_argument("shard_paths", nargs="+", help="全部 N 个分片输出（顺序任意）。")
+    args = parser.parse_args(argv)
+    try:
+        written = merge_shards(args.input_path, args.shard_paths, args.output_path)
+    except (FileNotFoundError, ValueError) as exc:
+        print(f"错误：{exc}")
+        sys.exit(1)
+    print(f"已合并 {len(args.shard_paths)} 个分片，共 {written} 本书，写入 {args.output_path}")
 
-    return stats
 
+def export_main(argv: Sequence[str]) -> None:
+    """export 子命令：把双语输出 CSV 导出为 kid_quiz 用的按等级分片与清单。"""
+    from quiz_export import MANIFEST_NAME, export_shards
+
+    parser = argparse.ArgumentParser(
+        prog="translate.py export",
+        description="把双语 CSV 导出为按等级分片的 JSON（含 gzip 预压缩）和 manifest.json。",
+    )
+    parser.add_argument(
+        "input_path", nargs="?", default="RAZAA2G.csv", help="双语输出 CSV。"
+    )
+    parser.add_argument(
+        "out_dir", nargs="?", default="quiz_data", help="输出目录（默认 quiz_data）。"
+    )
+    args = parser.parse_args(argv)
+    try:
+        manifest = export_shards(args.input_path, args.out_dir)
+    except (FileNotFoundError, ValueError) as exc:
+        print(f"错误：{exc}")
+        sys.exit(1)
+    levels = manifest["levels"]
+    print(
+        f"已导出 {len(levels)} 个等级、{sum(e['words'] for e in levels)} 个单词到 "
+        f"{os.path.join(args.out_dir, MANIFEST_NAME)}"
+    )
+
+
+def pronounce_main(argv: Sequence[str]) -> None:
+    """pronounce 子命令：批量预取双语 CSV 中单词的音标与音频，供 kid_quiz 优先使用本地数据。"""
+    from pronounce import DICTIONARY_API_BASE, INDEX_NAME, prefetch
+
+    parser = argparse.ArgumentParser(
+        prog="translate.py pronounce",
+        description="并发预取单词音标与发音音频，写入按内容寻址的本地存储与 index.json；可中断后续传。",
+    )
+    parser.add_argument(
+        "input_path", nargs="?", default="RAZAA2G.csv", help="双语输出 CSV。"
+    )
+    parser.add_argument(
+        "out_dir",
+        nargs="?",
+        default=os.path.join("quiz_data", "pron"),
+        help="存储目录（默认 quiz_data/pron，kid_quiz 从这里读取）。",
+    )
+    parser.add_argument("--concurrency", type=int, default=4, help="同时进行的请求数（默认 4）。")
+    parser.add_argument("--rps", type=float, default=5.0, help="每秒最多请求数（默认 5）。")
+    parser.add_argument("--retries", type=int, default=2, help="网络错误与 429/5xx 的重试次数。")
+    parser.add_argument("--api", default=DICTIONARY_API_BASE, help="词典 API 地址前缀。")
+    args = parser.parse_args(argv)
+    try:
+        prefetcher = asyncio.run(
+            prefetch(
+                args.input_path,
+                args.out_dir,
+                api_base=args.api,
+                concurrency=args.concurrency,
+                limiter=TokenBucket(args.rps) if args.rps else None,
+                max_retries=args.retries,
+            )
+        )
+    except (FileNotFoundError, ValueError) as exc:
+        print(f"错误：{exc}")
+        sys.exit(1)
+    print(
+        f"发音预取完成：新增 {prefetcher.fetched} 个，查无 {prefetcher.missing} 个，"
+        f"暂时失败 {len(prefetcher.failed)} 个（重新运行即可续传），"
+        f"索引 {os.path.join(args.out_dir, INDEX_NAME)}"
+    )
+
+
+def corpus_main(argv: Sequence[str]) -> None:
+    """corpus 子命令：把输入 CSV 编译为可 mmap 加载的语料文件。"""
+    parser = argparse.ArgumentParser(
+        prog="translate.py corpus",
+        description="把输入 CSV 编译为紧凑语料文件（驻留词表 + int32 单词序列），供 --corpus 等直接加载。",
+    )
+    parser.add_argument("input_path", help="输入 CSV。")
+    parser.add_argument(
+        "corpus_path", nargs="?", help=f"语料输出路径，默认 <CSV>{CORPUS_SUFFIX}。"
+    )
+    args = parser.parse_args(argv)
+    corpus_path = args.corpus_path or args.input_path + CORPUS_SUFFIX
+    try:
+        corpus = build_corpus(args.input_path, corpus_path)
+    except FileNotFoundError as exc:
+        print(f"错误：{exc}")
+        sys.exit(1)
+    print(
+        f"已写入 {corpus_path}：{len(corpus)} 本书、{corpus.total_words} 个单词，"
+        f"去重后 {corpus.vocabulary_size} 个字符串，{os.path.getsize(corpus_path)} 字节。"
+    )
+
+
+def srs_main(argv: Sequence[str]) -> None:
+    """srs 子命令：启动服务端间隔复习 API，kid_quiz 用 ?srs=地址&learner=名字 接入。"""
+    from quiz_export import group_by_level
+    from srs import SrsServer, build_vocabulary
+
+    parser = argparse.ArgumentParser(
+        prog="translate.py srs",
+        description="启动多学习者间隔复习服务（每人一个 SQLite，按到期时间建索引，JSON API 带 CORS）。",
+    )
+    parser.add_argument(
+        "--data-dir", default="srs_data", help="学习者数据库与共享词表所在目录（默认 srs_data）。"
+    )
+    parser.add_argument(
+        "--vocab", help="双语输出 CSV；指定时重建共享词表，供 all/excludeMastered 抽题。"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认 127.0.0.1）。")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口（默认 8765）。")
+    args = parser.parse_args(argv)
+    if args.vocab:
+        try:
+            count = build_vocabulary(args.data_dir, group_by_level(args.vocab))
+        except (FileNotFoundError, ValueError) as exc:
+            print(f"错误：{exc}")
+            sys.exit(1)
+        print(f"共享词表已更新：{count} 个词条")
+
+    async def serve() -> None:
+        server = SrsServer(args.data_dir)
+        port = await server.start(args.host, args.port)
+        print(f"间隔复习服务已启动：http://{args.host}:{port}/api/learners/<学习者>/due（Ctrl+C 退出）")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("间隔复习服务已停止")
+
+
+SUBCOMMANDS: Dict[str, Callable[[Sequence[str]], None]] = {
+    "corpus": corpus_main,
+    "export": export_main,
+    "merge": merge_main,
+    "pronounce": pronounce_main,
+    "srs": srs_main,
+}
+
+
+DEFAULT_PROFILE_PATH = "translate.prof"
+
+
+@contextlib.contextmanager
+def _diagnostics(trace_path: Optional[str], profile_path: Optional[str]) -> Iterator[None]:
+    """按需启用 --trace 时间线追踪与 --profile cProfile 统计，退出时写出文件。"""
+    profiler = None
+    if profile_path:
+        import cProfile
 
-def main() -> None:
-    """命令行入口"""
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with tracing.record(trace_path):
+            yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            print(f"已写入 cProfile 统计 {profile_path}（python -m pstats {profile_path}）")
+        if trace_path:
+            print(f"已写入时间线 {trace_path}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """命令行入口；首个参数为子命令名（如 export）时交给对应子命令处理。"""
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if argv and argv[0] in SUBCOMMANDS:
+        SUBCOMMANDS[argv[0]](argv[1:])
+        return
     parser = argparse.ArgumentParser(
-        description="翻译 razfull.csv 文件，并生成双语对照 CSV。",
+        description="翻译 razfull.csv 文件，并生成双语对照 CSV。\n"
+        "子命令：corpus（编译语料文件）、export（导出 kid_quiz 分片）、\n"
+        "merge（合并 --shard 分片输出）、pronounce（预取发音）、srs（复习服务），"
+        "详见 translate.py <子命令> -h。",
         formatter_class=argparse.RawTextHelpFormatter,
     )
     parser.add_argument(
@@ -339,32 +2961,383 @@ def main() -> None:
         "--limit", type=int, default=None, help="要处理的最大行数（用于测试）。"
     )
     parser.add_argument(
-        "--resume", action="store_true", help="从已部分完成的输出文件中继续翻译。"
+        "--resume",
+        action="store_true",
+        help="从已部分完成的输出文件中继续翻译：优先读取断点日志尾部，\n"
+        "缺失或与输入不一致时退回扫描输出文件；书目按 (等级, 书名) 区分。",
     )
     parser.add_argument(
         "--retry-failures",
         action="store_true",
         help="对一个已完成但包含翻译失败条目的文件进行重试。",
     )
+    parser.add_argument(
+        "--in-place",
+        action="store_true",
+        help="与 --retry-failures 配合：修复结果经临时文件原子替换输入文件，忽略输出路径。",
+    )
+    parser.add_argument(
+        "--source",
+        default=None,
+        metavar="PATH",
+        help="与 --retry-failures 配合：原始输入 CSV 或语料文件，只重试仍存在于其中的书目。",
+    )
+    parser.add_argument(
+        "--corpus",
+        action="store_true",
+        help=f"从语料文件读取输入：CSV 自动编译为 <输入>{CORPUS_SUFFIX}（CSV 更新时重建），\n"
+        "之后的翻译/续传/增量构建直接 mmap 加载，不再解析 CSV；--limit 改为按书目计数。",
+    )
+    parser.add_argument(
+        "--backend",
+        default="google",
+        help="翻译后端链，逗号分隔，按顺序尝试，如 offline,google（默认 google）；\n"
+        "用 | 连接的多个远程后端组成对冲池，如 google|google@translate.google.com.hk。",
+    )
+    parser.add_argument(
+        "--hedge-quantile",
+        type=float,
+        default=0.9,
+        help="后端池对冲时机：主请求超过该后端观测延迟的此分位数仍未返回即发往另一个后端（默认 0.9）。",
+    )
+    parser.add_argument(
+        "--hedge-delay",
+        type=float,
+        default=1.0,
+        help="后端延迟样本不足时的对冲等待秒数（默认 1.0）。",
+    )
+    parser.add_argument(
+        "--dict",
+        dest="dict_path",
+        default=None,
+        help="offline 后端使用的英汉词典：ECDICT 风格 CSV（自动编译为 <CSV>.idx）或已编译的索引。",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="同时在途的翻译请求数（默认 1，即逐词串行）。",
+    )
+    parser.add_argument(
+        "--rps",
+        type=float,
+        default=None,
+        help="每秒最多发出的翻译请求数（令牌桶），设置后取代每块之后的固定暂停。",
+    )
+    parser.add_argument(
+        "--batch",
+        choices=["auto", "list", "join", "off"],
+        default="auto",
+        help=(
+            "批量请求方式：auto 按翻译器能力探测；list 以列表整块提交；\n"
+            "join 以换行拼接整块提交；off 逐词请求。批量结果无法对齐时该块回退为逐词。"
+        ),
+    )
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=1,
+        help=(
+            "流水线窗口：同时翻译的书目数（默认 1）；输出仍按输入顺序写出。\n"
+            "窗口只决定预读几本书，在途请求总数仍受 --concurrency 限制。"
+        ),
+    )
+    parser.add_argument(
+        "--flush-every",
+        type=int,
+        default=1,
+        help="每写出多少本书落盘一次（默认 1）。",
+    )
+    parser.add_argument(
+        "--flush-interval",
+        type=float,
+        default=None,
+        help="距上次落盘超过该秒数时也会落盘。",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="流式模式：不整体载入输入文件，边读边译边写，适合超大词表。",
+    )
+    parser.add_argument(
+        "--no-journal",
+        action="store_true",
+        help="不写断点日志（<输出文件>.journal），--resume 将退回扫描输出文件。",
+    )
+    parser.add_argument(
+        "--cache",
+        default=DEFAULT_CACHE_PATH,
+        metavar="PATH",
+        help=f"持久翻译缓存（SQLite）路径，默认 {DEFAULT_CACHE_PATH}。",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="不读写持久翻译缓存。"
+    )
+    parser.add_argument(
+        "--cache-max-entries",
+        type=int,
+        default=None,
+        help="缓存最多保留的条目数，超出时淘汰最旧条目。",
+    )
+    parser.add_argument(
+        "--cache-max-age-days",
+        type=float,
+        default=None,
+        help="缓存条目的最长保留天数。",
+    )
+    parser.add_argument(
+        "--dest",
+        default=DEFAULT_DEST,
+        help="目标语言，逗号分隔可一次翻译多种（如 zh-cn,zh-tw,ja），默认 zh-cn。\n"
+        "多种语言时输入只读一遍，共用限速与调度，统计按 (单词, 语言) 计数；暂不支持断点日志与 --resume。",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=LAYOUTS,
+        default="split",
+        help="多目标语言时的输出方式：split 每种语言一个文件（out.zh-tw.csv），\n"
+        "wide 写入同一文件，每本书依次为各语言译文行与英文行。",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="增量构建：按书目内容哈希与上次输出对比，只翻译新增/变更的书目与单词，\n"
+        "未变化的行直接沿用，删除的书目不再写出；结果先写临时文件再原子替换。\n"
+        "不写断点日志，不能与 --resume、--stream 或多个 --dest 同时使用。",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="守护模式：常驻翻译器与缓存，轮询输入文件，修改停止后只增量翻译受影响的书目，\n"
+        "并原子替换输出；Ctrl+C 退出。",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=WATCH_POLL_SECONDS,
+        help=f"--watch 检查输入文件的间隔秒数（默认 {WATCH_POLL_SECONDS:g}）。",
+    )
+    parser.add_argument(
+        "--watch-debounce",
+        type=float,
+        default=WATCH_DEBOUNCE_SECONDS,
+        help=f"--watch 防抖：输入连续多少秒不变才开始构建（默认 {WATCH_DEBOUNCE_SECONDS:g}）。",
+    )
+    parser.add_argument(
+        "--watch-export",
+        default=None,
+        metavar="DIR",
+        help="--watch 每次更新后把输出重新导出为 kid_quiz 分片（同 export 子命令）。",
+    )
+    parser.add_argument(
+        "--normalize",
+        default="none",
+        metavar="SPEC",
+        help="翻译前的单词规范化：none（默认）、basic（=punct,case）、all，\n"
+        "或逗号分隔的步骤 punct（去首尾标点）、lemma（规则词形还原）、case（大小写折叠）；\n"
+        "请求按规范形式去重，英文行保留原写法。续传时须使用与中断前相同的设置。",
+    )
+    parser.add_argument(
+        "--lemma-exceptions",
+        default=None,
+        metavar="FILE",
+        help="补充词形还原例外表 CSV（每行 表面形式,规范形式；规范形式留空表示不还原）。",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=None,
+        help="只处理第 i 片（i/N，i 从 0 开始），按 (等级, 书名) 稳定哈希分片；\n"
+        "N 个进程各跑一片后用 translate.py merge 合并。",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=None,
+        help="自适应并发的上限；持续成功时在途请求数可逐步升到此值（默认不超过初始并发）。",
+    )
+    parser.add_argument(
+        "--plan",
+        nargs="?",
+        const="text",
+        choices=["text", "json"],
+        default=None,
+        help="只估算不翻译：报告单词数、去重与本地命中、预计请求数与耗时后退出；\n"
+        "--plan json 输出 JSON，便于调度器读取。",
+    )
+    parser.add_argument(
+        "--plan-latency",
+        type=float,
+        default=PLAN_LATENCY_SECONDS,
+        help=f"--plan 假设的单次请求耗时秒数（默认 {PLAN_LATENCY_SECONDS}）。",
+    )
+    parser.add_argument(
+        "--plan-failure-rate",
+        type=float,
+        default=0.0,
+        help="--plan 假设的单次请求失败率（0~1，默认 0），用于估算重试耗时。",
+    )
+    parser.add_argument(
+        "--trace",
+        default=None,
+        metavar="FILE",
+        help="记录各阶段与每次翻译请求的时间线，写出 Chrome trace-event JSON\n"
+        "（用 chrome://tracing 或 ui.perfetto.dev 打开）。",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=DEFAULT_PROFILE_PATH,
+        default=None,
+        metavar="FILE",
+        help=f"用 cProfile 包裹整次运行并写出统计文件（默认 {DEFAULT_PROFILE_PATH}），\n"
+        "可用 python -m pstats 查看。",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        default=None,
+        help="定期写出指标快照的文件；以 .prom 结尾写 Prometheus 文本格式，否则写 JSON。",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=10.0,
+        help="写出指标快照的间隔秒数（默认 10），退出时总会再写一次。",
+    )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     if args.resume and args.retry_failures:
         print("错误：--resume 和 --retry-failures 参数不能同时使用。")
         sys.exit(1)
+    if args.plan and args.retry_failures:
+        print("错误：--plan 只能估算翻译任务，不能与 --retry-failures 同时使用。")
+        sys.exit(1)
+    try:
+        dests = parse_dests(args.dest)
+        normalizer = WordNormalizer.parse(args.normalize, args.lemma_exceptions)
+    except (ValueError, OSError) as exc:
+        print(f"错误：{exc}")
+        sys.exit(1)
+    if args.incremental and (args.resume or args.stream or len(dests) > 1):
+        print("错误：--incremental 不能与 --resume、--stream 或多个 --dest 同时使用。")
+        sys.exit(1)
+    if args.watch and (
+        args.resume or args.stream or args.retry_failures or args.plan or len(dests) > 1
+    ):
+        print("错误：--watch 基于增量构建，不能与 --resume、--stream、--retry-failures、--plan 或多个 --dest 同时使用。")
+        sys.exit(1)
+    if len(dests) > 1 and (args.resume or args.retry_failures):
+        print("错误：多目标语言模式暂不支持 --resume 与 --retry-failures。")
+        sys.exit(1)
+
+    try:
+        translator = build_translator(
+            args.backend,
+            args.dict_path,
+            hedge_quantile=args.hedge_quantile,
+            hedge_delay=args.hedge_delay,
+        )
+    except ValueError as exc:
+        print(f"错误：{exc}")
+        sys.exit(1)
+    except ImportError:
+        if not args.plan:
+            raise
+        translator = None  # 估算不需要远程翻译器
+
+    cache = None
+    if args.plan:
+        # 估算不改动任何文件：缓存已存在时只读打开，不存在时按无缓存估算
+        if not args.no_cache and os.path.exists(args.cache):
+            cache = TranslationCache(args.cache, read_only=True)
+    elif not args.no_cache:
+        cache = TranslationCache(
+            args.cache,
+            max_entries=args.cache_max_entries,
+            max_age_days=args.cache_max_age_days,
+        )
 
+    diagnostics = contextlib.ExitStack()
+    diagnostics.enter_context(_diagnostics(args.trace, args.profile))
     try:
-        if args.retry_failures:
+        if args.plan:
+            input_path = ensure_corpus(args.input_path) if args.corpus else args.input_path
+            # JSON 模式下把读取过程中的提示打到 stderr，stdout 只留 JSON
+            quiet = args.plan == "json"
+            with contextlib.redirect_stdout(sys.stderr if quiet else sys.stdout):
+                plan = plan_run(
+                    input_path,
+                    args.output_path,
+                    translator=translator,
+                    limit=args.limit,
+                    resume=args.resume,
+                    concurrency=args.concurrency,
+                    rps=args.rps,
+                    cache=cache,
+                    batch=None if args.batch == "off" else args.batch,
+                    window=args.window,
+                    dest=dests,
+                    shard=args.shard,
+                    incremental=args.incremental,
+                    latency=args.plan_latency,
+                    failure_rate=args.plan_failure_rate,
+                    normalize=normalizer,
+                )
+            if quiet:
+                print(json.dumps(plan.to_dict(), ensure_ascii=False, indent=1))
+            else:
+                print(plan.format())
+        elif args.retry_failures:
             print("启动错误恢复模式...")
             stats = asyncio.run(
                 re_translate_failures(
                     input_path=args.input_path,
                     output_path=args.output_path,
+                    translator=translator,
+                    in_place=args.in_place,
+                    concurrency=args.concurrency,
+                    rps=args.rps,
+                    cache=cache,
+                    batch=None if args.batch == "off" else args.batch,
+                    metrics_out=args.metrics_out,
+                    metrics_interval=args.metrics_interval,
+                    max_concurrency=args.max_concurrency,
+                    dest=dests[0],
+                    source=args.source,
                 )
             )
+            target = args.input_path if args.in_place else args.output_path
             print(
-                f"\n错误恢复完成，结果已写入 {args.output_path}.\n"
-                f"重试单词总数: {stats.total_words}, 成功: {stats.success}, 失败: {stats.fail}"
+                f"\n错误恢复完成，结果已写入 {target}.\n"
+                f"失败单元格: {stats.total_words}, 去重后重试: {stats.unique_words}, "
+                f"成功: {stats.success}, 失败: {stats.fail}"
+            )
+        elif args.watch:
+            asyncio.run(
+                watch_file(
+                    args.input_path,
+                    args.output_path,
+                    translator=translator,
+                    cache=cache,
+                    poll_interval=args.watch_interval,
+                    debounce=args.watch_debounce,
+                    corpus=args.corpus,
+                    export_dir=args.watch_export,
+                    limit=args.limit,
+                    concurrency=args.concurrency,
+                    rps=args.rps,
+                    batch=None if args.batch == "off" else args.batch,
+                    window=args.window,
+                    flush_every=args.flush_every,
+                    flush_interval=args.flush_interval,
+                    metrics_out=args.metrics_out,
+                    metrics_interval=args.metrics_interval,
+                    max_concurrency=args.max_concurrency,
+                    dest=dests,
+                    shard=args.shard,
+                    normalize=normalizer,
+                )
             )
         else:
             print(f"开始处理文件: {args.input_path}")
@@ -372,24 +3345,61 @@ def main() -> None:
                 print(f"仅处理前 {args.limit} 行。")
             if args.resume:
                 print("启用断点续传模式。")
+            input_path = args.input_path
+            if args.corpus:
+                input_path = ensure_corpus(input_path)
+                print(f"使用语料文件: {input_path}")
 
             stats = asyncio.run(
                 process_file(
-                    input_path=args.input_path,
+                    input_path=input_path,
                     output_path=args.output_path,
+                    translator=translator,
                     limit=args.limit,
                     resume=args.resume,
+                    concurrency=args.concurrency,
+                    rps=args.rps,
+                    cache=cache,
+                    batch=None if args.batch == "off" else args.batch,
+                    window=args.window,
+                    flush_every=args.flush_every,
+                    flush_interval=args.flush_interval,
+                    stream=args.stream,
+                    checkpoint=not args.no_journal,
+                    metrics_out=args.metrics_out,
+                    metrics_interval=args.metrics_interval,
+                    max_concurrency=args.max_concurrency,
+                    dest=dests,
+                    layout=args.layout,
+                    shard=args.shard,
+                    incremental=args.incremental,
+                    normalize=normalizer,
                 )
             )
+            targets = ", ".join(output_paths(args.output_path, dests, args.layout))
             print(
-                f"\n翻译完成，结果已写入 {args.output_path}.\n"
-                f"总单词: {stats.total_words}, 已处理: {stats.processed}, "
-                f"成功: {stats.success}, 失败: {stats.fail}, 重试总数: {stats.retries}"
+                f"\n翻译完成，结果已写入 {targets}.\n"
+                f"总单词: {stats.total_words}, 去重后请求: {stats.unique_words}, "
+                f"规范化节省: {stats.normalized}, "
+                f"已处理: {stats.processed}, "
+                f"成功: {stats.success}, 失败: {stats.fail}, 重试总数: {stats.retries}, "
+                f"缓存命中: {stats.cache_hits}, 未命中: {stats.cache_misses}, "
+                f"限流: {stats.throttled}\n"
+                f"请求延迟 p50/p95/p99: {stats.latency.quantile(0.5) * 1000:.0f}/"
+                f"{stats.latency.quantile(0.95) * 1000:.0f}/"
+                f"{stats.latency.quantile(0.99) * 1000:.0f}ms, "
+                f"等待翻译器 {stats.translator_seconds:.1f}s, 暂停与限速 {stats.sleep_seconds:.1f}s"
             )
+        for pool in _backend_pools(translator):
+            print("后端池 " + "；".join(pool.summary()))
     except KeyboardInterrupt:
         print("\n操作被用户中断。程序已终止。")
     except FileNotFoundError:
         print(f"\n错误：输入文件未找到于 '{args.input_path}'")
+    finally:
+        diagnostics.close()
+        if cache is not None:
+            cache.close()
 
 
 if __name__ == "__main__":